@@ -3,4 +3,12 @@ from django.apps import AppConfig
 
 class usersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.users'
\ No newline at end of file
+    name = 'apps.users'
+
+    def ready(self):
+        # Register signal receivers
+        from apps.users import signals  # noqa: F401
+
+        # Compile the mail templates once per process
+        from core.mail_handler.renderer import precompile_mail_templates
+        precompile_mail_templates()
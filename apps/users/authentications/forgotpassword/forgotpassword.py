@@ -1,9 +1,12 @@
 import random
-import threading
 import requests
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from apps.users.models import User
-from core.baseviewset.viewset import nBaseViewset
+from core.baseviewset.token_cache import token_cache
+from core.baseviewset.viewset import nAsyncBaseViewset
+from core.hashing import ahash_password
+from core.throttling import EmailSlidingWindowThrottle, IPSlidingWindowThrottle
 from core.validators.email_password_validator import password_check
 from utils.send_email import send_forgot_password_mail
 from apps.users.authentications.forgotpassword.serializers import ChangePasswordSerializer, ForgotPasswordSerializer
@@ -13,11 +16,13 @@ from drf_yasg.utils import swagger_auto_schema
 from core.response_handler.handler import ResponseHandler
 from utils.messages import *
 
-class ForgotPasswordViewSet(nBaseViewset):
+class ForgotPasswordViewSet(nAsyncBaseViewset):
     """Viewset to handle forgot password request and sending OTP."""
     queryset = User.objects
     serializer_class = ForgotPasswordSerializer
     http_method_names = ['post']
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'forgot_password'
 
     @swagger_auto_schema(
         operation_description="Allows the user to reset their password by sending an OTP to their registered email.",
@@ -30,20 +35,20 @@ class ForgotPasswordViewSet(nBaseViewset):
         tags=['User Authentication']
     )
     
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """Initiate password reset by sending OTP to the user's registered email."""
         try:
             email = request.data['email']
             
             # Check if user exists with provided email
-            if not User.objects.filter(email=email).exists():
+            if not await User.objects.filter(email=email).aexists():
                 return ResponseHandler.failure(
                     message=EMAIL_NOT_REGISTERED,
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
             
             # Get the user object
-            user = User.objects.get(email=email)
+            user = await User.objects.aget(email=email)
             
             # Check if the user is verified
             if not user.is_verified:
@@ -54,7 +59,7 @@ class ForgotPasswordViewSet(nBaseViewset):
 
             # Generate OTP and save to user profile
             user.otp = random.randint(100000, 999999)
-            user.save()
+            await user.asave()
 
             # Prepare context for sending OTP email
             context = {
@@ -64,10 +69,8 @@ class ForgotPasswordViewSet(nBaseViewset):
                 'protocol': 'http',
             }
 
-            # Start email thread for sending OTP
-            t = threading.Thread(target=send_forgot_password_mail, args=[email, context])
-            t.setDaemon(True)
-            t.start()
+            # Queue the OTP email for the mail worker
+            await sync_to_async(send_forgot_password_mail)(email, context)
 
             # Return success response
             return ResponseHandler.success(
@@ -82,11 +85,13 @@ class ForgotPasswordViewSet(nBaseViewset):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
             
-class ConfirmPasswordViewSet(nBaseViewset):
+class ConfirmPasswordViewSet(nAsyncBaseViewset):
     """Viewset to handle password change request after OTP validation."""
     queryset = User.objects.all()
     serializer_class = ChangePasswordSerializer
     http_method_names = ['post']
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'confirm_password'
 
     @swagger_auto_schema(
         operation_description="Allows the user to change their password after OTP validation.",
@@ -99,7 +104,7 @@ class ConfirmPasswordViewSet(nBaseViewset):
         tags=['User Authentication']
 
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """Change the user's password after validating the OTP."""
         try:
             data = request.data
@@ -108,7 +113,7 @@ class ConfirmPasswordViewSet(nBaseViewset):
             new_password = data.get('new_password')
 
             # Fetch the user by email
-            user = self.queryset.get(email=email)
+            user = await self.queryset.aget(email=email)
 
             # Validate OTP
             if user.otp != otp:
@@ -119,9 +124,10 @@ class ConfirmPasswordViewSet(nBaseViewset):
             password_validation = password_check(data["new_password"])
 
             # Change the password and clear the OTP
-            user.set_password(new_password)
+            user.password = await ahash_password(new_password)
             user.otp = None
-            user.save()
+            await user.asave()
+            token_cache.invalidate_user(user.pk)
 
             # Return success response
             return ResponseHandler.success(
@@ -1,13 +1,16 @@
 from django.http import HttpResponse
 from rest_framework import status
 from django.utils import timezone
-from apps.users.models import User
-from rest_framework.authtoken.models import Token
-from django.contrib.auth import logout
-from core.baseviewset.authentication import token_expire_handler
-from core.baseviewset.viewset import aBaseViewset, nBaseViewset
+from apps.users.models import AuthToken, User
+from apps.users.photos import variant_urls
+from django.contrib.auth import alogout
+from core.baseviewset.authentication import aissue_token
+from core.baseviewset.token_cache import token_cache
+from core.baseviewset.viewset import aAsyncBaseViewset, nAsyncBaseViewset
+from core.hashing import acheck_user_password
+from core.throttling import EmailSlidingWindowThrottle, IPSlidingWindowThrottle
 from apps.users.authentications.login.serializers import UserLoginSerializer
-from core.decorators.check_user_info import check_user_info
+from core.decorators.check_user_info import check_user_status
 from drf_yasg.utils import swagger_auto_schema
 from core.response_handler.handler import ResponseHandler
 from rest_framework.serializers import Serializer  
@@ -17,10 +20,23 @@ def home(request):
     data = "<h1>Welcome to Django</h1>"
     return HttpResponse(data)
 
-class AuthLoginViewSet(nBaseViewset):
+# Columns needed to check, sign in and describe a user, plus the current token.
+LOGIN_FIELDS = (
+    'id', 'email', 'password', 'first_name', 'last_name', 'profile_photo', 'profile_photo_variants', 'user_type',
+    'is_active', 'is_staff', 'is_superuser', 'is_verified',
+    'auth_token__key', 'auth_token__user', 'auth_token__created', 'auth_token__expires_at',
+)
+
+class AuthLoginViewSet(nAsyncBaseViewset):
+    """
+    Login in three statements: load the user and its token, write the token, write `last_login`.
+    """
     queryset = User.objects
     serializer_class = UserLoginSerializer
     http_method_names = ['post']
+    # Rejected before any query or password hashing
+    throttle_classes = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+    throttle_scope = 'login'
     
     @swagger_auto_schema(
         operation_description="allow the user to login",
@@ -32,24 +48,42 @@ class AuthLoginViewSet(nBaseViewset):
         },
         tags=['User Authentication']
     ) 
-    @check_user_info
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """Handle user login and return authentication token."""
         try:
             email = request.data.get('email')
             password = request.data.get('password')
 
-            user = User.objects.get(email=email)
+            if not email:
+                return ResponseHandler.failure(
+                    message=EMAIL_FOUND_ERROR,
+                    status_code=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                # Single query: the user's login columns and its token
+                user = await User.objects.select_related('auth_token').only(*LOGIN_FIELDS).aget(email=email)
+            except User.DoesNotExist:
+                return ResponseHandler.failure(
+                    message=USER_NOT_FOUND,
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+
+            # Staff, blocked and unverified checks run on the loaded row
+            failure = check_user_status(user)
+            if failure is not None:
+                return failure
 
-            if not user.check_password(password):
+            # Verification runs on the password hashing pool, not on the event loop;
+            # an outdated hash is upgraded on the way
+            if not await acheck_user_password(user, password):
                 raise ValueError(INVALID_USER_CREDENTIAL)
             
-            token, created = Token.objects.get_or_create(user=user)
-            is_expired, token = token_expire_handler(token)
+            token = await aissue_token(user)
             
             # Update user last login time
             user.last_login = timezone.now()
-            user.save()
+            await user.asave(update_fields=['last_login'])
 
             return ResponseHandler.success(
                 message=USER_LOGGED_IN,
@@ -58,6 +92,7 @@ class AuthLoginViewSet(nBaseViewset):
                     "user_type": user.user_type,
                     "user_id": user.id,
                     "photo": user.profile_photo.url if user.profile_photo else None,
+                    "photo_variants": variant_urls(user),
                     "email": user.email,
                     "first_name": user.first_name,
                     "last_name": user.last_name
@@ -70,7 +105,7 @@ class AuthLoginViewSet(nBaseViewset):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
             
-class AuthLogoutViewSet(aBaseViewset):
+class AuthLogoutViewSet(aAsyncBaseViewset):
     """Viewset to handle user logout and related operations."""
     queryset = User.objects.all()
     serializer_class = Serializer  # Pass blank serializer since no data is required for logout
@@ -86,14 +121,15 @@ class AuthLogoutViewSet(aBaseViewset):
         tags=['User Authentication']
 
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """Log out the user and clear any device-specific data."""
         try:
             user = request.user
             # Delete existing tokens
-            Token.objects.filter(user=user).delete()
+            await AuthToken.objects.filter(user=user).adelete()
+            token_cache.invalidate_user(user.pk)
             # Perform logout
-            logout(request)
+            await alogout(request)
 
             # Return success response
             return ResponseHandler.success(
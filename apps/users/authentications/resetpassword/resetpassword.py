@@ -1,8 +1,10 @@
 
 from rest_framework import status
-from django.db import transaction
 from apps.users.models import User
-from core.baseviewset.viewset import aBaseViewset
+from core.baseviewset.token_cache import token_cache
+from core.baseviewset.viewset import aAsyncBaseViewset
+from core.hashing import averify_password, ahash_password
+from core.throttling import TokenSlidingWindowThrottle
 from core.validators.email_password_validator import password_check
 from apps.users.authentications.resetpassword.serializers import PasswordResetSerializer
 from rest_framework.serializers import Serializer  
@@ -10,11 +12,13 @@ from drf_yasg.utils import swagger_auto_schema
 from core.response_handler.handler import ResponseHandler
 from utils.messages import *
 
-class ResetPasswordViewSet(aBaseViewset):
+class ResetPasswordViewSet(aAsyncBaseViewset):
     """Viewset to handle password reset after old password validation."""
     queryset = User.objects
     serializer_class = PasswordResetSerializer
     http_method_names = ['post']
+    throttle_classes = [TokenSlidingWindowThrottle]
+    throttle_scope = 'reset_password'
 
     @swagger_auto_schema(
         operation_description="Allows the user to reset their password after validating the old password.",
@@ -26,12 +30,14 @@ class ResetPasswordViewSet(aBaseViewset):
         },
         tags=['User Authentication']
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """Reset the user's password after validating the old password."""
         try:
             old_password = request.data['old_password']
             new_password = request.data['new_password']
-            if not request.user.check_password(old_password):
+            # The authenticated user is a cached snapshot without the password column
+            user = await User.objects.aget(id=request.user.id)
+            if not await averify_password(old_password, user.password):
                 # Old password does not match
                 return ResponseHandler.failure(
                     message=OLD_PASSWORD_VALIDATION,
@@ -46,10 +52,9 @@ class ResetPasswordViewSet(aBaseViewset):
             # Validate new password
             password_validation = password_check(new_password)
             
-            with transaction.atomic():
-                user = User.objects.get(id=request.user.id)
-                user.set_password(new_password)
-                user.save()
+            user.password = await ahash_password(new_password)
+            await user.asave()
+            token_cache.invalidate_user(user.pk)
 
             # Return success response
             return ResponseHandler.success(
@@ -1,16 +1,17 @@
 from base64 import urlsafe_b64encode
-import threading
+from asgiref.sync import sync_to_async
 from django.forms import ValidationError
 from django.shortcuts import render
 from rest_framework import status
-from django.db import transaction
-from django.contrib.auth.models import Group
+from django.db import IntegrityError, transaction
+from apps.users.groups import forget_group_ids, get_group_id
 from apps.users.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_decode
 from django.utils.crypto import get_random_string
-from core.baseviewset.viewset import nBaseViewset
+from core.baseviewset.viewset import nAsyncBaseViewset
+from core.hashing import ahash_password
 from core.validators.email_password_validator import password_check, validate_email
 from utils.send_email import send_welcome_mail
 from apps.users.authentications.signup.serializers import SignupUserSerializers,VerifyUserRequestSerializer
@@ -18,10 +19,10 @@ from drf_yasg.utils import swagger_auto_schema
 from core.response_handler.handler import ResponseHandler
 from utils.messages import *
 
-class AuthSignupViewSet(nBaseViewset):
+class AuthSignupViewSet(nAsyncBaseViewset):
     """
     API ViewSet for user signup functionality. It handles the creation of a new user,
-    validates the user input, and sends a verification email to the user asynchronously.
+    validates the user input, and queues a verification email for the user.
     """
     queryset = User.objects
     serializer_class = SignupUserSerializers
@@ -37,7 +38,7 @@ class AuthSignupViewSet(nBaseViewset):
         tags=['User Authentication']
 
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """
         Handle user registration. Validates email and password, creates a user, 
         sends a verification email, and adds the user to a group.
@@ -45,84 +46,101 @@ class AuthSignupViewSet(nBaseViewset):
         data = request.data
 
         try:
-            with transaction.atomic():
-                # Check if the email already exists
-                if User.objects.filter(email=data["email"]).exists():
-                    return ResponseHandler.failure(
-                        message=USER_ALREADY_EXISTS,
-                        status_code=status.HTTP_400_BAD_REQUEST
-                    )
+            # Validate email format
+            email_validation_response = validate_email(data["email"])
+
+            # Validate password
+            password_validation = password_check(data["password"])
+
+            # Hash the password on the hashing pool before entering the transaction
+            password = await ahash_password(data["password"])
 
-                # Validate email format
-                email_validation_response = validate_email(data["email"])
+            # The user, its group and its mail are written in one transaction
+            return await sync_to_async(self.register)(request, data, password)
 
-                # Validate password
-                password_validation = password_check(data["password"])
+        except Exception as error:
+            return ResponseHandler.failure(
+                message=str(error),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
 
-                # Create user
-                user_data = self.create_user(data)
+    def register(self, request, data, password):
+        """
+        Creates the user, queues its verification email and adds it to the 'user' group atomically.
+        Three INSERTs: the user row, its group membership and its outbox mail.
+        """
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    # Create user
+                    user_data = self.create_user(data, password)
 
-                # Send verification email asynchronously
-                self.send_verification_email(request, user_data)
+                    # Queue the verification email
+                    self.send_verification_email(request, user_data)
 
-                # Add user to 'user' group
-                self.add_user_to_group(user_data)
+                    # Add user to 'user' group
+                    self.add_user_to_group(user_data)
 
                 return ResponseHandler.success(
                     data={"email": data["email"]},
                     message=NEW_USER_CREATED,
                     status_code=status.HTTP_200_OK
                 )
-
-        except Exception as error:
-            return ResponseHandler.failure(
-                message=str(error),
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            except IntegrityError:
+                # The unique email index replaces an exists() pre-check
+                if self.queryset.filter(email=data["email"]).exists():
+                    return ResponseHandler.failure(
+                        message=USER_ALREADY_EXISTS,
+                        status_code=status.HTTP_400_BAD_REQUEST
+                    )
+                if attempt:
+                    raise
+                # Not a duplicate: most likely a group id cached before the group
+                # was deleted in another process. Resolve it again and retry once.
+                forget_group_ids()
     
-    def create_user(self, data):
+    def create_user(self, data, password):
         """
         Creates a new user based on the provided data and returns the user object.
+        `password` is the already hashed password, so the row is written by a single INSERT.
         """
-        user = self.queryset.create(
+        return self.queryset.create(
             email=data["email"],
             first_name=data["first_name"],
             last_name=data.get("last_name", ""),
+            password=password,
             is_active=False,
             is_staff=False,
             is_superuser=False,
         )
-        user.set_password(data["password"])
-        user.save()
-        return user
 
     def send_verification_email(self, request, user):
         """
-        Sends an email with a verification link to the user asynchronously.
-        This is done in a separate thread to avoid blocking the main request.
+        Queues an email with a verification link to the user.
+        The mail is written to the outbox in the signup transaction and delivered by the mail worker.
         """
+        uid = urlsafe_b64encode(force_bytes(user.pk)).decode('utf-8')
+        token = default_token_generator.make_token(user)
         context = {
             "subject": "Welcome Email",
             "email": user.email,
-            "uid": urlsafe_b64encode(force_bytes(user.pk)),
-            "user": user,
-            "token": default_token_generator.make_token(user),
+            "uid": uid,
+            "token": token,
             "protocol": 'http',
-            "url": f"{request._current_scheme_host}/api/app/auth/verifyuser/{urlsafe_b64encode(force_bytes(user.pk)).decode('utf-8')}/{default_token_generator.make_token(user)}/",
+            "url": f"{request._current_scheme_host}/api/app/auth/verifyuser/{uid}/{token}/",
         }
 
-        t = threading.Thread(target=send_welcome_mail, args=[user.email, context])
-        t.setDaemon(True)
-        t.start()      
+        send_welcome_mail(user.email, context)
 
     def add_user_to_group(self, user):
         """
         Adds the user to the 'user' group. If the group doesn't exist, it will be created.
+        The group id is resolved once per process and the membership row is inserted directly.
         """
-        group, created = Group.objects.get_or_create(name='user')
-        group.user_set.add(user)
+        membership = User.groups.through
+        membership.objects.create(user_id=user.pk, group_id=get_group_id('user'))
 
-class UserVerification(nBaseViewset):
+class UserVerification(nAsyncBaseViewset):
     """
     API ViewSet to handle user email verification using the token sent during registration.
     It verifies the token and updates the user's verified status accordingly.
@@ -132,14 +150,14 @@ class UserVerification(nBaseViewset):
     http_method_names = ['post']
     
     
-    def get_user(self, uidb64):
+    async def get_user(self, uidb64):
         """
         Decodes the base64-encoded user ID and retrieves the corresponding user object.
         """
         try:
             # urlsafe_base64_decode() decodes to bytestring
             uid = urlsafe_base64_decode(uidb64).decode()
-            user = User._default_manager.get(pk=uid)
+            user = await User._default_manager.aget(pk=uid)
         except (TypeError, ValueError, OverflowError, User.DoesNotExist, ValidationError):
             user = None
         return user
@@ -155,7 +173,7 @@ class UserVerification(nBaseViewset):
         tags=['User Authentication']
 
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """
         Verifies the user's email using the provided token. If the token is valid, 
         the user's verified status is updated.
@@ -164,7 +182,7 @@ class UserVerification(nBaseViewset):
             data = request.data
             uid = data['uid']
             token = data['token']
-            user = self.get_user(uid)
+            user = await self.get_user(uid)
             if not user:
                 return ResponseHandler.failure(
                     message=EXPIRED_TOKEN,
@@ -178,7 +196,7 @@ class UserVerification(nBaseViewset):
 
             if default_token_generator.check_token(user, token):
                 user.is_verified = True
-                user.save()
+                await user.asave()
                 return ResponseHandler.success(
                     message=ACCOUNT_VERIFIED_SUCCESSFULLY
                 )
@@ -0,0 +1,127 @@
+import csv
+import json
+import time
+import zlib
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.users.importer import IMPORT_FORMATS
+
+EXPORT_FORMATS = IMPORT_FORMATS
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+# Columns of an export; `email`, `first_name` and `last_name` read back with `import_users`.
+EXPORT_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'phone_number', 'user_type', 'device_type',
+    'is_active', 'is_verified', 'created_at',
+)
+
+
+class Echo:
+    """
+    A file-like object whose `write` returns the line, so `csv.writer` encodes one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+# A cell starting with one of these is run as a formula by spreadsheet apps.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Quoted so a name like "=HYPERLINK(...)" opens as text (CSV injection).
+        return f"'{value}"
+    return value
+
+
+class UserExporter:
+    """
+    Streams users as CSV or JSONL without holding them in memory.
+
+    Rows are read with `values_list` (no model instances) through
+    `QuerySet.iterator(chunk_size)`, which fetches `chunk_size` rows at a time
+    (with a server-side cursor on PostgreSQL). Encoded lines are joined into
+    blocks of about `buffer_size` bytes, optionally gzipped as they go; the
+    first block is sent as soon as the first line is ready. Memory use depends
+    on `chunk_size` and `buffer_size`, not on the number of users.
+    """
+
+    def __init__(self, fields=EXPORT_FIELDS, chunk_size=None, buffer_size=64 * 1024):
+        self.fields = fields
+        self.chunk_size = chunk_size or settings.USER_EXPORT_CHUNK_SIZE
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def values(self, queryset):
+        # (created_at, id) is indexed, so the export is read in a stable order without a sort.
+        return queryset.order_by('created_at', 'id').values_list(*self.fields).iterator(chunk_size=self.chunk_size)
+
+    def lines(self, queryset, fmt):
+        """
+        Yields the export one encoded line (str) at a time.
+        """
+        if fmt == 'csv':
+            writer = csv.writer(Echo())
+            yield writer.writerow(self.fields)
+            for row in self.values(queryset):
+                self.rows += 1
+                yield writer.writerow([csv_value(value) for value in row])
+        elif fmt == 'jsonl':
+            for row in self.values(queryset):
+                self.rows += 1
+                yield json.dumps(dict(zip(self.fields, row)), cls=DjangoJSONEncoder) + '\n'
+        else:
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+    def stream(self, queryset, fmt, compress=False):
+        """
+        Yields the export as blocks of bytes, gzip-compressed when `compress` is set.
+        """
+        # wbits=31 writes a gzip (not zlib) container.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer, size, first = [], 0, True
+        for line in self.lines(queryset, fmt):
+            buffer.append(line)
+            size += len(line)
+            if first or size >= self.buffer_size:
+                yield self.encode(buffer, compressor)
+                buffer, size, first = [], 0, False
+        if buffer or compressor is not None:
+            block = self.encode(buffer, compressor)
+            yield block + compressor.flush() if compressor is not None else block
+
+    async def astream(self, queryset, fmt, compress=False):
+        """
+        Async `stream` for ASGI: each block is built in the sync thread (where
+        the query's cursor lives) and sent before the next one is read.
+        Django would otherwise consume a sync iterator whole before sending it.
+        """
+        blocks = self.stream(queryset, fmt, compress=compress)
+        next_block = sync_to_async(next, thread_sensitive=True)
+        while True:
+            block = await next_block(blocks, None)
+            if block is None:
+                return
+            yield block
+
+    @staticmethod
+    def encode(lines, compressor):
+        data = ''.join(lines).encode('utf-8')
+        if compressor is None:
+            return data
+        # A sync flush lets the client decompress each block as soon as it arrives.
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
@@ -0,0 +1,13 @@
+import django_filters
+
+from apps.users.models import User
+
+
+class UserDirectoryFilter(django_filters.FilterSet):
+    """
+    Equality filters of the admin user directory; each one leads a (created_at, id) index.
+    """
+
+    class Meta:
+        model = User
+        fields = ['is_verified', 'is_active', 'user_type', 'device_type']
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import Group
+
+# Group name -> primary key, resolved once per process.
+_group_ids = {}
+
+
+def get_group_id(name):
+    """
+    Returns the primary key of the named group, creating the group on first use.
+
+    The id is cached for the life of the process (and dropped by the Group
+    signals in `apps.users.signals`), so hot paths such as signup can insert
+    membership rows without looking the group up. Concurrent first calls
+    simply resolve the same id twice.
+    """
+    group_id = _group_ids.get(name)
+    if group_id is None:
+        group_id = Group.objects.get_or_create(name=name)[0].pk
+        _group_ids[name] = group_id
+    return group_id
+
+
+def forget_group_ids():
+    """
+    Drops every cached group id.
+    """
+    _group_ids.clear()
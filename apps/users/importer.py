@@ -0,0 +1,270 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from apps.users.groups import get_group_id
+from apps.users.models import User, UserSearchTerm
+from apps.users.search import search_terms_for
+from core.hashing import get_hashing_executor
+from core.mail_handler.outbox import enqueue_many
+from core.validators.email_password_validator import password_check, validate_email
+
+WELCOME_TEMPLATE = 'email/welcome_imported.html'
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(name, default='csv'):
+    """
+    Guesses the import format from a file name.
+    """
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def iter_rows(stream, fmt):
+    """
+    Yields (line number, row dict) from a text stream without loading it in memory.
+
+    Args:
+        stream: A text file object.
+        fmt (str): 'csv' (with a header row) or 'jsonl' (one object per line).
+    """
+    if fmt == 'csv':
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            yield line, row
+    elif fmt == 'jsonl':
+        for line, raw in enumerate(stream, start=1):
+            if raw.strip():
+                try:
+                    row = json.loads(raw)
+                except ValueError:
+                    row = None
+                yield line, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def text_field(row, name):
+    """
+    Returns a text column of a row, '' when missing.
+
+    Raises:
+        ValueError: If the value is not a string (e.g. a number in a JSONL row).
+    """
+    value = row.get(name)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string.")
+    return value
+
+
+class ImportReport:
+    """
+    Counters for one import run.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows(self):
+        return self.created + self.skipped + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self, max_errors=100):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "skipped": self.skipped,
+            "failed": len(self.errors),
+            "errors": [{"line": line, "error": error} for line, error in self.errors[:max_errors]],
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+class UserImporter:
+    """
+    Creates users in bulk from CSV or JSONL rows.
+
+    Rows are processed in chunks. Each chunk:
+    - is validated with the signup validators,
+    - drops emails already in the file or the database (one query),
+    - has its passwords hashed across the hashing executor's processes,
+    - is written with one `bulk_create` for the users, one for their 'user'
+      group membership, one for their search terms and one for their welcome
+      mails, in a single transaction.
+
+    Rows: email (required), first_name, last_name, password. Imported users
+    are active and verified. Users without a password get an unusable one;
+    the welcome mail sends them to "forgot password" to choose it, and never
+    carries a password.
+    """
+
+    def __init__(self, chunk_size=1000, executor=None, send_mail=True, base_url=None):
+        self.chunk_size = chunk_size
+        self.executor = executor or get_hashing_executor()
+        self.send_mail = send_mail
+        self.base_url = base_url or settings.BASE_URL
+        self.group_id = None
+        self.seen = set()
+
+    def run(self, stream, fmt, report=None, progress=None):
+        """
+        Imports every row of `stream`, calling `progress(report)` after each chunk.
+
+        Returns:
+            ImportReport: The counts, errors and throughput of the run.
+        """
+        report = report or ImportReport()
+        self.group_id = get_group_id('user')
+        rows = iter_rows(stream, fmt)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk, report)
+            report.elapsed = time.perf_counter() - report.started
+            if progress is not None:
+                progress(report)
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+    def clean_row(self, row):
+        """
+        Validates a row and returns (email, first_name, last_name, password).
+        `password` is None when the row has none.
+
+        Raises:
+            ValueError: If the row is not usable.
+        """
+        if row is None:
+            raise ValueError("Malformed row.")
+        email = User.objects.normalize_email(text_field(row, 'email').strip())
+        validate_email(email)
+        password = text_field(row, 'password') or None
+        if password:
+            password_check(password)
+        first_name = text_field(row, 'first_name').strip()[:150]
+        last_name = text_field(row, 'last_name').strip()[:150]
+        return email, first_name, last_name, password
+
+    def import_chunk(self, chunk, report):
+        valid = []
+        for line, row in chunk:
+            try:
+                cleaned = self.clean_row(row)
+            except ValueError as error:
+                report.errors.append((line, str(error)))
+                continue
+            key = cleaned[0].lower()
+            if key in self.seen:
+                report.skipped += 1
+                continue
+            self.seen.add(key)
+            valid.append(cleaned)
+
+        valid = self.drop_existing(valid, report)
+        if not valid:
+            return
+        given = [password for *_, password in valid if password]
+        hashes = dict(zip(given, self.executor.hash_many(given)))
+        encoded = {email: hashes[password] if password else make_password(None) for email, *_, password in valid}
+        try:
+            self.write(valid, encoded)
+        except IntegrityError:
+            # A user signed up with one of the emails since `drop_existing`.
+            valid = self.drop_existing(valid, report)
+            try:
+                self.write(valid, encoded)
+            except IntegrityError:
+                # Still taken (the unique index matches emails `drop_existing` did not).
+                valid = self.write_each(valid, encoded, report)
+        report.created += len(valid)
+
+    def drop_existing(self, valid, report):
+        """
+        Returns the rows whose email is not taken yet, counting the others as skipped (one query).
+        """
+        if not valid:
+            return valid
+        # Compared case-insensitively: MySQL's collation matches `A@x.com` for `a@x.com`.
+        existing = {
+            email.lower()
+            for email in User.objects.filter(email__in=[email for email, *_ in valid]).values_list('email', flat=True)
+        }
+        if existing:
+            report.skipped += sum(1 for email, *_ in valid if email.lower() in existing)
+            valid = [cleaned for cleaned in valid if cleaned[0].lower() not in existing]
+        return valid
+
+    def write_each(self, valid, encoded, report):
+        """
+        Writes the rows one at a time, counting those whose email is taken as skipped.
+
+        Returns:
+            list: The rows written.
+        """
+        written = []
+        for cleaned in valid:
+            try:
+                self.write([cleaned], encoded)
+            except IntegrityError:
+                report.skipped += 1
+            else:
+                written.append(cleaned)
+        return written
+
+    def write(self, valid, encoded):
+        """
+        Inserts the users of a chunk with their group memberships, search terms and mails.
+        """
+        users = [
+            User(
+                email=email,
+                first_name=first_name,
+                last_name=last_name,
+                password=encoded[email],
+                is_active=True,
+                is_verified=True,
+            )
+            for email, first_name, last_name, _ in valid
+        ]
+        membership = User.groups.through
+        with transaction.atomic():
+            # UUID primary keys are set client-side, so the ids are known without RETURNING.
+            User.objects.bulk_create(users, batch_size=self.chunk_size)
+            membership.objects.bulk_create(
+                [membership(user_id=user.pk, group_id=self.group_id) for user in users],
+                batch_size=self.chunk_size,
+            )
+            UserSearchTerm.objects.bulk_create(
+                search_terms_for((user.pk, user.email, user.first_name, user.last_name) for user in users),
+                batch_size=self.chunk_size,
+            )
+            if self.send_mail:
+                # No password in the mail: it would sit in the outbox until delivered.
+                enqueue_many(
+                    (
+                        (email, {"subject": "Welcome Email", "email": email, "url": self.base_url}, WELCOME_TEMPLATE)
+                        for email, *_ in valid
+                    ),
+                    batch_size=self.chunk_size,
+                )
@@ -0,0 +1,124 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, modify_settings, override_settings
+from django.urls import include, path
+from rest_framework import routers, status
+
+from apps.users.models import AuthToken, User
+from apps.users.serializers import UpdateUserSerializer
+from apps.users.views import ManageProfile
+from core.baseviewset.viewset import aBaseViewset
+from core.middleware.permission_sync import sync_group_permissions
+from core.response_handler.handler import ResponseHandler
+from utils.messages import DETAILS_FETCH_SUCCESSFULLY
+
+
+class SyncManageProfile(aBaseViewset):
+    """
+    The profile endpoint as it was before the async port, for comparison.
+    """
+    queryset = User.objects
+    serializer_class = UpdateUserSerializer
+    http_method_names = ['get']
+
+    def list(self, request, *args, **kwargs):
+        user = self.queryset.get(id=request.user.id)
+        return ResponseHandler.success(
+            data=self.serializer_class(user).data,
+            message=DETAILS_FETCH_SUCCESSFULLY,
+            status_code=status.HTTP_200_OK
+        )
+
+
+router = routers.SimpleRouter()
+router.register(r'sync_profile', SyncManageProfile, basename='benchmark-sync-profile')
+router.register(r'async_profile', ManageProfile, basename='benchmark-async-profile')
+
+# Used as ROOT_URLCONF while the benchmark runs.
+urlpatterns = [
+    path('api/', include(router.urls)),
+]
+
+
+def summarize(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return (
+        f"{label:<18} {len(latencies) / elapsed:>9,.0f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms  p99={p99 * 1000:.2f}ms"
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare requests/s and p99 latency of the profile endpoint on WSGI, ASGI with sync views and ASGI-native views."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients (threads for WSGI, tasks for ASGI).")
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(email='benchmark-async-views@example.com', password='Benchmark@1234?')
+        group, _ = Group.objects.get_or_create(name='user')
+        group.user_set.add(user)
+        sync_group_permissions([group])
+        token = AuthToken.objects.create(user=user)
+        headers = {'Authorization': f'Bearer {token.key}'}
+
+        try:
+            with override_settings(ROOT_URLCONF=__name__), \
+                    modify_settings(MIDDLEWARE={'remove': 'silk.middleware.SilkyMiddleware'}):
+                requests, concurrency = options['requests'], options['concurrency']
+                self.stdout.write(f"{requests} requests per scenario, concurrency={concurrency}")
+                self.stdout.write(summarize(
+                    "wsgi",
+                    *self.run_wsgi('/api/sync_profile/', headers, requests, concurrency),
+                ))
+                self.stdout.write(summarize(
+                    "asgi + sync view",
+                    *asyncio.run(self.run_asgi('/api/sync_profile/', headers, requests, concurrency)),
+                ))
+                self.stdout.write(summarize(
+                    "asgi-native",
+                    *asyncio.run(self.run_asgi('/api/async_profile/', headers, requests, concurrency)),
+                ))
+        finally:
+            user.delete()
+
+    def run_wsgi(self, path, headers, requests, concurrency):
+        """
+        Drives the WSGI handler from a pool of threads, like a threaded WSGI server.
+        """
+        def call(_):
+            started = time.perf_counter()
+            response = Client().get(path, headers=headers)
+            assert response.status_code == 200, response.content
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, range(requests)))
+        return latencies, time.perf_counter() - started
+
+    async def run_asgi(self, path, headers, requests, concurrency):
+        """
+        Drives the ASGI handler from `concurrency` tasks on one event loop.
+        """
+        client = AsyncClient()
+        latencies = []
+        pending = iter(range(requests))
+
+        async def worker():
+            for _ in pending:
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.content
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, time.perf_counter() - started
@@ -0,0 +1,97 @@
+import asyncio
+import multiprocessing
+import queue
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.channel_layers import UnixSocketChannelLayer
+
+GROUP = 'benchmark'
+
+
+def receive_group(path, count, ready, results):
+    """
+    Worker process: joins the group and reports (seq, receive time) of each message it gets.
+    """
+    async def run():
+        layer = UnixSocketChannelLayer(path=path, capacity=count)
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP, channel)
+        ready.set()
+        received = []
+        try:
+            while len(received) < count:
+                message = await asyncio.wait_for(layer.receive(channel), 5)
+                received.append((message['seq'], time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        await layer.close()
+        results.put(received)
+
+    asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = "Measure group_send throughput and fan-out latency of the Unix socket channel layer across processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help="Receiving worker processes.")
+        parser.add_argument('--messages', type=int, default=10000, help="Messages sent to the group.")
+        parser.add_argument('--payload', type=int, default=200, help="Bytes of data per message.")
+
+    async def send_all(self, path, count, payload):
+        layer = UnixSocketChannelLayer(path=path)
+        sent_at = []
+        for seq in range(count):
+            sent_at.append(time.monotonic())
+            await layer.group_send(GROUP, {'type': 'benchmark', 'seq': seq, 'data': payload})
+        await layer.close()
+        return sent_at
+
+    def handle(self, *args, **options):
+        count, processes = options['messages'], options['processes']
+        payload = 'x' * options['payload']
+        with tempfile.TemporaryDirectory(dir='/tmp') as path:
+            results = multiprocessing.Queue()
+            workers = []
+            for _ in range(processes):
+                ready = multiprocessing.Event()
+                worker = multiprocessing.Process(target=receive_group, args=(path, count, ready, results))
+                worker.start()
+                ready.wait(10)
+                workers.append(worker)
+
+            sent_at = asyncio.run(self.send_all(path, count, payload))
+            send_time = sent_at[-1] - sent_at[0] if count > 1 else 0
+            received = []
+            for _ in workers:
+                try:
+                    received.append(results.get(timeout=30))
+                except queue.Empty:
+                    received.append([])
+            for worker in workers:
+                worker.join()
+
+        # Fan-out latency: from the send of a message until the last process got it.
+        last_receipt = {}
+        for receipts in received:
+            for seq, at in receipts:
+                last_receipt[seq] = max(at, last_receipt.get(seq, at))
+        delivered = sum(len(receipts) for receipts in received)
+        latencies = sorted((at - sent_at[seq]) * 1000 for seq, at in last_receipt.items())
+        finished = max(last_receipt.values(), default=sent_at[-1])
+
+        self.stdout.write(f"{processes} processes, {count:,} messages of {options['payload']} bytes")
+        self.stdout.write(f"group_send     {count / max(send_time, 1e-9):>10,.0f} messages/s")
+        self.stdout.write(
+            f"delivered      {delivered / max(finished - sent_at[0], 1e-9):>10,.0f} messages/s"
+            f"  ({delivered:,} of {count * processes:,})"
+        )
+        if latencies:
+            self.stdout.write(
+                f"fan-out        p50 {statistics.median(latencies):>7.2f} ms"
+                f"  p99 {latencies[int(len(latencies) * 0.99) - 1]:>7.2f} ms"
+            )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from core.mail_handler.renderer import MailTemplateRenderer
+
+
+class Command(BaseCommand):
+    help = "Measure forgot-password email rendering throughput with and without the compiled renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help="Number of emails to render.")
+        parser.add_argument('--template', default='email/forgot_password.html')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        template_name = options['template']
+        contexts = [
+            {"subject": "Forgot Password mail", "code": 100000 + i % 900000, "email": f"user{i}@example.com"}
+            for i in range(min(count, 1000))
+        ]
+        renderer = MailTemplateRenderer()
+        renderer.precompile([template_name])
+
+        for label, render in (
+            ("render_to_string", lambda context: render_to_string(template_name, context)),
+            ("compiled", lambda context: renderer.render(template_name, context)),
+        ):
+            started = time.perf_counter()
+            for i in range(count):
+                render(contexts[i % len(contexts)])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<17} {count} emails in {elapsed:.2f}s -> {count / elapsed:,.0f} emails/s"
+            )
@@ -0,0 +1,66 @@
+import hashlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+from PIL import Image
+
+from core.storage import ContentAddressedStorage
+from core.storage.views import serve_media
+
+
+class Command(BaseCommand):
+    help = "Compare worker time and bytes sent through the worker per avatar fetch, per media serving strategy."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fetches', type=int, default=2000, help="Fetches per scenario.")
+        parser.add_argument('--side', type=int, default=256, help="Avatar width and height in pixels.")
+
+    def avatar(self, root, side):
+        buffer = io.BytesIO()
+        Image.effect_mandelbrot((side, side), (-2, -1.5, 1, 1.5), 100).convert('RGB').save(buffer, 'WEBP', quality=85)
+        content = buffer.getvalue()
+        name = ContentAddressedStorage.hashed_name('users/photos/variants', hashlib.sha256(content).hexdigest(), '.webp')
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), 'wb') as out:
+            out.write(content)
+        return name, len(content)
+
+    def measure(self, fetch, count):
+        timings = []
+        sent = 0
+        for _ in range(count):
+            started = time.perf_counter()
+            response = fetch()
+            body = b''.join(response) if response.streaming else response.content
+            response.close()
+            timings.append((time.perf_counter() - started) * 1000000)
+            sent += len(body)
+        return statistics.mean(timings), sent / count, response.status_code
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        with tempfile.TemporaryDirectory() as root:
+            name, size = self.avatar(root, options['side'])
+            url = f'/media/{name}'
+            etag = f'"{os.path.splitext(os.path.basename(name))[0]}"'
+            self.stdout.write(f"Avatar of {size:,} bytes, {options['fetches']:,} fetches per scenario")
+
+            scenarios = (
+                ("static.serve", lambda: serve(factory.get(url), name, document_root=root)),
+                ("serve_media", lambda: serve_media(factory.get(url), name, document_root=root)),
+                ("revalidated", lambda: serve_media(factory.get(url, HTTP_IF_NONE_MATCH=etag), name, document_root=root)),
+                ("range 0-1023", lambda: serve_media(factory.get(url, HTTP_RANGE='bytes=0-1023'), name, document_root=root)),
+                ("x-accel-redirect", lambda: serve_media(factory.get(url), name, document_root=root)),
+            )
+            for label, fetch in scenarios:
+                with override_settings(MEDIA_OFFLOAD='x-accel-redirect' if label == 'x-accel-redirect' else ''):
+                    worker_time, sent, status = self.measure(fetch, options['fetches'])
+                self.stdout.write(
+                    f"{label:<17} {status}  worker {worker_time:>8.1f} us/fetch  {sent:>9,.0f} bytes/fetch via worker"
+                )
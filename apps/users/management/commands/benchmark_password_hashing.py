@@ -0,0 +1,105 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, modify_settings, override_settings
+from django.urls import include, path
+from rest_framework import routers, status
+
+from apps.users.authentications.login.views import AuthLoginViewSet
+from apps.users.models import User
+from core.baseviewset.viewset import nAsyncBaseViewset
+from core.hashing.executor import InlineHashingExecutor, ProcessPoolHashingExecutor, set_hashing_executor
+from core.response_handler.handler import ResponseHandler
+
+
+class PingViewSet(nAsyncBaseViewset):
+    """
+    A request that does no hashing, to observe how the login flood affects everyone else.
+    """
+    queryset = User.objects.none()
+    http_method_names = ['get']
+
+    async def list(self, request, *args, **kwargs):
+        return ResponseHandler.success(message="pong", status_code=status.HTTP_200_OK)
+
+
+router = routers.SimpleRouter()
+router.register(r'ping', PingViewSet, basename='benchmark-ping')
+router.register(r'login', AuthLoginViewSet, basename='benchmark-login')
+
+# Used as ROOT_URLCONF while the benchmark runs.
+urlpatterns = [
+    path('api/', include(router.urls)),
+]
+
+CREDENTIALS = {'email': 'benchmark-hashing@example.com', 'password': 'Benchmark@1234?'}
+
+
+def p99(latencies):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+class Command(BaseCommand):
+    help = "Measure the p99 of non-login requests during a login flood, hashing inline vs. in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per scenario.")
+        parser.add_argument('--logins', type=int, default=8, help="Concurrent login loops.")
+        parser.add_argument('--probes', type=int, default=4, help="Concurrent non-login request loops.")
+        parser.add_argument('--workers', type=int, default=2, help="Process pool size.")
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(is_verified=True, **CREDENTIALS)
+        try:
+            with override_settings(ROOT_URLCONF=__name__), \
+                    modify_settings(MIDDLEWARE={'remove': 'silk.middleware.SilkyMiddleware'}):
+                for label, executor in (
+                    ("inline", InlineHashingExecutor()),
+                    (f"process pool x{options['workers']}", ProcessPoolHashingExecutor(options['workers'])),
+                ):
+                    set_hashing_executor(executor)
+                    # Start the pool outside the measured window.
+                    executor.hash_password(CREDENTIALS['password'])
+                    for logins in (0, options['logins']):
+                        probe_latencies, login_count = asyncio.run(
+                            self.run(options['duration'], logins, options['probes'])
+                        )
+                        self.stdout.write(
+                            f"{label:<18} logins={logins:<3} "
+                            f"login/s={login_count / options['duration']:>7.1f}  "
+                            f"other requests: p50={statistics.median(probe_latencies) * 1000:.2f}ms "
+                            f"p99={p99(probe_latencies) * 1000:.2f}ms"
+                        )
+        finally:
+            # Fall back to the configured executor.
+            set_hashing_executor(None)
+            user.delete()
+
+    async def run(self, duration, logins, probes):
+        client = AsyncClient()
+        deadline = time.perf_counter() + duration
+        probe_latencies = []
+        login_count = 0
+
+        async def login_loop():
+            nonlocal login_count
+            while time.perf_counter() < deadline:
+                response = await client.post('/api/login/', data=CREDENTIALS)
+                assert response.status_code == 200, response.content
+                login_count += 1
+
+        async def probe_loop():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get('/api/ping/')
+                assert response.status_code == 200, response.content
+                probe_latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(
+            *(login_loop() for _ in range(logins)),
+            *(probe_loop() for _ in range(probes)),
+        )
+        return probe_latencies, login_count
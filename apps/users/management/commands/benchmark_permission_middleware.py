@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware.permission_middleware import PermissionMiddleware
+from core.middleware.permission_sync import state
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_permission_check():
+    """
+    The per-request sync the middleware used to run: one diff per group.
+    """
+    for group in Group.objects.all():
+        missing = set(Permission.objects.all()) - set(group.permissions.all())
+        if missing:
+            group.permissions.add(*missing)
+
+
+class Command(BaseCommand):
+    help = "Compare per-request query count and latency of the legacy and versioned permission sync."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=50, help="Number of groups to create.")
+        parser.add_argument('--requests', type=int, default=200, help="Number of requests to time.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['groups'], options['requests'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, groups, requests):
+        Group.objects.bulk_create([Group(name=f"benchmark-group-{i}") for i in range(groups)])
+        middleware = PermissionMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+
+        # Warm up: first request performs the one-off sync.
+        state.invalidate()
+        middleware(request)
+
+        rows = []
+        for label, call in (
+            ("legacy", legacy_permission_check),
+            ("versioned", lambda: middleware(request)),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                call()
+            started = time.perf_counter()
+            for _ in range(requests):
+                call()
+            elapsed = time.perf_counter() - started
+            rows.append((label, len(queries), elapsed / requests * 1000))
+
+        self.stdout.write(f"groups={Group.objects.count()} permissions={Permission.objects.count()}")
+        for label, query_count, per_request_ms in rows:
+            self.stdout.write(f"{label:<10} queries/request={query_count:<6} ms/request={per_request_ms:.3f}")
@@ -0,0 +1,47 @@
+import io
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+from apps.users.photos import render_variants
+
+
+def camera_photo(width, height):
+    """
+    A JPEG of camera dimensions with gradients and shapes, so it compresses like a photo rather than a flat image.
+    """
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, max(width // 40, 1)):
+        draw.ellipse((i, (i * 7) % height, i + width // 10, (i * 7) % height + height // 10), fill=(i % 256, 90, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compare the bytes served per avatar for the original photo and its variants, and the render time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+
+    def handle(self, *args, **options):
+        original = camera_photo(options['width'], options['height'])
+        source = default_storage.save('users/photos/benchmark-original.jpg', ContentFile(original))
+        names = {}
+        try:
+            started = time.perf_counter()
+            names = render_variants(source)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{'original':<10} {len(original):>10,} bytes")
+            for variant, name in names.items():
+                size = default_storage.size(name)
+                self.stdout.write(f"{variant:<10} {size:>10,} bytes  ({len(original) / size:,.0f}x smaller)")
+            self.stdout.write(f"Rendered {len(names)} variants in {elapsed * 1000:.0f} ms.")
+        finally:
+            for name in [source, *names.values()]:
+                default_storage.delete(name)
@@ -0,0 +1,80 @@
+import time
+from base64 import urlsafe_b64encode
+
+from django.contrib.auth.models import Group
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.encoding import force_bytes
+
+from apps.users.authentications.signup.views import AuthSignupViewSet
+from apps.users.models import MailOutbox, User
+from core.hashing import hash_password
+from utils.send_email import send_welcome_mail
+
+# Hashing is not what is measured here; a cheap hasher keeps the numbers about the writes.
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class LegacySignup(AuthSignupViewSet):
+    """
+    The signup writes as they were before: pre-check, INSERT then UPDATE, group lookup per signup.
+    """
+
+    def register(self, request, data, password):
+        if self.queryset.filter(email=data["email"]).exists():
+            return None
+        with transaction.atomic():
+            user = self.queryset.create(
+                email=data["email"],
+                first_name=data["first_name"],
+                last_name=data.get("last_name", ""),
+                is_active=False,
+                is_staff=False,
+                is_superuser=False,
+            )
+            user.password = password
+            user.save()
+            send_welcome_mail(user.email, {
+                "subject": "Welcome Email",
+                "email": user.email,
+                "uid": urlsafe_b64encode(force_bytes(user.pk)).decode('utf-8'),
+                "token": default_token_generator.make_token(user),
+                "protocol": 'http',
+                "url": f"{request._current_scheme_host}/api/app/auth/verifyuser/"
+                       f"{urlsafe_b64encode(force_bytes(user.pk)).decode('utf-8')}/"
+                       f"{default_token_generator.make_token(user)}/",
+            })
+            group, created = Group.objects.get_or_create(name='user')
+            group.user_set.add(user)
+
+
+class Command(BaseCommand):
+    help = "Compare signups/s and queries per signup of the legacy and current signup writes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=500, help="Signups per scenario.")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().post('/api/auth/signup/')
+        count = options['signups']
+        prefix = 'benchmark-signup-'
+        try:
+            with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+                password = hash_password('Benchmark@1234?')
+                for label, view in (("legacy", LegacySignup()), ("single insert", AuthSignupViewSet())):
+                    emails = [f"{prefix}{label.replace(' ', '-')}-{i}@example.com" for i in range(count)]
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        for email in emails:
+                            view.register(request, {"email": email, "first_name": "Bench"}, password)
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{label:<14} {count / elapsed:>8,.0f} signups/s  "
+                        f"{len(queries) / count:.1f} queries/signup"
+                    )
+        finally:
+            MailOutbox.objects.filter(to__startswith=prefix).delete()
+            User.objects.filter(email__startswith=prefix).delete()
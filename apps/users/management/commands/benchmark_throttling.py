@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+
+from django.core.cache import caches
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, RequestFactory, modify_settings, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from apps.users.authentications.login.views import AuthLoginViewSet
+from apps.users.models import User
+from core.throttling import EmailSlidingWindowThrottle, IPSlidingWindowThrottle
+
+CREDENTIALS = {'email': 'benchmark-throttle@example.com', 'password': 'Wrong@1234?'}
+RATES = {'login_ip': '1/min', 'login_email': '1/min'}
+
+
+class Command(BaseCommand):
+    help = "Compare the cost of a throttled login with an unthrottled failed login."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=100000, help="Throttle checks to time.")
+        parser.add_argument('--requests', type=int, default=200, help="Login requests to time per scenario.")
+
+    def handle(self, *args, **options):
+        # Every request here is a 400 or a 429; keep the request log quiet.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        user = User.objects.create_user(email=CREDENTIALS['email'], password='Benchmark@1234?', is_verified=True)
+        try:
+            with modify_settings(MIDDLEWARE={'remove': 'silk.middleware.SilkyMiddleware'}):
+                with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': RATES}):
+                    self.time_checks(options['checks'])
+                    rejected = asyncio.run(self.time_requests(options['requests']))
+                with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}):
+                    unthrottled = asyncio.run(self.time_requests(options['requests']))
+        finally:
+            caches[settings.THROTTLE_CACHE_ALIAS].clear()
+            user.delete()
+
+        self.stdout.write(f"rejected login request     {rejected * 1000:8.3f} ms/request")
+        self.stdout.write(f"unthrottled failed login   {unthrottled * 1000:8.3f} ms/request")
+
+    def time_checks(self, count):
+        """
+        Times the throttle checks alone, on an identity that is already over its limit.
+        """
+        request = Request(
+            RequestFactory().post('/api/auth/login/', CREDENTIALS, content_type='application/json'),
+            parsers=[JSONParser()],
+        )
+        view = AuthLoginViewSet()
+        throttles = [IPSlidingWindowThrottle(), EmailSlidingWindowThrottle()]
+        for throttle in throttles:
+            throttle.allow_request(request, view)
+
+        started = time.perf_counter()
+        for _ in range(count):
+            for throttle in throttles:
+                assert not throttle.allow_request(request, view)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"rejected throttle check    {elapsed / count * 1e6:8.1f} us/check (ip + email)")
+
+    async def time_requests(self, count):
+        client = AsyncClient()
+        caches[settings.THROTTLE_CACHE_ALIAS].clear()
+        await client.post('/api/auth/login/', data=CREDENTIALS)
+
+        started = time.perf_counter()
+        for _ in range(count):
+            await client.post('/api/auth/login/', data=CREDENTIALS)
+        return (time.perf_counter() - started) / count
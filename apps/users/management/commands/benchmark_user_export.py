@@ -0,0 +1,65 @@
+import csv
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from apps.users.exporter import EXPORT_FIELDS, UserExporter, csv_value
+from apps.users.models import User
+
+
+def materialized_export(queryset):
+    """
+    The export as it would be written naively: every user loaded, then one CSV document.
+    """
+    users = list(queryset.order_by('created_at', 'id'))
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_FIELDS)
+    for user in users:
+        writer.writerow([csv_value(getattr(user, field)) for field in EXPORT_FIELDS])
+    yield out.getvalue().encode('utf-8')
+
+
+class Command(BaseCommand):
+    help = "Compare time to first byte, total time and peak memory of a materialized and a streamed user export."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help="Users created for the run.")
+
+    def measure(self, blocks):
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        for block in blocks:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(block)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return first_byte, elapsed, peak, size
+
+    def handle(self, *args, **options):
+        prefix = 'benchmark-export-'
+        count = options['users']
+        User.objects.bulk_create(
+            [User(email=f"{prefix}{i}@example.com", first_name="Bench", last_name=str(i)) for i in range(count)],
+            batch_size=1000,
+        )
+        try:
+            queryset = User.objects.filter(email__startswith=prefix)
+            for label, blocks in (
+                ("materialized", materialized_export(queryset)),
+                ("streamed", UserExporter().stream(queryset, 'csv')),
+                ("streamed gzip", UserExporter().stream(queryset, 'csv', compress=True)),
+            ):
+                first_byte, elapsed, peak, size = self.measure(blocks)
+                self.stdout.write(
+                    f"{label:<14} first byte {first_byte * 1000:>8.1f} ms  total {elapsed:>6.2f}s  "
+                    f"peak {peak / 2 ** 20:>7.1f} MiB  {size / 2 ** 20:>6.1f} MiB out"
+                )
+        finally:
+            User.objects.filter(email__startswith=prefix).delete()
@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.users.management.commands.purge_expired_tokens import purge_in_batches
+from apps.users.models import User, UserSearchTerm
+from apps.users.search import search_terms_for, search_users
+
+FIRST_NAMES = ['Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken', 'Frances', 'Edsger',
+               'Radia', 'Donald', 'Sophie', 'John', 'Hedy', 'Tim', 'Katherine', 'Guido', 'Anita', 'Bjarne']
+LAST_NAMES = ['Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov', 'Thompson', 'Allen',
+              'Dijkstra', 'Perlman', 'Knuth', 'Wilson', 'McCarthy', 'Lamarr', 'Lee', 'Johnson', 'Rossum', 'Borg',
+              'Stroustrup']
+
+
+class Command(BaseCommand):
+    help = "Compare p50/p99 latency of type-ahead user search with icontains and with the prefix index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help="Users created for the run.")
+        parser.add_argument('--queries', type=int, default=200, help="Searches per scenario.")
+        parser.add_argument('--limit', type=int, default=10, help="Matches returned per search.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Users inserted per statement.")
+
+    def seed(self, count, batch_size, domain):
+        rng = random.Random(0)
+        for start in range(0, count, batch_size):
+            users = []
+            for i in range(start, min(start + batch_size, count)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                users.append(User(
+                    email=f"{first.lower()}.{last.lower()}{i}@{domain}",
+                    first_name=f"{first}{i % 1000}", last_name=last,
+                ))
+            User.objects.bulk_create(users)
+            UserSearchTerm.objects.bulk_create(
+                search_terms_for((user.pk, user.email, user.first_name, user.last_name) for user in users)
+            )
+
+    def measure(self, search, prefixes):
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            search(prefix)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+    def handle(self, *args, **options):
+        domain = 'bench-search.example.com'
+        count = options['users']
+        limit = options['limit']
+        started = timezone.now()
+        self.stdout.write(f"Seeding {count:,} users on {connection.vendor}...")
+        self.seed(count, options['batch_size'], domain)
+
+        # Half broad name prefixes, half prefixes of one user's email (few matches, so icontains scans).
+        rng = random.Random(1)
+        names = FIRST_NAMES + LAST_NAMES
+        prefixes = [
+            rng.choice(names)[:rng.randint(2, 5)] if turn % 2 else
+            f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}{rng.randrange(count)}"
+            for turn in range(options['queries'])
+        ]
+
+        def icontains(text):
+            return list(User.objects.filter(
+                Q(email__icontains=text) | Q(first_name__icontains=text) | Q(last_name__icontains=text)
+            )[:limit])
+
+        try:
+            for label, search in (
+                ("icontains", icontains),
+                ("prefix index", lambda text: search_users(text, limit)),
+            ):
+                p50, p99 = self.measure(search, prefixes)
+                self.stdout.write(f"{label:<13} p50 {p50:>8.2f} ms  p99 {p99:>8.2f} ms")
+        finally:
+            purge_in_batches(
+                User.objects.filter(created_at__gte=started, email__endswith=f'@{domain}'), options['batch_size']
+            )
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.users.models import AuthToken, User
+
+# Table of rest_framework.authtoken's Token, which AuthToken replaced.
+LEGACY_TABLE = 'authtoken_token'
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the tokens of rest_framework.authtoken into AuthToken, so existing sessions survive the upgrade. "
+        "Run once after migrating; the legacy table can be dropped afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Tokens inserted per statement.")
+
+    def handle(self, *args, **options):
+        if LEGACY_TABLE not in connection.introspection.table_names():
+            self.stdout.write(f"No {LEGACY_TABLE} table; nothing to copy.")
+            return
+
+        # A legacy token expired AUTH_TOKEN_LIFETIME after the user's last login.
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            quote = connection.ops.quote_name
+            # `key` is a reserved word on MySQL.
+            cursor.execute(f"SELECT {quote('key')}, {quote('user_id')} FROM {quote(LEGACY_TABLE)}")
+            rows = [(key, User._meta.pk.to_python(user_id)) for key, user_id in cursor.fetchall()]
+        last_logins = dict(User.objects.filter(pk__in=[user_id for _, user_id in rows]).values_list('pk', 'last_login'))
+        tokens = [
+            AuthToken(key=key, user_id=user_id, expires_at=(last_logins[user_id] or now) + settings.AUTH_TOKEN_LIFETIME)
+            for key, user_id in rows
+            if user_id in last_logins
+        ]
+        live = [token for token in tokens if token.expires_at > now]
+        # Users who already logged in since the upgrade keep their new token.
+        AuthToken.objects.bulk_create(live, batch_size=options['batch_size'], ignore_conflicts=True)
+        self.stdout.write(f"Copied {len(live)} of {len(rows)} legacy tokens ({len(rows) - len(live)} expired).")
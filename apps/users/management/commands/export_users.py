@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.exporter import EXPORT_FORMATS, UserExporter
+from apps.users.importer import detect_format
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Stream every user to a CSV or JSONL file (or stdout) in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, '-' for stdout. A '.gz' suffix implies --gzip.")
+        parser.add_argument('--format', choices=EXPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip.")
+        parser.add_argument('--chunk-size', type=int, help="Rows fetched per database round trip.")
+        parser.add_argument('--active', action='store_true', help="Only active users.")
+        parser.add_argument('--verified', action='store_true', help="Only verified users.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        compress = options['gzip'] or path.endswith('.gz')
+        fmt = options['format'] or detect_format(path[:-3] if path.endswith('.gz') else path)
+
+        queryset = User.objects.all()
+        if options['active']:
+            queryset = queryset.filter(is_active=True)
+        if options['verified']:
+            queryset = queryset.filter(is_verified=True)
+
+        exporter = UserExporter(chunk_size=options['chunk_size'])
+        try:
+            stream = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        except OSError as error:
+            raise CommandError(str(error))
+        try:
+            for block in exporter.stream(queryset, fmt, compress=compress):
+                stream.write(block)
+        finally:
+            if path == '-':
+                stream.flush()
+            else:
+                stream.close()
+
+        # Keep stdout clean for the export itself.
+        report = self.stderr if path == '-' else self.stdout
+        rate = exporter.rows / exporter.elapsed if exporter.elapsed else 0.0
+        report.write(f"Exported {exporter.rows} users in {exporter.elapsed:.2f}s ({rate:,.0f} rows/s).")
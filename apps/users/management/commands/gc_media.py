@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.media_files import collect_garbage, recount
+
+
+class Command(BaseCommand):
+    help = "Delete stored media files that nothing has referenced for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=settings.MEDIA_GC_GRACE_HOURS,
+                            help="Hours a file must have been unreferenced before it is deleted.")
+        parser.add_argument('--recount', action='store_true',
+                            help="Recompute the reference counts from the users table first.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted.")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f"{recount()} files referenced.")
+        files, freed = collect_garbage(timedelta(hours=options['grace_hours']), dry_run=options['dry_run'])
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {files} unreferenced files ({freed / 2 ** 20:,.1f} MiB).")
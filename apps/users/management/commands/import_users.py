@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.importer import IMPORT_FORMATS, UserImporter, detect_format
+from core.hashing.executor import ProcessPoolHashingExecutor
+
+
+class Command(BaseCommand):
+    help = "Create users in bulk from a CSV or JSONL file (email, first_name, last_name, password)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows validated, hashed and inserted together.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Password hashing processes.")
+        parser.add_argument('--no-mail', action='store_true', help="Do not queue welcome mails.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+
+        executor = ProcessPoolHashingExecutor(workers=options['workers'])
+        importer = UserImporter(
+            chunk_size=options['chunk_size'],
+            executor=executor,
+            send_mail=not options['no_mail'],
+        )
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                report = importer.run(
+                    stream,
+                    options['format'] or detect_format(path),
+                    progress=lambda report: self.stdout.write(
+                        f"{report.rows} rows, {report.rows_per_second:,.0f} rows/s"
+                    ),
+                )
+        finally:
+            executor.shutdown()
+
+        for line, error in report.errors:
+            self.stderr.write(f"line {line}: {error}")
+        self.stdout.write(
+            f"Created {report.created}, skipped {report.skipped} existing, {len(report.errors)} invalid "
+            f"in {report.elapsed:.2f}s ({report.rows_per_second:,.0f} rows/s)."
+        )
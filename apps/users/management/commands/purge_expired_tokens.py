@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.users.models import AuthToken, ForgotPasswordToken, MailOutbox, PhotoUpload
+from core.baseviewset.token_cache import token_cache
+
+
+def purge_in_batches(queryset, batch_size, pause=0, on_deleted=None):
+    """
+    Delete the rows of `queryset` in primary-key batches.
+
+    Each batch is a short, index-driven DELETE, so the purge never holds long
+    locks on a large table. With `on_deleted`, a batch is deleted by a single
+    statement without loading the rows, sending signals or cascading (the
+    model must have no reverse relations), and `on_deleted(pks)` is called
+    after it in place of the `post_delete` receivers.
+
+    Returns:
+        int: The total number of rows deleted.
+    """
+    model = queryset.model
+    if on_deleted is not None and model._meta.related_objects:
+        raise ValueError(f"{model.__name__} has reverse relations; its rows must be deleted with cascades")
+    total = 0
+    while True:
+        batch = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return total
+        if on_deleted is None:
+            deleted, _ = model.objects.filter(pk__in=batch).delete()
+        else:
+            # QuerySet.delete() would load every row to send post_delete, since
+            # receivers are connected. Skipping them is safe here: nothing
+            # cascades (checked above), `on_deleted` does the cache invalidation
+            # the receivers would, and the read-your-writes pinning they also do
+            # only matters to the request that made the write. Django has no
+            # public single-statement delete, hence the private `_raw_delete`.
+            deleted = model.objects.filter(pk__in=batch)._raw_delete(queryset.db)
+            on_deleted(batch)
+        total += deleted
+        if pause:
+            time.sleep(pause)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired authentication and forgot-password tokens, abandoned photo uploads and old outbox mails "
+        "in bounded batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        targets = (
+            # Expired tokens are gone from the token cache once deleted; skipping
+            # the per-row signal lets each batch be a single DELETE.
+            ("auth tokens", AuthToken.objects.filter(expires_at__lte=now), token_cache.invalidate_many),
+            ("forgot password tokens", ForgotPasswordToken.objects.filter(expiry_time__lte=now), None),
+            ("photo uploads", PhotoUpload.objects.filter(expires_at__lte=now), None),
+            # Finished mails; available_at is when a row was last queued or given up on.
+            ("outbox mails", MailOutbox.objects.filter(
+                status__in=[MailOutbox.STATUS_SENT, MailOutbox.STATUS_FAILED],
+                available_at__lte=now - settings.MAIL_OUTBOX_RETENTION,
+            ), None),
+        )
+        for label, queryset, on_deleted in targets:
+            deleted = purge_in_batches(queryset, options['batch_size'], options['pause'], on_deleted)
+            self.stdout.write(f"Deleted {deleted} expired {label}.")
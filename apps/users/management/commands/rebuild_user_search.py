@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the user prefix search terms from the users table (e.g. after bulk updates that skip signals)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Users read and indexed together.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = rebuild_index(
+            chunk_size=options['chunk_size'],
+            progress=lambda users: self.stdout.write(f"{users} users indexed"),
+        )
+        elapsed = time.perf_counter() - started
+        rate = users / elapsed if elapsed else 0.0
+        self.stdout.write(f"Indexed {users} users in {elapsed:.2f}s ({rate:,.0f} users/s).")
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.mail_handler.outbox import MailOutboxWorker, queue_depth
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the mail outbox using a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.MAIL_WORKER_CONCURRENCY, help="Number of worker threads.")
+        parser.add_argument('--batch-size', type=int, default=settings.MAIL_WORKER_BATCH_SIZE, help="Rows claimed per batch.")
+        parser.add_argument('--max-attempts', type=int, default=settings.MAIL_WORKER_MAX_ATTEMPTS, help="Attempts before a mail is marked as failed.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--report-every', type=float, default=30.0, help="Seconds between queue depth reports.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.worker = MailOutboxWorker(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts'],
+        )
+
+        if options['once']:
+            sent, failed = self.drain()
+            self.stdout.write(f"Sent {sent}, failed {failed}.")
+            self.report()
+            return
+
+        threads = [
+            threading.Thread(target=self.loop, args=[options['interval']], name=f"mail-worker-{i}", daemon=True)
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {len(threads)} mail worker(s).")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                self.report()
+                self.stop.wait(options['report_every'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping mail workers...")
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def drain(self):
+        """
+        Delivers batches until the queue has nothing deliverable left.
+        """
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.worker.run_once()
+            if not sent and not failed:
+                return total_sent, total_failed
+            total_sent += sent
+            total_failed += failed
+
+    def loop(self, interval):
+        """
+        Worker thread body: deliver batches, sleep while the queue is empty.
+        """
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    sent, failed = self.worker.run_once()
+                except Exception as error:
+                    self.stderr.write(f"Mail worker error: {error}")
+                    sent = failed = 0
+                if not sent and not failed:
+                    self.stop.wait(interval)
+        finally:
+            close_old_connections()
+
+    def report(self):
+        depth = queue_depth()
+        self.stdout.write(
+            f"[{time.strftime('%H:%M:%S')}] queue depth: "
+            + ", ".join(f"{status}={count}" for status, count in depth.items())
+        )
@@ -0,0 +1,74 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.users.photos import PhotoWorker
+
+
+class Command(BaseCommand):
+    help = "Render queued profile photo variants using a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of worker threads.")
+        parser.add_argument('--batch-size', type=int, default=settings.PHOTO_WORKER_BATCH_SIZE, help="Jobs claimed per batch.")
+        parser.add_argument('--max-attempts', type=int, default=settings.PHOTO_WORKER_MAX_ATTEMPTS, help="Attempts before a job is marked as failed.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.worker = PhotoWorker(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+
+        if options['once']:
+            done, failed = self.drain()
+            self.stdout.write(f"Rendered {done}, failed {failed}.")
+            return
+
+        threads = [
+            threading.Thread(target=self.loop, args=[options['interval']], name=f"photo-worker-{i}", daemon=True)
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {len(threads)} photo worker(s).")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                self.stop.wait(1.0)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping photo workers...")
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def drain(self):
+        """
+        Processes batches until the queue has nothing due left.
+        """
+        total_done = total_failed = 0
+        while True:
+            done, failed = self.worker.run_once()
+            if not done and not failed:
+                return total_done, total_failed
+            total_done += done
+            total_failed += failed
+
+    def loop(self, interval):
+        """
+        Worker thread body: process batches, sleep while the queue is empty.
+        """
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    done, failed = self.worker.run_once()
+                except Exception as error:
+                    self.stderr.write(f"Photo worker error: {error}")
+                    done = failed = 0
+                if not done and not failed:
+                    self.stop.wait(interval)
+        finally:
+            close_old_connections()
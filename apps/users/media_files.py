@@ -0,0 +1,116 @@
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.users.models import MediaFile, User
+
+# Shared by every user without a photo; never stored through the storage backend, never counted.
+DEFAULT_PHOTO = User._meta.get_field('profile_photo').default
+
+
+def photo_files(photo, variants):
+    names = set((variants or {}).values())
+    photo = getattr(photo, 'name', photo)
+    if photo and photo != DEFAULT_PHOTO:
+        names.add(photo)
+    return names
+
+
+def referenced_files(user):
+    """
+    Returns the storage names a user points to, or None if its photo columns were not loaded.
+
+    Reads the raw attribute values, so it costs nothing on the `post_init` of every user.
+    """
+    values = user.__dict__
+    if 'profile_photo' not in values or 'profile_photo_variants' not in values:
+        return None
+    return photo_files(values['profile_photo'], values['profile_photo_variants'])
+
+
+def record_file(name, size):
+    """
+    Records a saved file; saving it again restarts its grace period.
+
+    Waits for a `collect_garbage` deleting the file, then records it anew, so
+    the storage writes it again.
+    """
+    if not MediaFile.objects.filter(name=name).update(updated_at=timezone.now()):
+        MediaFile.objects.get_or_create(name=name, defaults={'size': size})
+
+
+def retain(names):
+    if names:
+        MediaFile.objects.filter(name__in=names).update(references=F('references') + 1, updated_at=timezone.now())
+
+
+def release(names):
+    if names:
+        MediaFile.objects.filter(name__in=names).update(references=F('references') - 1, updated_at=timezone.now())
+
+
+def recount(chunk_size=2000):
+    """
+    Recomputes every reference count from the users table, e.g. after bulk
+    updates or admin edits that skipped the signals.
+
+    Returns:
+        int: The number of files referenced at least once.
+    """
+    counts = Counter()
+    rows = User.objects.values_list('profile_photo', 'profile_photo_variants').iterator(chunk_size=chunk_size)
+    for photo, variants in rows:
+        counts.update(photo_files(photo, variants))
+
+    # Walked in name order, one page at a time, since the pages are updated as we go.
+    last = ''
+    while True:
+        chunk = list(MediaFile.objects.filter(name__gt=last).order_by('name').only('name', 'references')[:chunk_size])
+        if not chunk:
+            break
+        changed = []
+        for media_file in chunk:
+            references = counts.get(media_file.name, 0)
+            if media_file.references != references:
+                media_file.references = references
+                changed.append(media_file)
+        MediaFile.objects.bulk_update(changed, ['references'])
+        last = chunk[-1].name
+    return MediaFile.objects.filter(references__gt=0).count()
+
+
+def collect_garbage(grace, dry_run=False, storage=None, batch_size=1000):
+    """
+    Deletes the files nothing has referenced for `grace` (a timedelta).
+
+    The grace period covers files saved but not yet attached to a user, e.g.
+    between the upload and the save of the profile.
+
+    Returns:
+        tuple: The number of files and bytes freed (or that would be, with `dry_run`).
+    """
+    storage = storage or default_storage
+    cutoff = timezone.now() - grace
+    candidates = MediaFile.objects.filter(references__lte=0, updated_at__lt=cutoff)
+    files = freed = 0
+    last = ''
+    while True:
+        batch = list(candidates.filter(name__gt=last).order_by('name').values_list('name', 'size')[:batch_size])
+        if not batch:
+            return files, freed
+        for name, size in batch:
+            if not dry_run:
+                # Re-checked row by row: a file saved or referenced meanwhile is
+                # kept. The row stays locked until the file is gone, so a save of
+                # the same content (`record_file`) waits and writes it again.
+                with transaction.atomic():
+                    deleted, _ = MediaFile.objects.filter(name=name, references__lte=0, updated_at__lt=cutoff).delete()
+                    if not deleted:
+                        continue
+                    storage.delete(name)
+            files += 1
+            freed += size
+        last = batch[-1][0]
@@ -1,5 +1,9 @@
 from django.contrib.auth.models import BaseUserManager, AbstractUser
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+import binascii
+import os
 import uuid
 from django.utils.translation import gettext_lazy as _
 from utils.choices import SocialChoices
@@ -56,11 +60,15 @@ class User(AbstractUser):
         ('O', 'O'),
         ('X', 'X'),
     )
+    # User types allowed on the admin endpoints (SuperAdmin, CompanyAdmin).
+    ADMIN_USER_TYPES = (1, 2)
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     profile_photo = models.ImageField(
         upload_to='users/photos/', default="user.png", null=True, blank=True, verbose_name=_("Profile Photo")
     )
+    # Storage names of the resized copies of `profile_photo`, by variant; filled by the photo worker.
+    profile_photo_variants = models.JSONField(default=dict, blank=True)
     phone_number = models.CharField(max_length=12, null=True, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     is_verified = models.BooleanField(default=False)
@@ -79,9 +87,39 @@ class User(AbstractUser):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        # Keyset pagination of the admin directory: (created_at, id), optionally
+        # behind one equality filter.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='user_created_id_idx'),
+            models.Index(fields=['is_active', 'created_at', 'id'], name='user_active_created_idx'),
+            models.Index(fields=['is_verified', 'created_at', 'id'], name='user_verified_created_idx'),
+            models.Index(fields=['user_type', 'created_at', 'id'], name='user_type_created_idx'),
+            models.Index(fields=['device_type', 'created_at', 'id'], name='user_device_created_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
+class UserSearchTerm(models.Model):
+    """
+    One normalized (lowercase, unaccented) search term of a user: the email,
+    first name, last name or full name. Maintained by `apps.users.search`.
+
+    Prefix searches are range scans of the (term, user) index, so the column
+    compares byte-wise: on PostgreSQL and MySQL it gets a binary collation
+    after migrating (`apps.users.search.collate_terms`), which keeps the
+    migrations the same on every engine.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="search_terms")
+    term = models.CharField(max_length=254)
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'user'], name='user_search_term_idx')]
+
+    def __str__(self):
+        return self.term
+
 # Model to store social media information for the user
 class UserSocialProfile(models.Model):
     """
@@ -107,6 +145,45 @@ class UserSocialProfile(models.Model):
     class Meta:
         db_table = "user_social_profiles"
 
+# Model to store API authentication tokens
+class AuthToken(models.Model):
+    """
+    Represents an API authentication token for a user.
+    Stores an explicit, indexed expiry so validity is checked in memory and
+    expired rows can be purged in bulk.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.OneToOneField(
+        User, related_name="auth_token", on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)  # Timestamp for creation
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "auth_tokens"
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        if not self.expires_at:
+            self.expires_at = self.default_expiry()
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    @staticmethod
+    def default_expiry():
+        return timezone.now() + settings.AUTH_TOKEN_LIFETIME
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def __str__(self):
+        return self.key
+
 # Model to store information about password reset tokens
 class ForgotPasswordToken(models.Model):
     """
@@ -115,7 +192,115 @@ class ForgotPasswordToken(models.Model):
     """
     token = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="forgot_password_tokens")
-    expiry_time = models.DateTimeField()
+    expiry_time = models.DateTimeField(db_index=True)
 
     class Meta:
         db_table = "forgot_password_tokens"
+
+# Model to queue outgoing emails for the mail worker
+class MailOutbox(models.Model):
+    """
+    Represents an email waiting to be delivered by `run_mail_worker`.
+    Request handlers only insert rows here, so mail delivery survives worker
+    restarts and is retried with backoff.
+    """
+    STATUS_PENDING = 1
+    STATUS_SENDING = 2
+    STATUS_SENT = 3
+    STATUS_FAILED = 4
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    to = models.EmailField()
+    template_name = models.CharField(max_length=255)
+    context = models.JSONField(default=dict)
+    status = models.IntegerField(choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # Not delivered before this time
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)  # Timestamp for creation
+
+    class Meta:
+        db_table = "mail_outbox"
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+# Model to track a resumable profile photo upload
+class PhotoUpload(models.Model):
+    """
+    A profile photo being uploaded in chunks (see `apps.users.photos`).
+    The bytes received so far live in a temporary file; `offset` is how many.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="photo_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)  # Timestamp for creation
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "photo_uploads"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+# Model to queue profile photos for the thumbnail worker
+class PhotoJob(models.Model):
+    """
+    A stored profile photo waiting for its variants, rendered by `run_photo_worker`.
+    """
+    STATUS_PENDING = 1
+    STATUS_PROCESSING = 2
+    STATUS_DONE = 3
+    STATUS_FAILED = 4
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="photo_jobs")
+    source = models.CharField(max_length=255)  # Storage name of the original
+    status = models.IntegerField(choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # Not processed before this time
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)  # Timestamp for creation
+
+    class Meta:
+        db_table = "photo_jobs"
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+# Model to reference-count stored media files
+class MediaFile(models.Model):
+    """
+    A file written by `ContentAddressedStorage` and how many rows point to it.
+    Files at zero references are removed by `gc_media` after a grace period.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    references = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)  # Timestamp for creation
+    updated_at = models.DateTimeField(auto_now=True)  # Last saved or referenced
+
+    class Meta:
+        db_table = "media_files"
+        indexes = [
+            models.Index(fields=['references', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return self.name
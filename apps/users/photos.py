@@ -0,0 +1,278 @@
+import io
+import logging
+import os
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from apps.users.models import PhotoJob, PhotoUpload, User
+from utils.messages import INVALID_PHOTO, PHOTO_TOO_LARGE
+
+logger = logging.getLogger(__name__)
+
+# Accepted originals and the extension they are stored with.
+PHOTO_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+PHOTO_DIR = 'users/photos/'
+VARIANT_DIR = 'users/photos/variants/'
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def variant_urls(user):
+    """
+    Returns the URL of each rendered variant of the user's photo ({} until the worker ran).
+    """
+    return {name: default_storage.url(path) for name, path in (user.profile_photo_variants or {}).items()}
+
+
+def verify_image(path):
+    """
+    Checks that the file is a complete image in an accepted format.
+
+    Returns:
+        str: The Pillow format name.
+
+    Raises:
+        ValueError: If it is not.
+    """
+    try:
+        with Image.open(path) as image:
+            fmt = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError(INVALID_PHOTO)
+    if fmt not in PHOTO_FORMATS:
+        raise ValueError(INVALID_PHOTO)
+    return fmt
+
+
+def enqueue_variants(user):
+    """
+    Queues the rendering of the variants of the user's current photo.
+    """
+    return PhotoJob.objects.create(user_id=user.pk, source=user.profile_photo.name)
+
+
+def set_profile_photo(user, name):
+    """
+    Points the user at a stored original and queues its variants, in one transaction.
+    """
+    with transaction.atomic():
+        user.profile_photo = name
+        user.profile_photo_variants = {}
+        user.save(update_fields=['profile_photo', 'profile_photo_variants', 'updated_at'])
+        enqueue_variants(user)
+
+
+# Resumable uploads
+
+def upload_path(upload):
+    return os.path.join(settings.PHOTO_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def start_upload(user, filename, size):
+    """
+    Creates an upload of `size` bytes and its (empty) temporary file.
+    """
+    if size > settings.PROFILE_PHOTO_MAX_SIZE:
+        raise ValueError(PHOTO_TOO_LARGE)
+    os.makedirs(settings.PHOTO_UPLOAD_DIR, exist_ok=True)
+    upload = PhotoUpload.objects.create(
+        user_id=user.pk,
+        filename=os.path.basename(filename)[:255],
+        size=size,
+        expires_at=timezone.now() + settings.PHOTO_UPLOAD_LIFETIME,
+    )
+    open(upload_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, stream, length):
+    """
+    Copies up to `length` bytes of `stream` into the upload file at `upload.offset`.
+
+    The bytes are copied in small blocks, so a chunk never sits in memory. A
+    dropped connection keeps what arrived: the client resumes from the new
+    offset. The offset moves with a compare-and-set, so of two requests
+    sending the same chunk only one counts.
+
+    Returns:
+        bool: False if another request moved the offset first.
+
+    Raises:
+        ValueError: If the chunk goes past the announced size.
+    """
+    if upload.offset + length > upload.size:
+        raise ValueError(PHOTO_TOO_LARGE)
+    written = 0
+    with open(upload_path(upload), 'r+b') as part:
+        part.seek(upload.offset)
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+    moved = PhotoUpload.objects.filter(pk=upload.pk, offset=upload.offset).update(offset=upload.offset + written)
+    if moved:
+        upload.offset += written
+    return bool(moved)
+
+
+def finish_upload(upload):
+    """
+    Stores a complete upload as the user's photo and queues its variants.
+
+    Returns:
+        User: The updated user.
+
+    Raises:
+        ValueError: If the file is not an accepted image (the upload is dropped).
+    """
+    path = upload_path(upload)
+    try:
+        fmt = verify_image(path)
+        with open(path, 'rb') as original:
+            # Storage copies the file in chunks.
+            name = default_storage.save(f"{PHOTO_DIR}{uuid4().hex}.{PHOTO_FORMATS[fmt]}", File(original))
+    finally:
+        upload.delete()
+    user = User.objects.get(pk=upload.user_id)
+    set_profile_photo(user, name)
+    return user
+
+
+def discard_upload_file(upload):
+    try:
+        os.remove(upload_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+# Variant rendering
+
+def render_variants(source, variants=None, fmt=None, quality=None):
+    """
+    Renders square variants of a stored original and saves them to storage.
+
+    JPEG originals are decoded directly at the smallest scale (1/2 to 1/8)
+    that still covers the largest variant, which is most of the cost for
+    camera-sized photos.
+
+    Returns:
+        dict: Storage name per variant.
+    """
+    variants = variants or settings.PROFILE_PHOTO_VARIANTS
+    fmt = fmt or settings.PROFILE_PHOTO_VARIANT_FORMAT
+    quality = quality or settings.PROFILE_PHOTO_VARIANT_QUALITY
+    extension = PHOTO_FORMATS.get(fmt, fmt.lower())
+    stem = os.path.splitext(os.path.basename(source))[0]
+    largest = max(variants.values())
+
+    with default_storage.open(source, 'rb') as original, Image.open(original) as image:
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha and fmt != 'JPEG' else 'RGB')
+
+        names = {}
+        for variant, side in variants.items():
+            rendered = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            rendered.save(buffer, fmt, quality=quality)
+            names[variant] = default_storage.save(f"{VARIANT_DIR}{stem}_{variant}.{extension}", ContentFile(buffer.getvalue()))
+    return names
+
+
+class PhotoWorker:
+    """
+    Renders queued profile photo variants in batches, off the request path.
+
+    Jobs are claimed like mail outbox rows (SELECT ... FOR UPDATE SKIP LOCKED
+    where supported, with a lease), so several workers can share the queue.
+    Variants of a photo that was replaced in the meantime are left
+    unreferenced, for `gc_media` to collect (files are shared by content).
+    """
+
+    def __init__(self, batch_size=10, max_attempts=3, backoff=30, max_backoff=3600, lease=300):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+
+    def claim_batch(self):
+        """
+        Claims up to `batch_size` due jobs and marks them as processing.
+        """
+        now = timezone.now()
+        due = Q(status=PhotoJob.STATUS_PENDING, available_at__lte=now) | Q(
+            status=PhotoJob.STATUS_PROCESSING, claimed_at__lte=now - timedelta(seconds=self.lease)
+        )
+        with transaction.atomic():
+            queryset = PhotoJob.objects.filter(due).order_by('available_at')
+            if connection.features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            jobs = list(queryset[:self.batch_size])
+            if jobs:
+                PhotoJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                    status=PhotoJob.STATUS_PROCESSING, claimed_at=now, attempts=F('attempts') + 1
+                )
+        for job in jobs:
+            job.attempts += 1
+        return jobs
+
+    def apply(self, job, names):
+        """
+        Records the variants on the user if the photo is still the job's source.
+        """
+        with transaction.atomic():
+            user = User.objects.select_for_update().filter(pk=job.user_id).first()
+            if user is not None and user.profile_photo.name == job.source:
+                user.profile_photo_variants = names
+                # A regular save: the cached profile, token snapshots and media references follow.
+                user.save(update_fields=['profile_photo_variants', 'updated_at'])
+
+    def process(self, job):
+        self.apply(job, render_variants(job.source))
+        PhotoJob.objects.filter(pk=job.pk).update(status=PhotoJob.STATUS_DONE, last_error=None)
+
+    def reschedule(self, job, error, now):
+        """
+        Puts a failed job back in the queue with exponential backoff, or gives up on it.
+        """
+        if job.attempts >= self.max_attempts:
+            status = PhotoJob.STATUS_FAILED
+            available_at = now
+        else:
+            status = PhotoJob.STATUS_PENDING
+            delay = min(self.backoff * 2 ** (job.attempts - 1), self.max_backoff)
+            available_at = now + timedelta(seconds=delay)
+        PhotoJob.objects.filter(pk=job.pk).update(
+            status=status, available_at=available_at, claimed_at=None, last_error=str(error)
+        )
+
+    def run_once(self):
+        """
+        Claims and processes a single batch.
+
+        Returns:
+            tuple: The number of done and failed jobs (0, 0 when the queue is empty).
+        """
+        done = failed = 0
+        for job in self.claim_batch():
+            try:
+                self.process(job)
+                done += 1
+            except Exception as error:
+                logger.warning("Photo job %s (%s) failed: %s", job.pk, job.source, error)
+                self.reschedule(job, error, timezone.now())
+                failed += 1
+        return done, failed
@@ -0,0 +1,86 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ProfileCache:
+    """
+    Serialized profile payloads per user, in the Django cache.
+
+    Each entry holds the payload of `ManageProfile.list` and its ETag, so a poll
+    can be answered (with a 200 or a 304) without loading or serializing the
+    user. Entries are dropped when the user is saved (see `apps.users.signals`)
+    or updated through `ManageProfile.create`.
+
+    As in `core.baseviewset.token_cache`, an invalidation leaves a timestamped
+    tombstone, and `set` skips a payload loaded before it, so a read racing
+    with an update cannot cache the old profile.
+    """
+    # Longer than any profile read between a cache miss and `set`.
+    tombstone_ttl = 30
+
+    def __init__(self, ttl, alias='default'):
+        self.ttl = ttl
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _key(user_id):
+        return f"profile:{user_id}"
+
+    @staticmethod
+    def etag(user):
+        """
+        Returns a strong ETag for the user's profile, derived from `updated_at`.
+        """
+        version = f"{user.pk}:{user.updated_at.isoformat()}"
+        return f'"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+    def entry(self, user, data):
+        return {"etag": self.etag(user), "data": dict(data)}
+
+    @staticmethod
+    def _live(entry):
+        return None if entry is None or "invalidated_at" in entry else entry
+
+    @staticmethod
+    def _invalidated(entry, loaded_at):
+        return entry is not None and entry.get("invalidated_at", 0) >= loaded_at
+
+    def get(self, user_id):
+        return self._live(self.cache.get(self._key(user_id)))
+
+    async def aget(self, user_id):
+        return self._live(await self.cache.aget(self._key(user_id)))
+
+    def set(self, user_id, entry, loaded_at):
+        """
+        Caches an entry built from a row read at `loaded_at` (`time.time()`
+        before the query), unless the user was invalidated since.
+        """
+        key = self._key(user_id)
+        if self.cache.add(key, entry, self.ttl):
+            return
+        if not self._invalidated(self.cache.get(key), loaded_at):
+            self.cache.set(key, entry, self.ttl)
+
+    async def aset(self, user_id, entry, loaded_at):
+        key = self._key(user_id)
+        if await self.cache.aadd(key, entry, self.ttl):
+            return
+        if not self._invalidated(await self.cache.aget(key), loaded_at):
+            await self.cache.aset(key, entry, self.ttl)
+
+    def invalidate(self, user_id):
+        self.cache.set(self._key(user_id), {"invalidated_at": time.time()}, self.tombstone_ttl)
+
+    async def ainvalidate(self, user_id):
+        await self.cache.aset(self._key(user_id), {"invalidated_at": time.time()}, self.tombstone_ttl)
+
+
+profile_cache = ProfileCache(ttl=settings.PROFILE_CACHE_TTL, alias=settings.PROFILE_CACHE_ALIAS)
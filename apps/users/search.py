@@ -0,0 +1,171 @@
+import unicodedata
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from apps.users.models import User, UserSearchTerm
+
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+TERM_MAX_LENGTH = UserSearchTerm._meta.get_field('term').max_length
+# email, first name, last name and full name
+TERMS_PER_USER = 4
+# Byte-wise comparison on PostgreSQL, whose default collations skip punctuation.
+POSTGRESQL_TERM_COLLATION = 'C'
+
+
+def normalize_term(value):
+    """
+    Returns the searchable form of a value: lowercase, unaccented, single-spaced.
+    'Zoë  Smith' -> 'zoe smith'.
+    """
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.lower().split())[:TERM_MAX_LENGTH]
+
+
+def user_terms(email, first_name, last_name):
+    """
+    Returns the set of search terms of a user.
+    """
+    terms = {
+        normalize_term(email),
+        normalize_term(first_name),
+        normalize_term(last_name),
+        normalize_term(f"{first_name or ''} {last_name or ''}"),
+    }
+    terms.discard('')
+    return terms
+
+
+def search_terms_for(rows):
+    """
+    Builds the `UserSearchTerm` rows of (id, email, first_name, last_name) tuples, for `bulk_create`.
+    """
+    return [
+        UserSearchTerm(user_id=pk, term=term)
+        for pk, email, first_name, last_name in rows
+        for term in user_terms(email, first_name, last_name)
+    ]
+
+
+def index_user(user, created=False):
+    """
+    Brings the search terms of a saved user up to date; writes nothing when they did not change.
+    """
+    terms = user_terms(user.email, user.first_name, user.last_name)
+    existing = set()
+    if not created:
+        existing = set(UserSearchTerm.objects.filter(user_id=user.pk).values_list('term', flat=True))
+        if existing == terms:
+            return
+        stale = existing - terms
+        if stale:
+            UserSearchTerm.objects.filter(user_id=user.pk, term__in=stale).delete()
+    UserSearchTerm.objects.bulk_create([UserSearchTerm(user_id=user.pk, term=term) for term in terms - existing])
+
+
+def rebuild_index(chunk_size=2000, progress=None):
+    """
+    Rebuilds every search term from the users table, in one transaction.
+
+    Returns:
+        int: The number of users indexed.
+    """
+    users = 0
+    with transaction.atomic():
+        UserSearchTerm.objects.all().delete()
+        rows = User.objects.values_list('id', *SEARCH_FIELDS).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            UserSearchTerm.objects.bulk_create(search_terms_for(chunk), batch_size=chunk_size)
+            users += len(chunk)
+            if progress is not None:
+                progress(users)
+    return users
+
+
+def collate_terms(using='default'):
+    """
+    Gives the term column a byte-wise collation, so a prefix is one range of
+    the term index: "C" on PostgreSQL, whose default collations skip
+    punctuation, and the binary collation of its character set on MySQL,
+    whose default ones compare by language rules. Run after migrating (an
+    `AlterField` of the column resets it); a no-op on other engines (SQLite
+    compares byte-wise) and once the column has it.
+
+    Returns:
+        bool: True if the column was altered.
+    """
+    connection = connections[using]
+    table = UserSearchTerm._meta.db_table
+    field = UserSearchTerm._meta.get_field('term')
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        # Both rebuild the term index in the new order.
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT c.collname FROM pg_attribute a JOIN pg_collation c ON c.oid = a.attcollation "
+                "WHERE a.attrelid = to_regclass(%s) AND a.attname = %s",
+                [table, field.column],
+            )
+            row = cursor.fetchone()
+            if row is None or row[0] == POSTGRESQL_TERM_COLLATION:
+                return False
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(field.column)} "
+                f"TYPE {field.db_type(connection)} COLLATE {quote(POSTGRESQL_TERM_COLLATION)}"
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT CHARACTER_SET_NAME, COLLATION_NAME FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+                [table, field.column],
+            )
+            row = cursor.fetchone()
+            if row is None or row[1] == f"{row[0]}_bin":
+                return False
+            charset = row[0]
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} MODIFY {quote(field.column)} "
+                f"{field.db_type(connection)} CHARACTER SET {charset} COLLATE {charset}_bin NOT NULL"
+            )
+        else:
+            return False
+    return True
+
+
+def prefix_range(prefix):
+    """
+    Returns the [low, high) bounds of the terms starting with `prefix`, in
+    byte-wise order (see `collate_terms`).
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_users(query, limit=None, fields=None):
+    """
+    Returns up to `limit` users with an email, name or full name starting with `query`.
+
+    Two bounded queries: a range scan of the term index for at most
+    `limit * TERMS_PER_USER` terms (enough for `limit` distinct users), then
+    the matching users by primary key. Shorter and alphabetically first
+    matches come first.
+    """
+    prefix = normalize_term(query)
+    if not prefix:
+        return []
+    limit = min(limit or settings.USER_SEARCH_DEFAULT_LIMIT, settings.USER_SEARCH_MAX_LIMIT)
+    low, high = prefix_range(prefix)
+    matches = (
+        UserSearchTerm.objects
+        .filter(term__gte=low, term__lt=high)
+        .order_by('term', 'user_id')
+        .values_list('user_id', flat=True)[:limit * TERMS_PER_USER]
+    )
+    user_ids = list(dict.fromkeys(matches))[:limit]
+    queryset = User.objects.only(*fields) if fields else User.objects.all()
+    users = queryset.in_bulk(user_ids)
+    return [users[pk] for pk in user_ids if pk in users]
@@ -1,6 +1,11 @@
+from django.conf import settings
 from rest_framework import serializers
 from apps.users.models import User
 from datetime import date
+from apps.users.exporter import EXPORT_FORMATS
+from apps.users.importer import IMPORT_FORMATS
+from apps.users.photos import enqueue_variants, variant_urls
+from utils.messages import PHOTO_TOO_LARGE
 
 class UpdateUserSerializer(serializers.Serializer):
     """
@@ -21,8 +26,20 @@ class UpdateUserSerializer(serializers.Serializer):
         choices=GENDER_CHOICES
     )
     profile_photo = serializers.ImageField(required=False)
+    profile_photo_variants = serializers.SerializerMethodField()
     date_of_birth = serializers.DateField(required=False)
 
+    def get_profile_photo_variants(self, instance):
+        return variant_urls(instance)
+
+    def validate_profile_photo(self, value):
+        """
+        Validate the size of the photo (uploads above FILE_UPLOAD_MAX_MEMORY_SIZE arrive in a temporary file).
+        """
+        if value.size > settings.PROFILE_PHOTO_MAX_SIZE:
+            raise serializers.ValidationError(PHOTO_TOO_LARGE)
+        return value
+
     def validate_number(self, value):
         """
         Validate that the phone number contains only digits and has a valid length.
@@ -49,8 +66,64 @@ class UpdateUserSerializer(serializers.Serializer):
         instance.last_name = validated_data.get('last_name', instance.last_name)
         if 'profile_photo' in validated_data:
             instance.profile_photo = validated_data['profile_photo']
+            instance.profile_photo_variants = {}
         instance.phone_number = validated_data.get('number', instance.phone_number)
         instance.gender = validated_data.get('gender', instance.gender)
         instance.date_of_birth = validated_data.get('date_of_birth', instance.date_of_birth)
         instance.save()
-        return instance
\ No newline at end of file
+        if 'profile_photo' in validated_data:
+            # Thumbnails are rendered by the photo worker, off the request path.
+            enqueue_variants(instance)
+        return instance
+
+
+class StartPhotoUploadSerializer(serializers.Serializer):
+    """
+    Serializer for starting a resumable profile photo upload.
+    """
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1, max_value=settings.PROFILE_PHOTO_MAX_SIZE)
+
+
+class ImportUsersSerializer(serializers.Serializer):
+    """
+    Serializer for the bulk user import upload.
+    """
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=IMPORT_FORMATS, required=False)
+    send_mail = serializers.BooleanField(required=False, default=True)
+
+
+class ExportUsersSerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the bulk user export.
+    """
+    # Not `format`: DRF reserves that query parameter for renderer selection.
+    file_format = serializers.ChoiceField(choices=EXPORT_FORMATS, required=False, default='csv')
+    gzip = serializers.BooleanField(required=False, default=False)
+
+
+class UserSearchSerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters of the admin user search.
+    """
+    q = serializers.CharField(max_length=254)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.USER_SEARCH_MAX_LIMIT, default=settings.USER_SEARCH_DEFAULT_LIMIT
+    )
+
+
+# Columns of the admin user directory; the listing loads nothing else.
+USER_DIRECTORY_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'user_type', 'device_type', 'is_active', 'is_verified', 'created_at',
+)
+
+
+class UserDirectorySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the admin user directory rows.
+    """
+
+    class Meta:
+        model = User
+        fields = USER_DIRECTORY_FIELDS
@@ -0,0 +1,195 @@
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+
+from apps.users.groups import forget_group_ids
+from apps.users.media_files import referenced_files, release, retain
+from apps.users.models import AuthToken, PhotoUpload, User, UserSearchTerm, UserSocialProfile
+from apps.users.photos import discard_upload_file
+from apps.users.profile_cache import profile_cache
+from apps.users.search import SEARCH_FIELDS, collate_terms, index_user
+from core.baseviewset.permission_cache import permission_cache
+from core.baseviewset.token_cache import token_cache
+from core.db import PooledDatabaseWrapperMixin, get_metrics
+from core.db.router import record_write
+from core.middleware.permission_sync import ensure_synced, invalidate_permissions
+
+
+@receiver(post_migrate, sender=User._meta.app_config)
+def sync_permissions_after_migrate(sender, using='default', **kwargs):
+    """
+    Grant newly created permissions to every group once migrations have run.
+
+    Sent once per app; this app comes last in INSTALLED_APPS, so every app's
+    permissions exist by then.
+    """
+    invalidate_permissions()
+    ensure_synced(using)
+
+
+@receiver(post_migrate, sender=UserSearchTerm._meta.app_config)
+def collate_search_terms_after_migrate(sender, using='default', **kwargs):
+    """
+    Keep the search terms byte-wise ordered, whatever the migrations did to the column.
+    """
+    collate_terms(using)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_save, sender=ContentType)
+@receiver(post_delete, sender=ContentType)
+def sync_permissions_on_change(sender, created=True, **kwargs):
+    """
+    Re-sync group permissions after a group, permission or content type is added or removed.
+    """
+    if not created:
+        return
+    invalidate_permissions()
+    transaction.on_commit(ensure_synced)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_cached_group_ids(sender, **kwargs):
+    """
+    Any group change (rare) invalidates the cached name -> id mapping.
+    """
+    forget_group_ids()
+
+
+@receiver(connection_created)
+def count_database_connection(sender, connection, **kwargs):
+    """
+    Count newly established database connections; pooled backends count their own opens.
+    """
+    if not isinstance(connection, PooledDatabaseWrapperMixin):
+        get_metrics(connection.alias).record_open()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=AuthToken)
+@receiver(post_save, sender=UserSocialProfile)
+@receiver(post_delete, sender=AuthToken)
+@receiver(post_delete, sender=UserSocialProfile)
+def read_own_writes(sender, instance, **kwargs):
+    """
+    After a write to a replicated model, read from the primary for the rest of the
+    request and, for a short while, for the user's next requests.
+    """
+    record_write(instance.pk if sender is User else instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    Drop cached token snapshots whenever the user row changes (password, activation, last login).
+    """
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_permissions(sender, instance, **kwargs):
+    """
+    Drop the user's cached permission set (e.g. `is_superuser` or `is_active` changed).
+    """
+    permission_cache.invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_member_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop cached permission sets when users join or leave groups or gain or lose permissions.
+    """
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        permission_cache.invalidate_user(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            permission_cache.invalidate_user(user_id)
+    else:
+        # A cleared group or permission: the members are unknown here.
+        permission_cache.invalidate_all()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_all_permissions(sender, **kwargs):
+    """
+    A group's permissions changed: every cached permission set may be stale.
+    """
+    if kwargs.get('action', 'post_').startswith('post_'):
+        permission_cache.invalidate_all()
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    """
+    Drop the cached profile payload (and so its ETag) whenever the user row changes.
+    """
+    profile_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def index_user_search_terms(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the user's prefix search terms in step with the email and names.
+    """
+    if raw or (update_fields is not None and not set(update_fields) & set(SEARCH_FIELDS)):
+        return
+    index_user(instance, created=created)
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Drop a token from the cache as soon as it is deleted.
+    """
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_delete, sender=PhotoUpload)
+def remove_photo_upload_file(sender, instance, **kwargs):
+    """
+    Remove the partial file of a finished, abandoned or expired photo upload.
+    """
+    discard_upload_file(instance)
+
+
+@receiver(post_init, sender=User)
+def remember_photo_files(sender, instance, **kwargs):
+    """
+    Remember the media files a loaded user points to, to count references on save.
+    """
+    instance._photo_files = referenced_files(instance)
+
+
+@receiver(post_save, sender=User)
+def count_photo_references(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Move the media reference counts from the user's previous photo files to the current ones.
+    """
+    if raw or (update_fields is not None and not {'profile_photo', 'profile_photo_variants'} & set(update_fields)):
+        return
+    before = set() if created else instance._photo_files
+    after = referenced_files(instance)
+    if before is None or after is None:
+        # Loaded without its photo columns: `gc_media --recount` puts the counts right.
+        return
+    retain(after - before)
+    release(before - after)
+    instance._photo_files = after
+
+
+@receiver(post_delete, sender=User)
+def release_photo_references(sender, instance, **kwargs):
+    """
+    A deleted user no longer references its photo files.
+    """
+    release(referenced_files(instance))
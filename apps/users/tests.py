@@ -76,13 +76,98 @@
 #             # Assert that no user was created
 #             self.assertFalse(User.objects.filter(email=self.valid_data["email"]).exists())
             
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import smtplib
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.exceptions import ChannelFull
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.contrib.auth.models import Group, Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.db.models.signals import post_migrate
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import path, include
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
-from unittest.mock import patch
-from apps.users.models import User
-from rest_framework.authtoken.models import Token
-from utils.messages import USER_LOGGED_IN, INVALID_USER_CREDENTIAL
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+from silk.collector import DataCollector
+
+from apps.users.authentications.login.views import AuthLoginViewSet
+from apps.users.authentications.signup.views import AuthSignupViewSet
+from apps.users.exporter import EXPORT_FIELDS, UserExporter
+from apps.users.groups import forget_group_ids, get_group_id
+from apps.users.importer import ImportReport, UserImporter
+from apps.users.management.commands.purge_expired_tokens import purge_in_batches
+from apps.users.media_files import collect_garbage
+from apps.users.models import (
+    AuthToken, ForgotPasswordToken, MailOutbox, MediaFile, PhotoJob, PhotoUpload, User, UserSearchTerm,
+)
+from apps.users.photos import set_profile_photo, upload_path
+from apps.users.profile_cache import profile_cache
+from apps.users.search import collate_terms, normalize_term, search_users
+from apps.users.serializers import USER_DIRECTORY_FIELDS, UpdateUserSerializer
+from apps.users.views import ManageProfile
+from apps.users.web_notifications import (
+    anotify_group, anotify_role, anotify_user, anotify_users, notify_group, notify_role, notify_user, notify_users,
+    send_notification_to_web,
+)
+from configurations.consumers import NotificationConsumer
+from core.baseviewset import rData
+from core.baseviewset.authentication import aissue_token, cTokenAuthentication
+from core.baseviewset.permission_cache import permission_cache
+from core.baseviewset.token_cache import TokenCache, token_cache
+from core.baseviewset.viewset import nAsyncBaseViewset, nBaseViewset
+from core.channel_layers import UnixSocketChannelLayer
+from core.db import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout, close_pools, get_metrics, get_pools
+from core.db.metrics import ConnectionMetrics, reset_metrics
+from core.db.router import ReplicaRouter, pin_if_recent_write, record_write
+from core.hashing.executor import InlineHashingExecutor, ProcessPoolHashingExecutor, get_hashing_executor
+from core.mail_handler.connection_pool import MailConnectionPool
+from core.mail_handler.outbox import MailOutboxWorker, enqueue_mail, queue_depth
+from core.mail_handler.renderer import MailTemplateRenderer
+from core.mail_handler.sand_mail import SandMailHandler
+from core.middleware.permission_middleware import PermissionMiddleware
+from core.middleware.permission_sync import ensure_synced, state, sync_group_permissions
+from core.middleware.request_context import RequestContextMiddleware
+from core.response_handler.cache import CachePolicy
+from core.response_handler.handler import ResponseHandler
+from core.storage import ContentAddressedStorage, GzipManifestStaticFilesStorage, is_content_addressed
+from core.storage.views import serve_media, serve_static
+from core.throttling import EmailSlidingWindowThrottle, IPSlidingWindowThrottle
+from utils.messages import INVALID_USER_CREDENTIAL, TOO_MANY_REQUESTS, USER_ALREADY_EXISTS, USER_LOGGED_IN
 
 class AuthLoginViewSetTest(APITestCase):
     
@@ -142,3 +227,2084 @@ class AuthLoginViewSetTest(APITestCase):
     #     self.assertEqual(response.status_code, status.HTTP_200_OK)
     #     self.assertEqual(response.data['message'], USER_LOGGED_IN)
     #     self.assertIn('token', response.data)
+
+
+class QueryBudgetMixin:
+    """
+    Keeps the silk profiler's own queries out of query-count assertions.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(self.modify_settings(MIDDLEWARE={'remove': 'silk.middleware.SilkyMiddleware'}))
+        DataCollector().clear()
+
+
+class PermissionMiddlewareTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.middleware = PermissionMiddleware(lambda request: HttpResponse())
+        self.request = RequestFactory().get('/')
+
+    def test_request_path_is_query_free_once_synced(self):
+        """Test that the middleware issues no queries when nothing changed."""
+        Group.objects.bulk_create([Group(name=f"group-{i}") for i in range(5)])
+        state.invalidate()
+        self.middleware(self.request)
+
+        with self.assertNumQueries(0):
+            self.middleware(self.request)
+
+    def test_new_group_gets_all_permissions(self):
+        """Test that a newly created group is granted every permission."""
+        with self.captureOnCommitCallbacks(execute=True):
+            group = Group.objects.create(name="editors")
+
+        self.assertEqual(group.permissions.count(), Permission.objects.count())
+
+    def test_sync_query_count_does_not_grow_with_groups(self):
+        """Test that checking a synced set of groups costs the same queries for any number of groups."""
+        Group.objects.bulk_create([Group(name=f"group-{i}") for i in range(20)])
+        sync_group_permissions()
+
+        with self.assertNumQueries(3):
+            self.assertEqual(sync_group_permissions(), 0)
+
+    def test_post_migrate_syncs_once_on_the_migrated_database(self):
+        """Test that only this app's post_migrate syncs, on the database that was migrated."""
+        for app_config in apps.get_app_configs():
+            with patch('apps.users.signals.ensure_synced') as sync:
+                post_migrate.send(
+                    sender=app_config, app_config=app_config, verbosity=0, interactive=False, using='default',
+                )
+            if app_config is User._meta.app_config:
+                sync.assert_called_once_with('default')
+            else:
+                sync.assert_not_called()
+
+
+class TokenCacheTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.user = User.objects.create_user(email='cached@example.com', password='Test@1234?')
+        self.token = AuthToken.objects.create(user=self.user)
+        self.authentication = cTokenAuthentication()
+
+    def test_cache_miss_costs_one_query(self):
+        """Test that a cold token is resolved with a single query."""
+        with self.assertNumQueries(1):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cache_hit_is_query_free(self):
+        """Test that a warm token is resolved without touching the database."""
+        self.authentication.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+            self.assertEqual(user.email, self.user.email)
+            self.assertEqual(user.user_type, self.user.user_type)
+
+    def test_cache_is_invalidated_on_user_change(self):
+        """Test that deactivating the user is seen on the next request."""
+        self.authentication.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_cache_is_invalidated_on_token_delete(self):
+        """Test that a deleted token is rejected even after being cached."""
+        self.authentication.authenticate_credentials(self.token.key)
+        AuthToken.objects.filter(user=self.user).delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_snapshot_loaded_before_a_logout_is_not_cached(self):
+        """Test that a lookup racing with a token delete cannot cache the deleted token."""
+        loaded_at = time.time()
+        snapshot = token_cache.snapshot(AuthToken.objects.select_related('user').get(pk=self.token.pk))
+        AuthToken.objects.filter(pk=self.token.pk).delete()
+        token_cache.set(self.token.key, snapshot, loaded_at)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_snapshot_loaded_before_a_deactivation_is_not_cached(self):
+        """Test that a lookup racing with a deactivation cannot cache the active user."""
+        loaded_at = time.time()
+        snapshot = token_cache.snapshot(AuthToken.objects.select_related('user').get(pk=self.token.pk))
+        self.user.is_active = False
+        self.user.save()
+        async_to_sync(token_cache.aset)(self.token.key, snapshot, loaded_at)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_lookup_after_an_invalidation_is_cached(self):
+        """Test that a tombstone only rejects snapshots loaded before it."""
+        self.user.save()
+        self.authentication.authenticate_credentials(self.token.key)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_other_workers_drop_a_revoked_token_within_the_local_ttl(self):
+        """Test that another worker's in-process copy of a revoked token outlives it by at most the local TTL."""
+        other_worker = TokenCache(
+            local_size=10, local_ttl=settings.TOKEN_CACHE_LOCAL_TTL, shared_ttl=settings.TOKEN_CACHE_TTL,
+        )
+        snapshot = token_cache.snapshot(AuthToken.objects.select_related('user').get(pk=self.token.pk))
+        other_worker.set(self.token.key, snapshot, time.time())
+        token_cache.invalidate_user(self.user.pk)
+        self.assertIsNotNone(other_worker.get(self.token.key))
+
+        later = time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL
+        with patch('core.baseviewset.token_cache.time.monotonic', return_value=later):
+            self.assertIsNone(other_worker.get(self.token.key))
+        self.assertLessEqual(settings.TOKEN_CACHE_LOCAL_TTL, 1)
+
+    def test_expired_token_is_rejected(self):
+        """Test that a token past its expires_at is rejected with a single lookup."""
+        AuthToken.objects.filter(pk=self.token.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        with self.assertNumQueries(1), self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+
+class PurgeExpiredTokensTest(QueryBudgetMixin, TestCase):
+
+    def test_purge_deletes_only_expired_rows(self):
+        """Test that the purge command removes expired tokens in batches and keeps live ones."""
+        now = timezone.now()
+        users = [
+            User.objects.create_user(email=f'purge{i}@example.com', password='Test@1234?')
+            for i in range(5)
+        ]
+        for i, user in enumerate(users):
+            AuthToken.objects.create(user=user, expires_at=now + timedelta(days=-1 if i < 3 else 1))
+            ForgotPasswordToken.objects.create(user=user, token=str(i), expiry_time=now - timedelta(minutes=1))
+
+        call_command('purge_expired_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(AuthToken.objects.count(), 2)
+        self.assertFalse(AuthToken.objects.filter(expires_at__lte=now).exists())
+        self.assertEqual(ForgotPasswordToken.objects.count(), 0)
+
+    def test_expired_tokens_are_deleted_without_per_row_work(self):
+        """Test that each token batch is one DELETE and the deleted tokens leave the token cache."""
+        token_cache.clear()
+        expired = timezone.now() - timedelta(days=1)
+        tokens = [
+            AuthToken.objects.create(
+                user=User.objects.create_user(email=f'purge{i}@example.com', password='Test@1234?'), expires_at=expired
+            )
+            for i in range(3)
+        ]
+        for token in tokens:
+            token_cache.set(token.key, token_cache.snapshot(token), time.time())
+
+        # Two batches of a SELECT and a DELETE, and the empty SELECT that ends the purge.
+        with self.assertNumQueries(5):
+            deleted = purge_in_batches(
+                AuthToken.objects.filter(expires_at__lte=timezone.now()), 2, on_deleted=token_cache.invalidate_many
+            )
+
+        self.assertEqual(deleted, 3)
+        self.assertFalse(AuthToken.objects.exists())
+        for token in tokens:
+            self.assertIsNone(token_cache.get(token.key))
+
+        # Rows that cascade are never deleted without their signals.
+        with self.assertRaises(ValueError):
+            purge_in_batches(User.objects.all(), 2, on_deleted=token_cache.invalidate_many)
+        self.assertTrue(User.objects.exists())
+
+    def test_legacy_tokens_are_copied(self):
+        """Test that rest_framework.authtoken tokens are carried over with an expiry from the last login."""
+        user = User.objects.create_user(email='legacy@example.com', password='Test@1234?')
+        stale = User.objects.create_user(email='stale@example.com', password='Test@1234?')
+        User.objects.filter(pk=stale.pk).update(last_login=timezone.now() - timedelta(days=30))
+        connection = connections['default']
+        user_id, stale_id = (User._meta.pk.get_db_prep_value(pk, connection) for pk in (user.pk, stale.pk))
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE authtoken_token (key varchar(40) PRIMARY KEY, user_id char(32))")
+            cursor.execute(
+                "INSERT INTO authtoken_token (key, user_id) VALUES (%s, %s), (%s, %s)",
+                ['a' * 40, user_id, 'b' * 40, stale_id],
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('copy_legacy_tokens', stdout=StringIO())
+
+        # `key` is reserved on MySQL: every identifier is quoted.
+        self.assertIn('SELECT "key", "user_id" FROM "authtoken_token"', [query['sql'] for query in queries])
+        token = AuthToken.objects.get()
+        self.assertEqual((token.key, token.user_id), ('a' * 40, user.pk))
+        self.assertFalse(token.is_expired)
+
+
+class MailOutboxTest(TestCase):
+
+    def setUp(self):
+        self.context = {"subject": "Forgot Password mail", "code": 123456, "email": "outbox@example.com"}
+
+    def test_worker_delivers_queued_mails(self):
+        """Test that queued mails are delivered in one batch and marked as sent."""
+        for i in range(3):
+            enqueue_mail(f"outbox{i}@example.com", self.context, 'email/forgot_password.html')
+
+        sent, failed = MailOutboxWorker(batch_size=10).run_once()
+
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(queue_depth()['sent'], 3)
+        self.assertIn("123456", mail.outbox[0].alternatives[0][0])
+        # The one-time code is not kept once delivered.
+        self.assertFalse(MailOutbox.objects.exclude(context={}).exists())
+
+    def test_failed_mail_is_retried_with_backoff(self):
+        """Test that a failed delivery is rescheduled, then marked failed after the last attempt."""
+        row = enqueue_mail("outbox@example.com", self.context, 'email/forgot_password.html')
+        worker = MailOutboxWorker(max_attempts=2, backoff=60)
+
+        with patch.object(worker.handler, 'build_message', side_effect=ConnectionError("relay down")), \
+                self.assertLogs('core.mail_handler.outbox', 'WARNING'):
+            self.assertEqual(worker.run_once(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual(row.status, MailOutbox.STATUS_PENDING)
+            self.assertGreater(row.available_at, timezone.now())
+
+            # Nothing is deliverable until the backoff has elapsed.
+            self.assertEqual(worker.run_once(), (0, 0))
+            MailOutbox.objects.filter(pk=row.pk).update(available_at=timezone.now())
+            self.assertEqual(worker.run_once(), (0, 1))
+
+        row.refresh_from_db()
+        self.assertEqual(row.status, MailOutbox.STATUS_FAILED)
+        self.assertEqual(row.last_error, "relay down")
+        self.assertEqual(row.context, {})
+
+    def test_rows_are_claimed_once_without_row_locks(self):
+        """Test that two workers selecting the same rows do not both claim them."""
+        for i in range(3):
+            enqueue_mail(f"outbox{i}@example.com", self.context, 'email/forgot_password.html')
+        first, second = MailOutboxWorker(batch_size=2), MailOutboxWorker(batch_size=10)
+        claimed_by_second = None
+
+        def claim_after_first_select(execute, sql, params, many, context):
+            nonlocal claimed_by_second
+            result = execute(sql, params, many, context)
+            if claimed_by_second is None and sql.startswith('SELECT'):
+                # The second worker runs between the first one's SELECT and UPDATE.
+                claimed_by_second = []
+                claimed_by_second.extend(second.claim_batch())
+            return result
+
+        with connections['default'].execute_wrapper(claim_after_first_select):
+            claimed_by_first = first.claim_batch()
+
+        self.assertEqual(len(claimed_by_second), 3)
+        self.assertEqual(claimed_by_first, [])
+        self.assertEqual(set(MailOutbox.objects.values_list('attempts', flat=True)), {1})
+
+    def test_finished_mails_are_purged_after_retention(self):
+        """Test that the purge deletes old sent and failed mails and keeps queued ones."""
+        old = timezone.now() - settings.MAIL_OUTBOX_RETENTION - timedelta(minutes=1)
+        for status_value in (MailOutbox.STATUS_SENT, MailOutbox.STATUS_FAILED, MailOutbox.STATUS_PENDING):
+            MailOutbox.objects.create(to="outbox@example.com", template_name='email/forgot_password.html',
+                                      status=status_value, available_at=old)
+        recent = enqueue_mail("outbox@example.com", self.context, 'email/forgot_password.html')
+        MailOutbox.objects.filter(pk=recent.pk).update(status=MailOutbox.STATUS_SENT)
+
+        call_command('purge_expired_tokens', stdout=StringIO())
+
+        self.assertEqual(
+            sorted(MailOutbox.objects.values_list('status', flat=True)),
+            [MailOutbox.STATUS_PENDING, MailOutbox.STATUS_SENT],
+        )
+
+    def test_forgot_password_queues_instead_of_sending(self):
+        """Test that the request path only writes to the outbox."""
+        User.objects.create_user(email='outbox@example.com', password='Test@1234?', is_verified=True)
+
+        response = self.client.post('/api/auth/forgot_password/', data={'email': 'outbox@example.com'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(MailOutbox.objects.filter(to='outbox@example.com').count(), 1)
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Locmem backend whose first connection drops after the first message."""
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        self.number = FlakyEmailBackend.opened
+        self.sent = 0
+
+    def send_messages(self, messages):
+        if self.number == 1 and self.sent == 1:
+            raise smtplib.SMTPServerDisconnected("connection dropped")
+        self.sent += len(messages)
+        return super().send_messages(messages)
+
+
+class SandMailHandlerPoolTest(TestCase):
+
+    def setUp(self):
+        FlakyEmailBackend.opened = 0
+        self.pool = MailConnectionPool(size=2, backend='apps.users.tests.FlakyEmailBackend')
+        self.handler = SandMailHandler(default_from_email='noreply@example.com', pool=self.pool)
+        self.context = {"subject": "Forgot Password mail", "code": 123456, "email": "pool@example.com"}
+
+    def build(self, count):
+        return [
+            self.handler.build_message(f"pool{i}@example.com", self.context, 'email/forgot_password.html')
+            for i in range(count)
+        ]
+
+    def test_connections_are_reused_across_sends(self):
+        """Test that consecutive sends share one pooled connection."""
+        FlakyEmailBackend.opened = 1  # skip the flaky first connection
+        self.handler.send_many(self.build(3))
+        self.handler.send_email("pool@example.com", self.context, 'email/forgot_password.html')
+
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_dropped_connection_is_rebuilt(self):
+        """Test that a dropped connection is replaced and the message retried."""
+        errors = self.handler.send_many(self.build(3))
+
+        self.assertEqual(errors, [None, None, None])
+        self.assertEqual(FlakyEmailBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class MailTemplateRendererTest(TestCase):
+
+    def test_compiled_render_matches_template_render(self):
+        """Test that the compiled renderer produces the same body as render_to_string."""
+        renderer = MailTemplateRenderer()
+        context = {"email": "<b>user</b>@example.com", "code": 123456, "url": "http://testserver/?a=1&b=2"}
+
+        for template_name in ('email/forgot_password.html', 'email/welcome_mail.html',
+                              'email/welcome_mail_with_password.html', 'email/welcome_imported.html'):
+            self.assertTrue(renderer.get(template_name).is_flat)
+            self.assertEqual(renderer.render(template_name, context), render_to_string(template_name, context))
+
+
+class RequestContextTest(TestCase):
+    """Stress tests showing that concurrent requests never see each other's request."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def check_current_request(self, request):
+        time.sleep(0.0005)  # let other threads run while this request is "in the view"
+        return HttpResponse(status=200 if rData.request is request else 500)
+
+    def test_no_leakage_between_threads(self):
+        """Test that many threads going through the middleware each see their own request."""
+        middleware = RequestContextMiddleware(self.check_current_request)
+        requests = [self.factory.get(f'/thread/{i}/') for i in range(2000)]
+
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            statuses = list(executor.map(lambda request: middleware(request).status_code, requests))
+
+        self.assertEqual(statuses.count(200), len(requests))
+        self.assertIsNone(rData.request)
+
+    def test_no_leakage_between_tasks(self):
+        """Test that many asyncio tasks going through the middleware each see their own request."""
+        async def check_current_request(request):
+            await asyncio.sleep(0)
+            seen = rData.request
+            await asyncio.sleep(0)
+            return HttpResponse(status=200 if seen is request and rData.request is request else 500)
+
+        middleware = RequestContextMiddleware(check_current_request)
+        requests = [self.factory.get(f'/task/{i}/') for i in range(5000)]
+
+        async def run():
+            return await asyncio.gather(*(middleware(request) for request in requests))
+
+        responses = asyncio.run(run())
+
+        self.assertEqual([response.status_code for response in responses].count(200), len(requests))
+
+
+
+class AsyncViewSetTest(QueryBudgetMixin, TestCase):
+    """The auth and profile endpoints run on the async base viewsets."""
+
+    def setUp(self):
+        super().setUp()
+        forget_group_ids()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='async@example.com', password='Test@1234?', first_name="Async", last_name="User"
+        )
+        self.user.is_active = True
+        self.user.is_verified = True
+        self.user.save()
+        Group.objects.create(name='user').user_set.add(self.user)
+        sync_group_permissions()
+
+    def test_handlers_are_coroutines(self):
+        """Test that the ported endpoints expose async views."""
+        for viewset in (ManageProfile, AuthLoginViewSet):
+            self.assertTrue(asyncio.iscoroutinefunction(viewset.as_view({'post': 'create'})))
+
+    def test_login_and_profile_round_trip(self):
+        """Test logging in, reading the profile with the token and logging out."""
+        response = self.client.post('/api/auth/login/', data={'email': 'async@example.com', 'password': 'Test@1234?'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        key = response.data['data']['token']
+        self.assertTrue(AuthToken.objects.filter(key=key, user=self.user).exists())
+
+        response = self.client.get('/api/auth/manage_profile/', HTTP_AUTHORIZATION=f'Bearer {key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['first_name'], "Async")
+
+        response = self.client.post('/api/auth/logout/', HTTP_AUTHORIZATION=f'Bearer {key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+    def test_issue_token_follows_a_concurrent_rotation(self):
+        """Test that a token rotated or deleted after it was loaded is re-read, not lost."""
+        stale = AuthToken.objects.create(user=self.user, expires_at=timezone.now() - timedelta(days=1))
+        user = User.objects.select_related('auth_token').get(pk=self.user.pk)
+        AuthToken.objects.filter(pk=stale.pk).update(key=AuthToken.generate_key())
+
+        token = async_to_sync(aissue_token)(user)
+
+        self.assertEqual(AuthToken.objects.get(user=self.user).key, token.key)
+        self.assertFalse(token.is_expired)
+
+        AuthToken.objects.filter(user=self.user).delete()
+        token = async_to_sync(aissue_token)(user)
+
+        self.assertEqual(AuthToken.objects.get(user=self.user).key, token.key)
+
+    def test_login_upgrades_an_outdated_password_hash(self):
+        """Test that a password hashed with an old work factor is re-hashed on login."""
+        outdated = PBKDF2PasswordHasher().encode('Test@1234?', 'outdatedsalt', iterations=1000)
+        User.objects.filter(pk=self.user.pk).update(password=outdated)
+
+        response = self.client.post('/api/auth/login/', data={'email': 'async@example.com', 'password': 'Test@1234?'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.password, outdated)
+        self.assertEqual(get_hashing_executor().check_password('Test@1234?', self.user.password), (True, False))
+
+    def test_login_with_wrong_password_is_rejected(self):
+        """Test that the executor-backed password check rejects a wrong password."""
+        response = self.client.post('/api/auth/login/', data={'email': 'async@example.com', 'password': 'Wrong@1234?'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], INVALID_USER_CREDENTIAL)
+
+    def test_reset_password(self):
+        """Test that the password is re-hashed and the new one works."""
+        token = AuthToken.objects.create(user=self.user)
+        response = self.client.post(
+            '/api/auth/reset_password/',
+            data={'old_password': 'Test@1234?', 'new_password': 'Newpass@1234?'},
+            HTTP_AUTHORIZATION=f'Bearer {token.key}',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Newpass@1234?'))
+
+    def test_async_authentication_is_cached(self):
+        """Test that `aauthenticate_credentials` shares the token cache with the sync path."""
+        token = AuthToken.objects.create(user=self.user)
+        authentication = cTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+
+        with self.assertNumQueries(0):
+            user, _ = asyncio.run(authentication.aauthenticate_credentials(token.key))
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_signup_creates_user_and_queues_mail(self):
+        """Test that the async signup writes the user, its group and its mail."""
+        response = self.client.post('/api/auth/register/', data={
+            'email': 'new@example.com', 'password': 'Test@1234?', 'first_name': "New", 'last_name': "User",
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.check_password('Test@1234?'))
+        self.assertTrue(user.groups.filter(name='user').exists())
+        self.assertTrue(MailOutbox.objects.filter(to='new@example.com').exists())
+
+
+class LoginQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """A successful login costs a fixed number of queries whatever the token state."""
+
+    login_url = '/api/auth/login/'
+    credentials = {'email': 'budget@example.com', 'password': 'Test@1234?'}
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(is_verified=True, **self.credentials)
+        # Keep the one-off permission sync out of the measured request.
+        ensure_synced()
+
+    def login(self):
+        # SELECT user + token, INSERT/UPDATE token, UPDATE last_login
+        with self.assertNumQueries(3):
+            response = self.client.post(self.login_url, data=self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']['token']
+
+    def test_first_login_creates_token(self):
+        key = self.login()
+        self.assertEqual(AuthToken.objects.get(user=self.user).key, key)
+
+    def test_login_extends_live_token(self):
+        token = AuthToken.objects.create(user=self.user, expires_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(self.login(), token.key)
+        token.refresh_from_db()
+        self.assertGreater(token.expires_at, timezone.now() + timedelta(days=1))
+
+    def test_login_rotates_expired_token(self):
+        token = AuthToken.objects.create(user=self.user, expires_at=timezone.now() - timedelta(minutes=1))
+
+        key = self.login()
+        self.assertNotEqual(key, token.key)
+        self.assertFalse(AuthToken.objects.filter(key=token.key).exists())
+        self.assertFalse(AuthToken.objects.get(key=key).is_expired)
+
+    def test_last_login_is_written(self):
+        self.login()
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_unverified_user_is_rejected_before_password_check(self):
+        User.objects.filter(pk=self.user.pk).update(is_verified=False)
+
+        with self.assertNumQueries(1):
+            response = self.client.post(self.login_url, data=self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HashingExecutorTest(TestCase):
+    """Passwords hashed on either executor interoperate with Django's hashers."""
+
+    def check_executor(self, executor):
+        encoded = executor.hash_password('Test@1234?')
+        self.assertTrue(check_password('Test@1234?', encoded))
+        self.assertTrue(executor.verify_password('Test@1234?', encoded))
+        self.assertFalse(executor.verify_password('Wrong@1234?', encoded))
+
+        async def run():
+            encoded = await executor.ahash_password('Test@1234?')
+            return await asyncio.gather(
+                executor.averify_password('Test@1234?', encoded),
+                executor.averify_password('Wrong@1234?', encoded),
+            )
+
+        self.assertEqual(asyncio.run(run()), [True, False])
+        # Hashes with an outdated work factor are flagged for an upgrade.
+        outdated = PBKDF2PasswordHasher().encode('Test@1234?', 'outdatedsalt', iterations=1000)
+        self.assertEqual(executor.check_password('Test@1234?', outdated), (True, True))
+        self.assertEqual(executor.check_password('Test@1234?', encoded), (True, False))
+
+    def test_inline_executor(self):
+        self.check_executor(InlineHashingExecutor())
+
+    def test_process_pool_executor(self):
+        executor = ProcessPoolHashingExecutor(workers=1)
+        self.addCleanup(executor.shutdown)
+        self.check_executor(executor)
+        self.assertIsNotNone(executor._pool)
+
+    def test_zero_workers_hashes_inline(self):
+        executor = ProcessPoolHashingExecutor(workers=0)
+        self.check_executor(executor)
+        self.assertIsNone(executor._pool)
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_RATES': {'login_ip': '5/min', 'login_email': '2/min', 'reset_password_token': '1/min'},
+})
+class SlidingWindowThrottleTest(QueryBudgetMixin, TestCase):
+
+    login_url = '/api/auth/login/'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        ensure_synced()
+
+    def login(self, email):
+        return self.client.post(self.login_url, data={'email': email, 'password': 'Test@1234?'})
+
+    def test_email_limit_rejects_before_any_query(self):
+        """Test that a throttled login is answered with 429 without touching the database."""
+        self.login('victim@example.com')
+        self.login('victim@example.com')
+
+        with self.assertNumQueries(0):
+            response = self.login('victim@example.com')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response.data['message'], TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_ip_limit_applies_across_emails(self):
+        """Test that rotating emails does not escape the per-IP limit."""
+        statuses = [self.login(f'user{i}@example.com').status_code for i in range(6)]
+
+        self.assertNotIn(status.HTTP_429_TOO_MANY_REQUESTS, statuses[:5])
+        self.assertEqual(statuses[5], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_limit_ignores_spoofed_forwarded_for(self):
+        """Test that a client cannot escape the per-IP limit by rotating X-Forwarded-For."""
+        statuses = [
+            self.client.post(self.login_url, data={'email': f'user{i}@example.com', 'password': 'Test@1234?'},
+                             HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(6)
+        ]
+
+        self.assertEqual(statuses[5], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_email_throttle_skips_non_object_bodies(self):
+        """Test that a JSON body that is not an object is not counted by email (and is not a 500)."""
+        request = Request(RequestFactory().post(self.login_url, data='[1, 2]', content_type='application/json'),
+                          parsers=[JSONParser()])
+
+        self.assertIsNone(EmailSlidingWindowThrottle().get_ident_key(request, None))
+
+    def test_token_limit(self):
+        """Test that reset_password is limited per bearer token."""
+        user = User.objects.create_user(email='reset@example.com', password='Test@1234?')
+        Group.objects.create(name='user').user_set.add(user)
+        sync_group_permissions()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AuthToken.objects.create(user=user).key}'}
+        data = {'old_password': 'Wrong@1234?', 'new_password': 'Newpass@1234?'}
+
+        self.assertEqual(self.client.post('/api/auth/reset_password/', data=data, **headers).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post('/api/auth/reset_password/', data=data, **headers).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_previous_window_is_weighted(self):
+        """Test that the previous window counts in proportion to its overlap."""
+        throttle = IPSlidingWindowThrottle()
+
+        # 30s into a 60s window: 10 previous requests count as 5.
+        self.assertTrue(throttle.decide(10, 60, 30, current=5, previous=10))
+        self.assertFalse(throttle.decide(10, 60, 30, current=6, previous=10))
+        self.assertEqual(throttle.wait(), 30)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+])
+class ImportUsersTest(QueryBudgetMixin, TestCase):
+
+    rows = (
+        "email,first_name,last_name,password\n"
+        "one@example.com,One,User,Test@1234?\n"
+        "two@example.com,Two,User,\n"
+        "not-an-email,Bad,Row,Test@1234?\n"
+        "one@example.com,Dup,User,Test@1234?\n"
+        "existing@example.com,Existing,User,Test@1234?\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        forget_group_ids()
+        User.objects.create_user(email='existing@example.com', password='Test@1234?')
+
+    def import_file(self, content, suffix='.csv', *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out = StringIO()
+        call_command('import_users', handle.name, '--workers', '0', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_import_creates_users_groups_and_mails(self):
+        output = self.import_file(self.rows)
+
+        self.assertIn("Created 2, skipped 2 existing, 1 invalid", output)
+        one = User.objects.get(email='one@example.com')
+        self.assertTrue(one.check_password('Test@1234?'))
+        self.assertTrue(one.is_verified)
+        self.assertEqual(
+            set(Group.objects.get(name='user').user_set.values_list('email', flat=True)),
+            {'one@example.com', 'two@example.com'},
+        )
+        self.assertEqual(MailOutbox.objects.filter(template_name='email/welcome_imported.html').count(), 2)
+        # No password is written to the outbox; users without one choose it through forgot password.
+        self.assertFalse(any('password' in context for context in MailOutbox.objects.values_list('context', flat=True)))
+        self.assertFalse(User.objects.get(email='two@example.com').has_usable_password())
+
+    def test_non_string_fields_are_row_errors(self):
+        output = self.import_file('{"email": 5}\n{"email": "ok@example.com", "first_name": ["x"]}\n', '.jsonl')
+
+        self.assertIn("Created 0, skipped 0 existing, 2 invalid", output)
+
+    def test_email_taken_during_the_import_is_skipped(self):
+        """Test that a signup racing with the import skips that row instead of aborting the import."""
+        importer = UserImporter(executor=InlineHashingExecutor(), send_mail=False)
+        drop_existing = importer.drop_existing
+
+        def racing_signup(valid, report):
+            remaining = drop_existing(valid, report)
+            if not User.objects.filter(email='race@example.com').exists():
+                User.objects.create_user(email='race@example.com', password='Test@1234?')
+            return remaining
+
+        with patch.object(importer, 'drop_existing', side_effect=racing_signup):
+            report = importer.run(StringIO("email\nrace@example.com\nother@example.com\n"), 'csv')
+
+        self.assertEqual((report.created, report.skipped), (1, 1))
+        self.assertTrue(User.objects.filter(email='other@example.com').exists())
+
+    def test_email_the_database_matches_in_another_case_is_skipped(self):
+        """Test that existing emails are compared case-insensitively, and that rows still conflicting are skipped."""
+        importer = UserImporter(executor=InlineHashingExecutor(), send_mail=False)
+        report = ImportReport()
+        rows = [('Existing@example.com', '', '', None), ('new@example.com', '', '', None)]
+        # MySQL's collation returns the stored spelling for another case.
+        with patch('apps.users.importer.User.objects.filter') as matches:
+            matches.return_value.values_list.return_value = ['existing@example.com']
+            self.assertEqual(importer.drop_existing(rows, report), rows[1:])
+        self.assertEqual(report.skipped, 1)
+
+        # A conflict drop_existing cannot see is skipped rather than failing the chunk.
+        with patch.object(importer, 'drop_existing', side_effect=lambda valid, report: valid):
+            report = importer.run(StringIO("email\nexisting@example.com\nfresh@example.com\n"), 'csv')
+
+        self.assertEqual((report.created, report.skipped), (1, 1))
+        self.assertTrue(User.objects.filter(email='fresh@example.com').exists())
+
+    def test_chunk_query_count_is_constant(self):
+        """Test that a chunk costs the same queries whatever its size."""
+        Group.objects.create(name='user')
+        get_group_id('user')
+        for count in (5, 30):
+            content = "email,first_name\n" + "".join(f"bulk{count}-{i}@example.com,Bulk\n" for i in range(count))
+
+            # existing emails, then savepoint, users, memberships, search terms, mails, release
+            with self.assertNumQueries(7):
+                self.import_file(content, '.csv', '--chunk-size', '100')
+            self.assertEqual(User.objects.filter(email__startswith=f'bulk{count}-').count(), count)
+
+    def test_jsonl(self):
+        output = self.import_file('{"email": "json@example.com", "first_name": "Json"}\nnot json\n', '.jsonl')
+
+        self.assertIn("Created 1, skipped 0 existing, 1 invalid", output)
+
+    def test_endpoint_is_admin_only(self):
+        user = User.objects.create_user(email='plain@example.com', password='Test@1234?')
+        admin = User.objects.create_user(email='admin@example.com', password='Test@1234?', user_type=1)
+        for account, expected in ((user, status.HTTP_403_FORBIDDEN), (admin, status.HTTP_200_OK)):
+            token = AuthToken.objects.create(user=account)
+            upload = SimpleUploadedFile('users.csv', self.rows.encode(), content_type='text/csv')
+            response = self.client.post(
+                '/api/admin/import_users/', data={'file': upload, 'send_mail': 'false'},
+                HTTP_AUTHORIZATION=f'Bearer {token.key}',
+            )
+            self.assertEqual(response.status_code, expected)
+
+        self.assertEqual(response.data['data']['created'], 2)
+        self.assertFalse(MailOutbox.objects.exists())
+
+
+class SignupWriteTest(QueryBudgetMixin, TestCase):
+
+    signup_url = '/api/auth/register/'
+
+    def setUp(self):
+        super().setUp()
+        forget_group_ids()
+        Group.objects.create(name='user')
+        ensure_synced()
+
+    def signup(self, email):
+        return self.client.post(self.signup_url, data={
+            'email': email, 'password': 'Test@1234?', 'first_name': "New", 'last_name': "User",
+        })
+
+    def test_signup_query_budget(self):
+        """Test that a signup is three INSERTs once the group id is cached."""
+        self.signup('first@example.com')
+
+        # savepoint, user, search terms, group membership, outbox mail, release
+        with self.assertNumQueries(6):
+            response = self.signup('second@example.com')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(email='second@example.com')
+        self.assertTrue(user.check_password('Test@1234?'))
+        self.assertTrue(user.groups.filter(name='user').exists())
+
+    def test_duplicate_email_is_rejected_by_the_unique_index(self):
+        self.signup('dup@example.com')
+
+        response = self.signup('dup@example.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], USER_ALREADY_EXISTS)
+        self.assertEqual(MailOutbox.objects.filter(to='dup@example.com').count(), 1)
+
+    def test_stale_group_id_is_resolved_again(self):
+        """Test that a failed membership insert is retried once with a fresh group id, not reported as a duplicate."""
+        add_user_to_group = AuthSignupViewSet.add_user_to_group
+        calls = []
+
+        def stale_group(view, user):
+            calls.append(user.email)
+            if len(calls) == 1:
+                raise IntegrityError("FOREIGN KEY constraint failed")
+            add_user_to_group(view, user)
+
+        with patch.object(AuthSignupViewSet, 'add_user_to_group', stale_group):
+            response = self.signup('retry@example.com')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(User.objects.get(email='retry@example.com').groups.filter(name='user').exists())
+        self.assertEqual(MailOutbox.objects.filter(to='retry@example.com').count(), 1)
+
+    def test_verification_link_matches_token(self):
+        self.signup('link@example.com')
+
+        context = MailOutbox.objects.get(to='link@example.com').context
+        self.assertTrue(context['url'].endswith(f"/{context['uid']}/{context['token']}/"))
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+
+    def test_released_connections_are_reused(self):
+        metrics = ConnectionMetrics()
+        pool = ConnectionPool(FakeConnection, max_size=2, metrics=metrics)
+
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(metrics.snapshot()['connections_opened'], 1)
+        self.assertEqual(metrics.snapshot()['pool_acquires'], 2)
+
+    def test_full_pool_times_out(self):
+        metrics = ConnectionMetrics()
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.05, metrics=metrics)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(metrics.snapshot()['pool_timeouts'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=5)
+        held = pool.acquire()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            waiter = executor.submit(pool.acquire)
+            time.sleep(0.05)
+            pool.release(held)
+            self.assertIs(waiter.result(timeout=5), held)
+
+    def test_idle_connections_are_evicted_down_to_min_size(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=3, max_idle=0)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+
+        self.assertEqual(pool.stats()['pool_size'], 1)
+        self.assertEqual(sum(connection.closed for connection in connections), 2)
+
+    def test_fill_opens_connections_up_to_min_size(self):
+        metrics = ConnectionMetrics()
+        pool = ConnectionPool(FakeConnection, min_size=2, max_size=3, metrics=metrics)
+        held = pool.acquire()
+
+        pool.fill()
+        pool.fill()
+
+        self.assertEqual(pool.stats()['pool_size'], 2)
+        self.assertEqual(pool.stats()['pool_idle'], 1)
+        self.assertIsNot(pool.acquire(), held)
+        self.assertEqual(metrics.snapshot()['connections_opened'], 2)
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        def check(connection):
+            if connection.closed:
+                raise ConnectionError
+
+        pool = ConnectionPool(FakeConnection, max_size=1, check=check)
+        broken = pool.acquire()
+        pool.release(broken)
+        broken.closed = True
+
+        self.assertIsNot(pool.acquire(), broken)
+        self.assertEqual(pool.stats()['pool_size'], 1)
+
+
+class PooledDatabaseWrapperTest(TestCase):
+
+    def setUp(self):
+        class DatabaseWrapper(PooledDatabaseWrapperMixin, sqlite3_base.DatabaseWrapper):
+            pass
+
+        self.path = os.path.join(os.environ.get('TMPDIR', '/tmp'), f'pooled-{os.getpid()}.sqlite3')
+        self.settings = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.path, 'OPTIONS': {}, 'TIME_ZONE': None,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True,
+            'POOL': {'MAX_SIZE': 2},
+        }
+        self.wrapper_class = DatabaseWrapper
+        reset_metrics()
+
+    def tearDown(self):
+        close_pools()
+        reset_metrics()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_close_returns_connection_to_pool(self):
+        wrapper = self.wrapper_class(self.settings, alias='pooled')
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+
+        other = self.wrapper_class(self.settings, alias='pooled')
+        with other.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(other.connection, raw)
+        other.close()
+
+        metrics = get_metrics('pooled').snapshot()
+        self.assertEqual(metrics['connections_opened'], 1)
+        self.assertEqual(metrics['pool_acquires'], 2)
+
+    def test_first_connection_warms_the_pool_to_min_size(self):
+        self.settings['POOL'] = {'MIN_SIZE': 2, 'MAX_SIZE': 3}
+        wrapper = self.wrapper_class(self.settings, alias='pooled')
+        wrapper.ensure_connection()
+
+        stats = get_pools()['pooled'].stats()
+        self.assertEqual((stats['pool_size'], stats['pool_idle']), (2, 1))
+        wrapper.close()
+
+    def test_connection_closed_in_transaction_is_not_reused(self):
+        wrapper = self.wrapper_class(self.settings, alias='pooled')
+        wrapper.ensure_connection()
+        wrapper.in_atomic_block = True
+        raw = wrapper.connection
+        wrapper.close()
+        wrapper.in_atomic_block = False
+
+        other = self.wrapper_class(self.settings, alias='pooled')
+        other.ensure_connection()
+        self.assertIsNot(other.connection, raw)
+        other.close()
+
+
+class DatabaseMetricsTest(TestCase):
+
+    def test_endpoint_is_admin_only(self):
+        user = User.objects.create_user(email='plain@example.com', password='Test@1234?')
+        admin = User.objects.create_user(email='admin@example.com', password='Test@1234?', user_type=1)
+        for account, expected in ((user, status.HTTP_403_FORBIDDEN), (admin, status.HTTP_200_OK)):
+            token = AuthToken.objects.create(user=account)
+            response = self.client.get('/api/admin/db_metrics/', HTTP_AUTHORIZATION=f'Bearer {token.key}')
+            self.assertEqual(response.status_code, expected)
+        self.assertIn('connections_opened', response.data['data']['default'])
+
+
+class FixedLag:
+
+    def __init__(self, lags):
+        self.lags = lags
+
+    def get(self, alias):
+        return self.lags[alias]
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    """Routes reads between the test database and a second SQLite file used as replica."""
+
+    def setUp(self):
+        self.path = os.path.join(os.environ.get('TMPDIR', '/tmp'), f'replica-{os.getpid()}.sqlite3')
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'NAME': self.path}
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(AuthToken)
+
+        self.user = User.objects.create_user(email='primary@example.com', password='Test@1234?', first_name='Primary')
+        User.objects.using('replica').bulk_create([
+            User(pk=self.user.pk, email=self.user.email, password=self.user.password, first_name='Replica'),
+        ])
+        token_cache.clear()
+        cache.clear()
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        os.remove(self.path)
+
+    def in_request(self):
+        return rData.set_request(RequestFactory().get('/'))
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Replica')
+
+        User.objects.filter(pk=self.user.pk).update(first_name='Updated')
+        self.assertEqual(User.objects.using('default').get(pk=self.user.pk).first_name, 'Updated')
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Replica')
+
+    def test_reads_after_a_write_stick_to_the_primary(self):
+        token = self.in_request()
+        try:
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Replica')
+            self.user.save(update_fields=['first_name'])
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Primary')
+        finally:
+            rData.reset_request(token)
+
+        # The user's next request is pinned once it is authenticated, other users' are not.
+        token = self.in_request()
+        try:
+            pin_if_recent_write('someone-else')
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Replica')
+            pin_if_recent_write(self.user.pk)
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Primary')
+        finally:
+            rData.reset_request(token)
+
+    def test_reads_in_a_primary_transaction_stay_on_the_primary(self):
+
+        with transaction.atomic():
+            self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Primary')
+
+    def test_token_missing_on_replica_is_read_from_primary(self):
+        token = AuthToken.objects.create(user=self.user)
+
+        user, _ = cTokenAuthentication().authenticate_credentials(token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_strategies_skip_lagging_replicas(self):
+        router = ReplicaRouter()
+        router.lag = FixedLag({'r1': 0, 'r2': 1, 'r3': 60})
+
+        self.assertEqual({router.choose_replica(['r1', 'r2']) for _ in range(4)}, {'r1', 'r2'})
+        self.assertEqual({router.choose_replica(['r1', 'r3']) for _ in range(4)}, {'r1'})
+        self.assertEqual(router.choose_replica(['r3']), 'default')
+        with override_settings(DATABASE_REPLICA_STRATEGY='least_lag'):
+            self.assertEqual(router.choose_replica(['r2', 'r1']), 'r1')
+            self.assertEqual(router.choose_replica(['r3']), 'default')
+
+
+class ProfileCacheTest(QueryBudgetMixin, TestCase):
+
+    profile_url = '/api/auth/manage_profile/'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(email='poll@example.com', password='Test@1234?', first_name="Poll")
+        Group.objects.create(name='user').user_set.add(self.user)
+        sync_group_permissions()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AuthToken.objects.create(user=self.user).key}'}
+
+    def test_poll_with_matching_etag_is_not_modified_without_queries(self):
+        response = self.client.get(self.profile_url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'no-cache'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_cached_payload_is_served_without_queries(self):
+        self.client.get(self.profile_url, **self.auth)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH='"stale"', **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['first_name'], "Poll")
+
+    def test_update_changes_the_etag(self):
+        etag = self.client.get(self.profile_url, **self.auth)['ETag']
+
+        response = self.client.post(self.profile_url, data={'first_name': "Renamed"}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['data']['first_name'], "Renamed")
+
+    def test_user_save_invalidates_the_cache(self):
+        self.client.get(self.profile_url, **self.auth)
+        self.assertIsNotNone(profile_cache.get(self.user.pk))
+
+        self.user.save()
+        self.assertIsNone(profile_cache.get(self.user.pk))
+
+    def test_profile_read_before_an_update_is_not_cached(self):
+        """Test that a read racing with an update cannot cache the old profile."""
+        loaded_at = time.time()
+        entry = profile_cache.entry(self.user, {"first_name": "Stale"})
+        self.user.first_name = "Fresh"
+        self.user.save()
+        async_to_sync(profile_cache.aset)(self.user.pk, entry, loaded_at)
+
+        self.assertIsNone(profile_cache.get(self.user.pk))
+        response = self.client.get(self.profile_url, **self.auth)
+        self.assertEqual(response.data['data']['first_name'], "Fresh")
+        self.assertIsNotNone(profile_cache.get(self.user.pk))
+
+    def test_leaving_the_group_revokes_cached_permissions(self):
+        self.client.get(self.profile_url, **self.auth)
+
+        Group.objects.get(name='user').user_set.remove(self.user)
+        response = self.client.get(self.profile_url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_permissions_loaded_before_a_revocation_are_not_cached(self):
+        """Test that a permission load racing with a group change cannot cache the old set."""
+        user = User.objects.get(pk=self.user.pk)
+        get_all_permissions = user.get_all_permissions
+
+        def load_then_revoke():
+            permissions = get_all_permissions()
+            Group.objects.get(name='user').user_set.remove(self.user)
+            return permissions
+
+        with patch.object(user, 'get_all_permissions', side_effect=load_then_revoke):
+            permission_cache.prime(user)
+
+        self.assertTrue(user.has_perm('users.view_user'))
+        response = self.client.get(self.profile_url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+UPDATED = datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+
+
+class PolicyViewSet(nBaseViewset):
+    queryset = User.objects.none()
+    authentication_classes = []
+    permission_classes = []
+    handled = 0
+    cache_policies = {
+        'list': CachePolicy(
+            etag=lambda view, request: 'v1',
+            last_modified=lambda view, request: UPDATED,
+            cache_control={'max_age': 60, 'public': True},
+            vary=['Accept-Language'],
+        ),
+    }
+
+    def list(self, request, *args, **kwargs):
+        PolicyViewSet.handled += 1
+        return ResponseHandler.success(data={"value": 1})
+
+
+class AsyncPolicyViewSet(nAsyncBaseViewset):
+    queryset = User.objects.none()
+    cache_policies = {'list': CachePolicy(etag=lambda view, request: view.async_etag())}
+
+    async def async_etag(self):
+        return 'async-v1'
+
+    async def list(self, request, *args, **kwargs):
+        return ResponseHandler.success(data={"value": 1})
+
+
+class ConditionalResponseTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = PolicyViewSet.as_view({'get': 'list'})
+        PolicyViewSet.handled = 0
+
+    def test_full_response_carries_the_policy_headers(self):
+        response = self.view(self.factory.get('/'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(response['Last-Modified'], 'Tue, 02 Jan 2024 03:04:05 GMT')
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'max-age=60', 'public'})
+        self.assertIn('Accept-Language', response['Vary'])
+
+    def test_matching_etag_short_circuits_before_the_handler(self):
+        response = self.view(self.factory.get('/', HTTP_IF_NONE_MATCH='"v1"'))
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(PolicyViewSet.handled, 0)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+    def test_head_and_if_modified_since(self):
+        view = PolicyViewSet.as_view({'get': 'list', 'head': 'list'})
+        response = view(self.factory.head('/', HTTP_IF_MODIFIED_SINCE='Tue, 02 Jan 2024 03:04:05 GMT'))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = view(self.factory.get('/', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2024 00:00:00 GMT'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unmet_if_match_is_412(self):
+        response = self.view(self.factory.get('/', HTTP_IF_MATCH='"other"'))
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_async_viewset_awaits_validators(self):
+        view = AsyncPolicyViewSet.as_view({'get': 'list'})
+
+        response = asyncio.run(view(self.factory.get('/', HTTP_IF_NONE_MATCH='"async-v1"')))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_success_with_request_answers_conditionally(self):
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='W/"v2"')
+
+        response = ResponseHandler.success(data={"value": 1}, etag='"v2"', request=request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = ResponseHandler.success(data={"value": 1}, etag='"v3"', request=request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], '"v3"')
+
+
+class AdminClientMixin:
+    """
+    Signs the test client in as an admin of `admin_user_type` for the endpoint at `url`.
+    """
+    admin_user_type = 2
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='Test@1234?', user_type=self.admin_user_type
+        )
+        self.auth = self.auth_for(self.admin)
+
+    @staticmethod
+    def auth_for(user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AuthToken.objects.create(user=user).key}'}
+
+    def test_rejects_non_admins(self):
+        user = User.objects.create_user(email='not-admin@example.com', password='Test@1234?')
+        response = self.client.get(self.url, **self.auth_for(user))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UserDirectoryTest(AdminClientMixin, QueryBudgetMixin, TestCase):
+
+    url = '/api/admin/users/'
+
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create([
+            User(email=f'member{i}@example.com', is_verified=i % 2 == 0, device_type=1 + i % 3) for i in range(11)
+        ])
+        # Several users share a timestamp, as in a bulk import: the id breaks the tie.
+        User.objects.filter(email__in=[f'member{i}@example.com' for i in range(3, 8)]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+    def walk(self, url, **params):
+        pages = []
+        response = self.client.get(url, params, **self.auth)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['data'])
+            if not response.data['data']['next']:
+                return pages
+            response = self.client.get(response.data['data']['next'], **self.auth)
+
+    def test_pages_cover_every_user_once_in_keyset_order(self):
+        pages = self.walk(self.url, page_size=5)
+
+        rows = [row for page in pages for row in page['results']]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len({row['id'] for row in rows}), User.objects.count())
+        expected = list(User.objects.order_by('-created_at', '-id').values_list('email', flat=True))
+        self.assertEqual([row['email'] for row in rows], expected)
+        self.assertEqual(set(rows[0]), set(USER_DIRECTORY_FIELDS))
+
+    def test_previous_returns_the_page_before(self):
+        first = self.client.get(self.url, {'page_size': 4}, **self.auth).data['data']
+        second = self.client.get(first['next'], **self.auth).data['data']
+        self.assertIsNone(first['previous'])
+
+        back = self.client.get(second['previous'], **self.auth).data['data']
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_filters(self):
+        rows = [row for page in self.walk(self.url, is_verified='true', device_type=1) for row in page['results']]
+
+        self.assertTrue(rows)
+        self.assertTrue(all(row['is_verified'] and row['device_type'] == 1 for row in rows))
+        self.assertEqual(len(rows), User.objects.filter(is_verified=True, device_type=1).count())
+
+    def test_deep_page_is_one_query(self):
+        first = self.client.get(self.url, {'page_size': 3}, **self.auth).data['data']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(first['next'], **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rejects_bad_cursors(self):
+        valid = json.dumps([timezone.now().isoformat(), str(self.admin.pk), False])
+        bad_pk = json.dumps([timezone.now().isoformat(), 'not-a-uuid', False])
+        bad_timestamp = json.dumps([5, str(self.admin.pk), False])
+        for cursor in ('garbage', bad_pk, bad_timestamp):
+            token = cursor if cursor == 'garbage' else base64.urlsafe_b64encode(cursor.encode()).decode()
+            response = self.client.get(self.url, {'cursor': token}, **self.auth)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(self.url, {'cursor': base64.urlsafe_b64encode(valid.encode()).decode()}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ExportUsersTest(AdminClientMixin, QueryBudgetMixin, TestCase):
+
+    url = '/api/admin/export_users/'
+
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create([
+            User(email=f'exported{i}@example.com', first_name=f'Name, {i}', is_verified=i % 2 == 0) for i in range(9)
+        ])
+
+    def export(self, **params):
+        response = self.client.get(self.url, params, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        response, body = self.export()
+
+        rows = list(csv.DictReader(body.decode().splitlines()))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertEqual(tuple(rows[0]), EXPORT_FIELDS)
+        self.assertEqual(
+            [row['email'] for row in rows],
+            list(User.objects.order_by('created_at', 'id').values_list('email', flat=True)),
+        )
+        self.assertIn('Name, 3', [row['first_name'] for row in rows])
+
+    def test_gzipped_jsonl_export_with_filters(self):
+        response, body = self.export(file_format='jsonl', gzip='true', is_verified='true')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual(len(rows), User.objects.filter(is_verified=True).count())
+        self.assertTrue(all(row['is_verified'] for row in rows))
+
+    @override_settings(USER_EXPORT_CHUNK_SIZE=2)
+    def test_one_query_and_small_blocks_whatever_the_row_count(self):
+        self.export()
+
+        with self.assertNumQueries(1):
+            response, body = self.export()
+        self.assertEqual(body.count(b'\n'), User.objects.count() + 1)
+
+        blocks = list(UserExporter(buffer_size=64).stream(User.objects.all(), 'csv'))
+        self.assertGreater(len(blocks), 3)
+        self.assertTrue(all(len(block) < 64 + 200 for block in blocks))
+
+    def test_rejects_bad_format(self):
+        response = self.client.get(self.url, {'file_format': 'xml'}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(email='exported1@example.com').update(first_name='=HYPERLINK("http://evil")', last_name='-2+3')
+
+        rows = {row['email']: row for row in csv.DictReader(self.export()[1].decode().splitlines())}
+
+        self.assertEqual(rows['exported1@example.com']['first_name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(rows['exported1@example.com']['last_name'], "'-2+3")
+
+    def test_asgi_streams_blocks_as_they_are_read(self):
+        """Test that under ASGI the export is an async iterator, which Django sends block by block."""
+        async def fetch():
+            response = await self.async_client.get(self.url, headers={'Authorization': self.auth['HTTP_AUTHORIZATION']})
+            return response, [block async for block in response.streaming_content]
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response, blocks = async_to_sync(fetch)()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        self.assertFalse([warning for warning in caught if 'synchronous iterators' in str(warning.message)])
+        self.assertGreater(len(blocks), 1)
+        rows = list(csv.DictReader(b''.join(blocks).decode().splitlines()))
+        self.assertEqual(len(rows), User.objects.count())
+
+    def test_command_writes_a_gzipped_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'users.jsonl.gz')
+        out = StringIO()
+
+        call_command('export_users', path, '--verified', stdout=out)
+
+        with gzip.open(path, 'rt') as stream:
+            emails = {json.loads(line)['email'] for line in stream}
+        self.assertEqual(emails, set(User.objects.filter(is_verified=True).values_list('email', flat=True)))
+        self.assertIn(f'Exported {len(emails)} users', out.getvalue())
+
+
+class UserSearchTest(AdminClientMixin, QueryBudgetMixin, TestCase):
+
+    url = '/api/admin/search_users/'
+    admin_user_type = 1
+
+    def setUp(self):
+        super().setUp()
+        self.zoe = User.objects.create_user(email='Zoe.Smith@Example.com', first_name='Zoë', last_name='Smith')
+        User.objects.create_user(email='john@example.com', first_name='John', last_name='Smithers')
+        User.objects.create_user(email='jo.hn@example.com', first_name='Johanna', last_name='Brown')
+
+    def emails(self, query, limit=None):
+        return [user.email for user in search_users(query, limit)]
+
+    def test_normalized_prefixes(self):
+        self.assertEqual(normalize_term('  Zoë   SMITH '), 'zoe smith')
+        self.assertEqual(self.emails('ZOE'), ['Zoe.Smith@example.com'])
+        self.assertEqual(self.emails('zoe sm'), ['Zoe.Smith@example.com'])
+        self.assertEqual(set(self.emails('smith')), {'Zoe.Smith@example.com', 'john@example.com'})
+        self.assertEqual(self.emails('jo.'), ['jo.hn@example.com'])
+        self.assertEqual(self.emails('mith'), [])
+        self.assertEqual(self.emails('   '), [])
+
+    def test_results_are_distinct_and_limited(self):
+        # 'jo' matches John by email, first name and full name: one result.
+        self.assertEqual(sorted(self.emails('jo')), ['jo.hn@example.com', 'john@example.com'])
+        self.assertEqual(len(self.emails('jo', limit=1)), 1)
+
+    def test_terms_follow_saves(self):
+        self.zoe.last_name = 'Jones'
+        self.zoe.save()
+        self.assertEqual(self.emails('zoe j'), ['Zoe.Smith@example.com'])
+        self.assertNotIn('Zoe.Smith@example.com', self.emails('smith'))
+
+        # Saves that do not touch the email or names do not touch the terms.
+        with self.assertNumQueries(1):
+            self.zoe.save(update_fields=['last_login'])
+
+        self.zoe.delete()
+        self.assertEqual(self.emails('zoe'), [])
+
+    def test_rebuild_command(self):
+        User.objects.filter(pk=self.zoe.pk).update(first_name='Chloé')
+        UserSearchTerm.objects.filter(term='john@example.com').delete()
+        out = StringIO()
+
+        call_command('rebuild_user_search', '--chunk-size', '2', stdout=out)
+
+        self.assertEqual(self.emails('chloe'), ['Zoe.Smith@example.com'])
+        self.assertEqual(self.emails('john@'), ['john@example.com'])
+        self.assertIn(f'Indexed {User.objects.count()} users', out.getvalue())
+
+    def test_prefixes_ending_at_the_top_of_a_range(self):
+        """Test that prefixes ending in 'z', '9' or punctuation match exactly the terms starting with them."""
+        User.objects.create_user(email='liz@example.com', first_name='Liz', last_name='Lopez')
+        User.objects.create_user(email='user9@example.com', first_name='Nine')
+        User.objects.create_user(email='user90@example.com', first_name='Ninety')
+        User.objects.create_user(email='userA@example.com', first_name='Upper')
+
+        self.assertEqual(self.emails('liz'), ['liz@example.com'])
+        self.assertEqual(self.emails('liz lopez'), ['liz@example.com'])
+        self.assertEqual(sorted(self.emails('user9')), ['user90@example.com', 'user9@example.com'])
+        self.assertEqual(self.emails('user9@'), ['user9@example.com'])
+        self.assertEqual(self.emails('usera@'), ['userA@example.com'])
+
+    def test_terms_collated_byte_wise_on_postgresql_and_mysql(self):
+        self.assertFalse(collate_terms())
+
+        postgresql = MagicMock(vendor='postgresql', data_types={'CharField': 'varchar(%(max_length)s)'})
+        postgresql.ops.quote_name = lambda name: f'"{name}"'
+        cursor = postgresql.cursor.return_value.__enter__.return_value
+        with patch('apps.users.search.connections', {'default': postgresql}):
+            cursor.fetchone.return_value = ('en_US.utf8',)
+            self.assertTrue(collate_terms())
+            cursor.execute.assert_called_with(
+                'ALTER TABLE "users_usersearchterm" ALTER COLUMN "term" TYPE varchar(254) COLLATE "C"'
+            )
+            cursor.fetchone.return_value = ('C',)
+            self.assertFalse(collate_terms())
+
+        mysql = MagicMock(vendor='mysql', data_types={'CharField': 'varchar(%(max_length)s)'})
+        mysql.ops.quote_name = lambda name: f'`{name}`'
+        cursor = mysql.cursor.return_value.__enter__.return_value
+        with patch('apps.users.search.connections', {'default': mysql}):
+            cursor.fetchone.return_value = ('utf8mb4', 'utf8mb4_0900_ai_ci')
+            self.assertTrue(collate_terms())
+            cursor.execute.assert_called_with(
+                'ALTER TABLE `users_usersearchterm` MODIFY `term` varchar(254) '
+                'CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL'
+            )
+            cursor.fetchone.return_value = ('utf8mb4', 'utf8mb4_bin')
+            self.assertFalse(collate_terms())
+
+    def test_endpoint(self):
+        self.client.get(self.url, {'q': 'smith'}, **self.auth)
+
+        # term range scan, then the users by primary key
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'q': 'smith', 'limit': 1}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual(set(response.data['data'][0]), set(USER_DIRECTORY_FIELDS))
+
+        response = self.client.get(self.url, {'q': ''}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def jpeg_bytes(size=(300, 200), color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ProfilePhotoTest(TestCase):
+
+    url = '/api/auth/photo_upload/'
+
+    def setUp(self):
+        token_cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media.name, PHOTO_UPLOAD_DIR=os.path.join(media.name, 'parts'), PHOTO_UPLOAD_CHUNK_SIZE=4096
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(email='photo@example.com', password='Test@1234?')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AuthToken.objects.create(user=self.user).key}'}
+
+    def start(self, content):
+        response = self.client.post(self.url, {'filename': 'me.jpg', 'size': len(content)}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return f"{self.url}{response.data['data']['id']}/"
+
+    def send(self, url, content, offset):
+        return self.client.patch(
+            url, data=content, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **self.auth
+        )
+
+    def upload(self, content):
+        url = self.start(content)
+        for offset in range(0, len(content), 4096):
+            response = self.send(url, content[offset:offset + 4096], offset)
+        return response
+
+    def test_resumable_upload(self):
+        content = jpeg_bytes((900, 700))
+        self.assertGreater(len(content), 4096)
+        url = self.start(content)
+
+        self.assertEqual(self.send(url, content[:1000], 0).data['data']['offset'], 1000)
+        # A retried or out-of-order chunk is refused with the offset to resume from.
+        response = self.send(url, content[:1000], 0)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['data']['offset'], 1000)
+        self.assertEqual(self.client.head(url, **self.auth)['Upload-Offset'], '1000')
+        self.assertEqual(self.send(url, content[1000:10000], 1000).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        offset = 1000
+        while offset < len(content):
+            response = self.send(url, content[offset:offset + 4096], offset)
+            offset += 4096
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['photo_variants'], {})
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_photo.name.endswith('.jpg'))
+        with default_storage.open(self.user.profile_photo.name) as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertFalse(os.listdir(os.path.join(settings.MEDIA_ROOT, 'parts')))
+        self.assertTrue(PhotoJob.objects.filter(user=self.user, source=self.user.profile_photo.name).exists())
+
+    def test_worker_renders_variants(self):
+        self.upload(jpeg_bytes((1200, 800)))
+
+        out = StringIO()
+        call_command('run_photo_worker', '--once', stdout=out)
+
+        self.assertIn('Rendered 1, failed 0', out.getvalue())
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.profile_photo_variants), set(settings.PROFILE_PHOTO_VARIANTS))
+        with default_storage.open(self.user.profile_photo_variants['thumb']) as thumb, Image.open(thumb) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (64, 64)))
+        self.assertEqual(PhotoJob.objects.get().status, PhotoJob.STATUS_DONE)
+        data = UpdateUserSerializer(self.user).data
+        self.assertTrue(data['profile_photo_variants']['small'].endswith('.webp'))
+
+    def test_variants_of_a_replaced_photo_are_discarded(self):
+        self.upload(jpeg_bytes(color=(10, 10, 10)))
+        self.upload(jpeg_bytes(color=(250, 250, 250)))
+
+        call_command('run_photo_worker', '--once', stdout=StringIO())
+        call_command('gc_media', '--grace-hours', '0', stdout=StringIO())
+
+        self.user.refresh_from_db()
+        root = os.path.join(settings.MEDIA_ROOT, 'users/photos/variants')
+        variants = {name for _, _, names in os.walk(root) for name in names}
+        self.assertEqual(variants, {os.path.basename(name) for name in self.user.profile_photo_variants.values()})
+        self.assertEqual(len(variants), len(settings.PROFILE_PHOTO_VARIANTS))
+
+    def test_invalid_image_is_dropped(self):
+        response = self.upload(b'not an image' * 10)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertFalse(PhotoJob.objects.exists())
+
+    def test_uploads_are_private(self):
+        url = self.start(jpeg_bytes())
+        other = User.objects.create_user(email='other@example.com', password='Test@1234?')
+        token = AuthToken.objects.create(user=other)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token.key}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_update_queues_variants(self):
+        photo = SimpleUploadedFile('me.jpg', jpeg_bytes(), content_type='image/jpeg')
+        serializer = UpdateUserSerializer(self.user, data={'profile_photo': photo}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        serializer.save()
+
+        self.assertEqual(PhotoJob.objects.get().source, self.user.profile_photo.name)
+        self.assertEqual(self.user.profile_photo_variants, {})
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = ContentAddressedStorage()
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), settings.MEDIA_ROOT)
+            for root, _, names in os.walk(settings.MEDIA_ROOT) if '.incoming' not in root for name in names
+        )
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save('users/photos/a.JPG', ContentFile(b'same bytes'))
+        second = self.storage.save('users/photos/b.jpg', ContentFile(b'same bytes'))
+        other = self.storage.save('users/photos/c.jpg', ContentFile(b'other bytes'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^users/photos/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$')
+        self.assertTrue(is_content_addressed(first))
+        self.assertFalse(is_content_addressed('user.png'))
+        self.assertEqual(self.stored_files(), sorted([first, other]))
+        self.assertEqual(MediaFile.objects.get(name=first).size, len(b'same bytes'))
+
+    def test_temporary_uploads_are_moved(self):
+        upload = TemporaryUploadedFile('me.jpg', 'image/jpeg', 5, None)
+        self.addCleanup(upload.close)
+        upload.write(b'bytes')
+        upload.flush()
+
+        name = self.storage.save('users/photos/me.jpg', upload)
+
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'bytes')
+
+    def test_references_and_garbage_collection(self):
+        photo = self.storage.save('users/photos/p.jpg', ContentFile(jpeg_bytes()))
+        ann = User.objects.create_user(email='ann@example.com', password='Test@1234?')
+        bob = User.objects.create_user(email='bob@example.com', password='Test@1234?')
+        set_profile_photo(ann, photo)
+        set_profile_photo(User.objects.get(pk=bob.pk), photo)
+        self.assertEqual(MediaFile.objects.get(name=photo).references, 2)
+
+        ann.delete()
+        bob = User.objects.get(pk=bob.pk)
+        bob.profile_photo = User._meta.get_field('profile_photo').default
+        bob.save()
+        self.assertEqual(MediaFile.objects.get(name=photo).references, 0)
+
+        # Within the grace period, and on a dry run, nothing goes.
+        self.assertEqual(collect_garbage(timedelta(hours=1)), (0, 0))
+        self.assertEqual(collect_garbage(timedelta(0), dry_run=True)[0], 1)
+        self.assertTrue(self.storage.exists(photo))
+
+        out = StringIO()
+        call_command('gc_media', '--grace-hours', '0', stdout=out)
+        self.assertIn('Deleted 1 unreferenced files', out.getvalue())
+        self.assertFalse(self.storage.exists(photo))
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_saving_during_garbage_collection_keeps_the_file(self):
+        photo = self.storage.save('users/photos/p.jpg', ContentFile(b'photo'))
+        MediaFile.objects.update(updated_at=timezone.now() - timedelta(hours=2))
+        exists = os.path.exists
+
+        def collect_after_lookup(path):
+            # The collection runs right after the storage looked the file up.
+            found = exists(path)
+            if path == self.storage.path(photo):
+                collect_garbage(timedelta(hours=1), storage=self.storage)
+            return found
+
+        with patch('core.storage.content_addressed.os.path.exists', side_effect=collect_after_lookup):
+            self.assertEqual(self.storage.save('users/photos/again.jpg', ContentFile(b'photo')), photo)
+
+        self.assertTrue(self.storage.exists(photo))
+        self.assertTrue(MediaFile.objects.filter(name=photo).exists())
+
+    def test_recount_after_bulk_update(self):
+        photo = self.storage.save('users/photos/p.jpg', ContentFile(jpeg_bytes()))
+        User.objects.create_user(email='ann@example.com', password='Test@1234?')
+        User.objects.update(profile_photo=photo)
+        self.assertEqual(MediaFile.objects.get(name=photo).references, 0)
+
+        call_command('gc_media', '--recount', '--grace-hours', '0', stdout=StringIO())
+
+        self.assertEqual(MediaFile.objects.get(name=photo).references, 1)
+        self.assertTrue(self.storage.exists(photo))
+
+    def test_hashed_media_is_served_immutable(self):
+        photo = self.storage.save('users/photos/p.jpg', ContentFile(jpeg_bytes()))
+        with open(os.path.join(settings.MEDIA_ROOT, 'user.png'), 'wb') as default:
+            default.write(b'png')
+        request = RequestFactory().get('/media/')
+
+        response = serve_media(request, photo, document_root=settings.MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response = serve_media(request, 'user.png', document_root=settings.MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+
+class MediaServingTest(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.content = bytes(range(256)) * 4
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.name = ContentAddressedStorage.hashed_name('users/photos', digest, '.jpg')
+        self.etag = f'"{digest}"'
+        os.makedirs(os.path.dirname(os.path.join(self.root, self.name)))
+        with open(os.path.join(self.root, self.name), 'wb') as out:
+            out.write(self.content)
+
+    def fetch(self, path=None, **headers):
+        request = RequestFactory().get(f'/media/{path or self.name}', **headers)
+        return serve_media(request, path or self.name, document_root=self.root)
+
+    def test_full_response_has_validators(self):
+        response = self.fetch()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response), self.content)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.fetch(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        self.assertEqual(b''.join(self.fetch(HTTP_RANGE='bytes=-5')), self.content[-5:])
+        self.assertEqual(b''.join(self.fetch(HTTP_RANGE='bytes=1000-')), self.content[1000:])
+
+        response = self.fetch(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        # A stale If-Range or several ranges get the whole file.
+        self.assertEqual(self.fetch(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.fetch(HTTP_RANGE='bytes=0-9,20-29').status_code, 200)
+
+    def test_hidden_and_outside_paths_are_not_found(self):
+        os.makedirs(os.path.join(self.root, '.incoming'))
+        with open(os.path.join(self.root, '.incoming', 'part'), 'wb') as part:
+            part.write(b'partial')
+
+        for path in ('.incoming/part', '../etc/passwd', 'users/photos', 'missing.jpg'):
+            with self.assertRaises(Http404):
+                self.fetch(path)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_offload_leaves_the_bytes_to_the_front_server(self):
+        response = self.fetch()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        response = self.fetch(HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+
+    def test_collectstatic_precompresses_hashed_files(self):
+        storage = GzipManifestStaticFilesStorage(location=self.root, base_url='/static/')
+        storage.save('css/app.css', ContentFile(b'body { color: #123456; }\n' * 100))
+        storage.save('css/tiny.css', ContentFile(b'a{}'))
+        storage.save('img/logo.png', ContentFile(self.content))
+        paths = {name: (storage, name) for name in ('css/app.css', 'css/tiny.css', 'img/logo.png')}
+
+        processed = [result for result in storage.post_process(paths) if result[2]]
+
+        hashed = storage.stored_name('css/app.css')
+        self.assertRegex(hashed, r'^css/app\.[0-9a-f]{12}\.css$')
+        self.assertIn((hashed, f'{hashed}.gz', True), processed)
+        self.assertFalse(storage.exists(f"{storage.stored_name('css/tiny.css')}.gz"))
+        self.assertFalse(storage.exists(f"{storage.stored_name('img/logo.png')}.gz"))
+
+        request = RequestFactory().get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, br')
+        response = serve_static(request, hashed, document_root=self.root)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(b''.join(response)), b'body { color: #123456; }\n' * 100)
+
+        response = serve_static(RequestFactory().get(f'/static/{hashed}'), hashed, document_root=self.root)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class UnixSocketChannelLayerTest(SimpleTestCase):
+    """
+    Two layer instances on one socket directory stand for two worker processes.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(dir='/tmp')
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def layer(self, **config):
+        return UnixSocketChannelLayer(path=self.path, **config)
+
+    async def test_group_send_reaches_members_in_other_processes(self):
+        first, second, sender = self.layer(), self.layer(), self.layer()
+        channels = [await first.new_channel(), await second.new_channel()]
+        await first.group_add('notifications', channels[0])
+        await second.group_add('notifications', channels[1])
+
+        await sender.group_send('notifications', {'type': 'send_notification', 'data': {'id': 1, 'raw': b'\x00'}})
+
+        for layer, channel in ((first, channels[0]), (second, channels[1])):
+            message = await asyncio.wait_for(layer.receive(channel), 1)
+            self.assertEqual(message, {'type': 'send_notification', 'data': {'id': 1, 'raw': b'\x00'}})
+        # A process that only sends is not a peer.
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        for layer in (first, second, sender):
+            await layer.close()
+        self.assertEqual(os.listdir(self.path), [])
+
+    async def test_send_to_a_channel_of_another_process(self):
+        receiver, sender = self.layer(), self.layer()
+        channel = await receiver.new_channel()
+
+        await sender.send(channel, {'type': 'hello'})
+
+        self.assertEqual(await asyncio.wait_for(receiver.receive(channel), 1), {'type': 'hello'})
+        await receiver.close()
+        # The receiver's socket is gone.
+        with self.assertRaises(ChannelFull):
+            await sender.send(channel, {'type': 'hello'})
+
+    async def test_dead_peer_sockets_are_removed(self):
+        member, sender = self.layer(), self.layer()
+        await member.group_add('notifications', await member.new_channel())
+        # Exits without closing its layer.
+        member._socket.close()
+
+        await sender.group_send('notifications', {'type': 'send_notification'})
+
+        self.assertEqual(os.listdir(self.path), [])
+
+    async def test_full_channels_and_large_messages_are_refused(self):
+        layer = self.layer(capacity=1, max_message_size=1024)
+        channel = await layer.new_channel()
+        await layer.send(channel, {'type': 'one'})
+        with self.assertRaises(ChannelFull):
+            await layer.send(channel, {'type': 'two'})
+        with self.assertRaises(ValueError):
+            await layer.group_send('notifications', {'type': 'big', 'data': 'x' * 2048})
+        await layer.close()
+
+    async def test_group_send_many_delivers_once_per_channel(self):
+        member, sender = self.layer(), self.layer()
+        channel = await member.new_channel()
+        await member.group_add('user.1', channel)
+        await member.group_add('user_type.3', channel)
+
+        await sender.group_send_many(['user.1', 'user_type.3', 'user.2'], {'type': 'send_notification'})
+
+        self.assertEqual(await asyncio.wait_for(member.receive(channel), 1), {'type': 'send_notification'})
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(member.receive(channel), 0.05)
+        await member.close()
+
+    async def test_shared_or_foreign_socket_directories_are_refused(self):
+        os.chmod(self.path, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            await self.layer().new_channel()
+
+        os.chmod(self.path, 0o700)
+        with patch('core.channel_layers.unix_socket.os.geteuid', return_value=os.geteuid() + 1):
+            with self.assertRaises(ImproperlyConfigured):
+                await self.layer().new_channel()
+            # Nor does a process that only sends trust it.
+            with self.assertRaises(ImproperlyConfigured):
+                await self.layer().send('specific.p1-0!x', {'type': 'hello'})
+        self.assertEqual(os.listdir(self.path), [])
+
+    def test_default_path_is_the_runtime_directory(self):
+        with patch.dict(os.environ, {'RUNTIME_DIRECTORY': '', 'XDG_RUNTIME_DIR': '/run/user/1000'}):
+            self.assertEqual(UnixSocketChannelLayer().path, '/run/user/1000/django-channels')
+        with patch.dict(os.environ, {'RUNTIME_DIRECTORY': '/run/app:/run/other'}):
+            self.assertEqual(UnixSocketChannelLayer().path, '/run/app/django-channels')
+
+
+class NotifyViewSet(nAsyncBaseViewset):
+    queryset = User.objects.none()
+    authentication_classes = []
+    permission_classes = []
+
+    async def list(self, request, *args, **kwargs):
+        await anotify_user(request.query_params['user'], {'id': 6})
+        await anotify_users([request.query_params['user']], {'id': 7})
+        await anotify_role(int(request.query_params['user_type']), {'id': 8})
+        await anotify_group(request.query_params['group'], {'id': 9})
+        return ResponseHandler.success(data={})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationRoutingTest(TransactionTestCase):
+
+    def setUp(self):
+        self.member = User.objects.create_user(email='member@example.com', password='Test@1234?')
+        self.admin = User.objects.create_user(email='admin@example.com', password='Test@1234?', user_type=2)
+        self.team = Group.objects.create(name='team')
+        self.admin.groups.add(self.team)
+        self.member_key = AuthToken.objects.create(user=self.member).key
+        self.admin_key = AuthToken.objects.create(user=self.admin).key
+
+    async def connect(self, query_string=b'', headers=()):
+        scope = {
+            'type': 'websocket', 'path': '/ws/notifications/', 'query_string': query_string,
+            'headers': list(headers), 'subprotocols': [],
+        }
+        communicator = ApplicationCommunicator(NotificationConsumer.as_asgi(), scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        response = await communicator.receive_output(1)
+        return communicator, response['type'] == 'websocket.accept', response.get('code')
+
+    async def received(self, communicator):
+        if not await communicator.receive_nothing(0.1):
+            return json.loads((await communicator.receive_output(1))['text'])
+        return None
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+
+    async def test_connections_need_a_valid_token(self):
+        for query_string in (b'', b'bearer=wrong'):
+            _, connected, code = await self.connect(query_string)
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+        communicator, connected, _ = await self.connect(headers=[(b'authorization', f'Bearer {self.member_key}'.encode())])
+        self.assertTrue(connected)
+        await self.disconnect(communicator)
+
+    async def test_notifications_reach_only_their_recipients(self):
+        member, _, _ = await self.connect(f'bearer={self.member_key}'.encode())
+        admin, _, _ = await self.connect(f'bearer={self.admin_key}'.encode())
+
+        await sync_to_async(notify_user)(self.member.pk, {'id': 1})
+        self.assertEqual(await self.received(member), {'id': 1})
+        self.assertIsNone(await self.received(admin))
+
+        await sync_to_async(notify_role)(2, {'id': 2})
+        await sync_to_async(notify_group)(self.team.pk, {'id': 3})
+        self.assertEqual(await self.received(admin), {'id': 2})
+        self.assertEqual(await self.received(admin), {'id': 3})
+        self.assertIsNone(await self.received(member))
+
+        await sync_to_async(notify_users)([self.member.pk, self.admin.pk], {'id': 4})
+        await sync_to_async(send_notification_to_web)({'id': 5})
+        for communicator in (member, admin):
+            self.assertEqual(await self.received(communicator), {'id': 4})
+            self.assertEqual(await self.received(communicator), {'id': 5})
+            self.assertIsNone(await self.received(communicator))
+            await self.disconnect(communicator)
+
+    async def test_async_views_notify_without_a_thread_hop(self):
+        member, _, _ = await self.connect(f'bearer={self.member_key}'.encode())
+        admin, _, _ = await self.connect(f'bearer={self.admin_key}'.encode())
+        view = NotifyViewSet.as_view({'get': 'list'})
+
+        request = RequestFactory().get('/', {'user': self.member.pk, 'user_type': 2, 'group': self.team.pk})
+        # Scoped as RequestContextMiddleware does, so the request does not outlive the test.
+        token = rData.set_request(request)
+        try:
+            response = await view(request)
+        finally:
+            rData.reset_request(token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await self.received(member), {'id': 6})
+        self.assertEqual(await self.received(member), {'id': 7})
+        self.assertEqual(await self.received(admin), {'id': 8})
+        self.assertEqual(await self.received(admin), {'id': 9})
+        for communicator in (member, admin):
+            self.assertIsNone(await self.received(communicator))
+            await self.disconnect(communicator)
+        # The sync helpers are for sync callers only.
+        with self.assertRaises(RuntimeError):
+            notify_user(self.member.pk, {'id': 10})
@@ -4,7 +4,7 @@ from apps.users.authentications.forgotpassword.forgotpassword import  ForgotPass
 from apps.users.authentications.login.views import AuthLoginViewSet, AuthLogoutViewSet
 from apps.users.authentications.resetpassword.resetpassword import ResetPasswordViewSet
 from apps.users.authentications.signup.views import AuthSignupViewSet, UserVerification
-from apps.users.views import ManageProfile
+from apps.users.views import DatabaseMetrics, ExportUsers, ImportUsers, ManageProfile, ProfilePhotoUpload, UserDirectory, UserSearch
 
 router = routers.DefaultRouter()
 
@@ -16,3 +16,9 @@ router.register(r'auth/confirm_password', ConfirmPasswordViewSet)
 router.register(r'auth/verify_user', UserVerification)
 router.register(r'auth/reset_password', ResetPasswordViewSet)
 router.register(r'auth/manage_profile', ManageProfile)
+router.register(r'auth/photo_upload', ProfilePhotoUpload)
+router.register(r'admin/import_users', ImportUsers)
+router.register(r'admin/db_metrics', DatabaseMetrics)
+router.register(r'admin/users', UserDirectory)
+router.register(r'admin/export_users', ExportUsers)
+router.register(r'admin/search_users', UserSearch)
\ No newline at end of file
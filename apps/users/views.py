@@ -1,39 +1,82 @@
-from core.baseviewset.viewset import aBaseViewset
-from apps.users.models import User
+import io
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from core.baseviewset.pagination import KeysetPagination
+from core.baseviewset import rData
+from core.baseviewset.viewset import aAsyncBaseViewset, aBaseViewset, IsAdminUserType
+from apps.users.exporter import EXPORT_CONTENT_TYPES, UserExporter
+from apps.users.importer import UserImporter, detect_format
+from apps.users.models import PhotoUpload, User
+from apps.users.photos import finish_upload, start_upload, variant_urls, write_chunk
+from apps.users.profile_cache import profile_cache
+from apps.users.search import search_users
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
-from apps.users.serializers import UpdateUserSerializer
+from apps.users.filters import UserDirectoryFilter
+from apps.users.serializers import USER_DIRECTORY_FIELDS, ExportUsersSerializer, ImportUsersSerializer, StartPhotoUploadSerializer, UpdateUserSerializer, UserDirectorySerializer, UserSearchSerializer
+from core.db import database_metrics
+from core.response_handler.cache import CachePolicy
 from core.response_handler.handler import ResponseHandler
 from utils.messages import *
 
-class ManageProfile(aBaseViewset):
+async def cached_profile_etag(view, request):
+    """
+    ETag of the cached profile, if any. The entry is kept on the view for `list`.
+    """
+    view.profile_entry = await profile_cache.aget(request.user.id)
+    return view.profile_entry["etag"] if view.profile_entry else None
+
+
+class ManageProfile(aAsyncBaseViewset):
     """
     Viewset for managing user profiles. Supports listing and updating profiles.
+
+    Profile reads are served from `profile_cache` with an ETag; a matching
+    If-None-Match is answered with 304 Not Modified before the handler runs.
     """
     queryset = User.objects
     serializer_class = UpdateUserSerializer
-    http_method_names = ['get','post']
+    http_method_names = ['get', 'head', 'post']
+    # The payload is per user: clients may keep it but must revalidate.
+    cache_policies = {
+        'list': CachePolicy(etag=cached_profile_etag, cache_control={'private': True, 'no_cache': True}, vary=['Authorization']),
+    }
 
     @swagger_auto_schema(
         operation_description="Retrieve the profile of the currently logged-in user.",
         request_body = None,
         responses={
             status.HTTP_200_OK: DETAILS_FETCH_SUCCESSFULLY,
+            status.HTTP_304_NOT_MODIFIED: "Profile unchanged since the ETag in If-None-Match.",
             status.HTTP_400_BAD_REQUEST: HTTP_400_BAD_REQUEST
         },
         tags=['User Profile']
     )
-    def list(self, request, *args, **kwargs):
+    async def list(self, request, *args, **kwargs):
         """
         Retrieve the profile of the currently logged-in user.
         """
         try:
-            user = self.queryset.get(id=request.user.id)
-            serialized_data = self.serializer_class(user).data
+            entry = self.profile_entry
+            if entry is None:
+                loaded_at = time.time()
+                user = await self.queryset.aget(id=request.user.id)
+                entry = profile_cache.entry(user, self.serializer_class(user).data)
+                await profile_cache.aset(request.user.id, entry, loaded_at)
+
             return ResponseHandler.success(
-                data=serialized_data,
+                data=entry["data"],
                 message=DETAILS_FETCH_SUCCESSFULLY,
-                status_code=status.HTTP_200_OK
+                status_code=status.HTTP_200_OK,
+                etag=entry["etag"],
+                request=request
             )
         except User.DoesNotExist:
             return ResponseHandler.failure(
@@ -56,18 +99,20 @@ class ManageProfile(aBaseViewset):
         },
         tags=['User Profile']
     )
-    def create(self, request, *args, **kwargs):
+    async def create(self, request, *args, **kwargs):
         """
         Update the profile of the currently logged-in user.
         """
         try:
             # Pass the request data to the serializer
-            user = self.queryset.get(id=request.user.id)
+            user = await self.queryset.aget(id=request.user.id)
             serializer = self.serializer_class(user, data=request.data, partial=True)  # `partial=True` allows updates for some fields
 
             # Validate and save data
             if serializer.is_valid():
-                serializer.save()
+                # The serializer saves through the sync ORM (and the photo storage)
+                await sync_to_async(serializer.save)()
+                await profile_cache.ainvalidate(user.id)
                 return ResponseHandler.success(
                     data=serializer.data,
                     message="User updated successfully.",
@@ -88,4 +133,343 @@ class ManageProfile(aBaseViewset):
             return ResponseHandler.failure(
                 message=str(error),
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class ProfilePhotoUpload(aBaseViewset):
+    """
+    Resumable profile photo upload, for clients on unreliable networks.
+
+    POST announces the file and its size. PATCH sends bytes starting at the
+    `Upload-Offset` header as the raw request body; they are streamed to a
+    temporary file. After a dropped connection, GET (or HEAD) returns the
+    offset to resume from. The chunk that completes the file stores it as the
+    profile photo and queues its thumbnails.
+    """
+    queryset = PhotoUpload.objects
+    serializer_class = StartPhotoUploadSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'head', 'post', 'patch']
+    lookup_value_regex = '[0-9a-f-]{36}'
+    # Progress changes with every chunk.
+    cache_policies = {'retrieve': CachePolicy(cache_control={'no_store': True})}
+
+    def get_upload(self, request, pk):
+        return PhotoUpload.objects.filter(pk=pk, user_id=request.user.id, expires_at__gt=timezone.now()).first()
+
+    @staticmethod
+    def progress(upload):
+        return {"id": upload.pk, "size": upload.size, "offset": upload.offset, "chunk_size": settings.PHOTO_UPLOAD_CHUNK_SIZE}
+
+    @swagger_auto_schema(
+        operation_description="Start a resumable profile photo upload.",
+        request_body=StartPhotoUploadSerializer,
+        responses={
+            status.HTTP_201_CREATED: PHOTO_UPLOAD_STARTED,
+            status.HTTP_400_BAD_REQUEST: HTTP_400_BAD_REQUEST
+        },
+        tags=['User Profile']
+    )
+    def create(self, request, *args, **kwargs):
+        """
+        Start an upload and return where to send its bytes from.
+        """
+        rData.request = request
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return ResponseHandler.failure(
+                message=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        upload = start_upload(request.user, serializer.validated_data['filename'], serializer.validated_data['size'])
+        return ResponseHandler.success(
+            data=self.progress(upload),
+            message=PHOTO_UPLOAD_STARTED,
+            status_code=status.HTTP_201_CREATED
+        )
+
+    @swagger_auto_schema(
+        operation_description="Return the offset to resume an upload from.",
+        responses={
+            status.HTTP_200_OK: PHOTO_UPLOAD_STATUS,
+            status.HTTP_404_NOT_FOUND: PHOTO_UPLOAD_NOT_FOUND
+        },
+        tags=['User Profile']
+    )
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        """
+        Return the upload progress.
+        """
+        upload = self.get_upload(request, pk)
+        if upload is None:
+            return ResponseHandler.failure(
+                message=PHOTO_UPLOAD_NOT_FOUND,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        response = ResponseHandler.success(data=self.progress(upload), message=PHOTO_UPLOAD_STATUS)
+        response['Upload-Offset'] = upload.offset
+        return response
+
+    @swagger_auto_schema(
+        operation_description="Send the next bytes of an upload as the raw body, from the `Upload-Offset` header.",
+        request_body=None,
+        responses={
+            status.HTTP_200_OK: PHOTO_CHUNK_RECEIVED,
+            status.HTTP_400_BAD_REQUEST: INVALID_PHOTO,
+            status.HTTP_404_NOT_FOUND: PHOTO_UPLOAD_NOT_FOUND,
+            status.HTTP_409_CONFLICT: UPLOAD_OFFSET_MISMATCH,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: PHOTO_CHUNK_TOO_LARGE
+        },
+        tags=['User Profile']
+    )
+    def partial_update(self, request, pk=None, *args, **kwargs):
+        """
+        Append a chunk; the last one stores the photo.
+        """
+        rData.request = request
+        upload = self.get_upload(request, pk)
+        if upload is None:
+            return ResponseHandler.failure(
+                message=PHOTO_UPLOAD_NOT_FOUND,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return ResponseHandler.failure(
+                message=UPLOAD_OFFSET_REQUIRED,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        if length > settings.PHOTO_UPLOAD_CHUNK_SIZE:
+            return ResponseHandler.failure(
+                message=PHOTO_CHUNK_TOO_LARGE,
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        try:
+            if offset != upload.offset or (length and not write_chunk(upload, request.stream, length)):
+                upload.refresh_from_db(fields=['offset'])
+                return ResponseHandler.failure(
+                    message=UPLOAD_OFFSET_MISMATCH,
+                    status_code=status.HTTP_409_CONFLICT,
+                    data={"offset": upload.offset}
+                )
+            if not upload.is_complete:
+                return ResponseHandler.success(data=self.progress(upload), message=PHOTO_CHUNK_RECEIVED)
+            user = finish_upload(upload)
+        except ValueError as error:
+            return ResponseHandler.failure(
+                message=str(error),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return ResponseHandler.success(
+            data={"photo": user.profile_photo.url, "photo_variants": variant_urls(user)},
+            message=PROFILE_PHOTO_UPDATED
+        )
+
+
+class ImportUsers(aAsyncBaseViewset):
+    """
+    Admin-only bulk user import from an uploaded CSV or JSONL file.
+    """
+    queryset = User.objects
+    serializer_class = ImportUsersSerializer
+    permission_classes = [IsAdminUserType]
+    parser_classes = [MultiPartParser]
+    http_method_names = ['post']
+
+    @swagger_auto_schema(
+        operation_description="Create users in bulk from a CSV or JSONL file (email, first_name, last_name, password).",
+        request_body=ImportUsersSerializer,
+        responses={
+            status.HTTP_200_OK: USERS_IMPORTED,
+            status.HTTP_400_BAD_REQUEST: HTTP_400_BAD_REQUEST,
+            status.HTTP_403_FORBIDDEN: HTTP_403_FORBIDDEN
+        },
+        tags=['User Management']
+    )
+    async def create(self, request, *args, **kwargs):
+        """
+        Import the uploaded file and return the import report.
+        """
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return ResponseHandler.failure(
+                message=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format') or detect_format(upload.name)
+        importer = UserImporter(send_mail=serializer.validated_data['send_mail'])
+        try:
+            # The upload is streamed from its temporary file, one chunk of rows at a time
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            report = await sync_to_async(importer.run)(stream, fmt)
+        except (UnicodeDecodeError, ValueError) as error:
+            return ResponseHandler.failure(
+                message=str(error),
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return ResponseHandler.success(
+            data=report.as_dict(),
+            message=USERS_IMPORTED,
+            status_code=status.HTTP_200_OK
+        )
+
+class DatabaseMetrics(aAsyncBaseViewset):
+    """
+    Admin-only view of the database connection metrics of this process.
+    """
+    queryset = User.objects
+    permission_classes = [IsAdminUserType]
+    http_method_names = ['get']
+    # Live process counters: never stored by clients or proxies.
+    cache_policies = {'list': CachePolicy(cache_control={'no_store': True})}
+
+    @swagger_auto_schema(
+        operation_description="Connections established (total and per second) and pool wait times, per database alias.",
+        responses={
+            status.HTTP_200_OK: DATABASE_METRICS_FETCHED,
+            status.HTTP_403_FORBIDDEN: HTTP_403_FORBIDDEN
+        },
+        tags=['User Management']
+    )
+    async def list(self, request, *args, **kwargs):
+        """
+        Return the connection metrics of every database alias.
+        """
+        return ResponseHandler.success(
+            data=database_metrics(),
+            message=DATABASE_METRICS_FETCHED,
+            status_code=status.HTTP_200_OK
+        )
+
+class UserDirectory(aBaseViewset):
+    """
+    Admin-only user directory, newest users first.
+
+    Keyset-paginated over (created_at, id) and filterable on is_verified,
+    is_active, user_type and device_type; every page is one indexed query
+    over the directory columns only.
+    """
+    queryset = User.objects.only(*USER_DIRECTORY_FIELDS)
+    serializer_class = UserDirectorySerializer
+    permission_classes = [IsAdminUserType]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = UserDirectoryFilter
+    pagination_class = KeysetPagination
+    http_method_names = ['get']
+
+    @swagger_auto_schema(
+        operation_description="Browse users, newest first. Follow `next`/`previous` to page; filter with "
+                              "is_verified, is_active, user_type and device_type.",
+        responses={
+            status.HTTP_200_OK: DETAILS_FETCH_SUCCESSFULLY,
+            status.HTTP_403_FORBIDDEN: HTTP_403_FORBIDDEN,
+            status.HTTP_404_NOT_FOUND: INVALID_CURSOR
+        },
+        tags=['User Management']
+    )
+    def list(self, request, *args, **kwargs):
+        """
+        Return one page of users.
+        """
+        rData.request = request
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+class UserSearch(aBaseViewset):
+    """
+    Admin-only type-ahead search of users by email, first name, last name or full name prefix.
+
+    Served from the `UserSearchTerm` index (see `apps.users.search`): a bounded
+    range scan and a primary key lookup, whatever the number of users.
+    """
+    queryset = User.objects
+    serializer_class = UserSearchSerializer
+    permission_classes = [IsAdminUserType]
+    http_method_names = ['get']
+
+    @swagger_auto_schema(
+        operation_description="Return the first `limit` users whose email or name starts with `q` "
+                              "(case and accent insensitive).",
+        query_serializer=UserSearchSerializer,
+        responses={
+            status.HTTP_200_OK: DETAILS_FETCH_SUCCESSFULLY,
+            status.HTTP_400_BAD_REQUEST: HTTP_400_BAD_REQUEST,
+            status.HTTP_403_FORBIDDEN: HTTP_403_FORBIDDEN
+        },
+        tags=['User Management']
+    )
+    def list(self, request, *args, **kwargs):
+        """
+        Return the matching users.
+        """
+        serializer = self.serializer_class(data=request.query_params)
+        if not serializer.is_valid():
+            return ResponseHandler.failure(
+                message=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        users = search_users(
+            serializer.validated_data['q'], serializer.validated_data['limit'], fields=USER_DIRECTORY_FIELDS
+        )
+        return ResponseHandler.success(
+            data=UserDirectorySerializer(users, many=True).data,
+            message=DETAILS_FETCH_SUCCESSFULLY,
+            status_code=status.HTTP_200_OK
+        )
+
+
+class ExportUsers(aBaseViewset):
+    """
+    Admin-only bulk user export, streamed as CSV or JSONL.
+
+    Takes the user directory filters. Rows are encoded (and optionally gzipped)
+    while they are read, so memory stays flat and the first bytes leave before
+    the last row is fetched.
+    """
+    queryset = User.objects.all()
+    serializer_class = ExportUsersSerializer
+    permission_classes = [IsAdminUserType]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = UserDirectoryFilter
+    http_method_names = ['get']
+    # Personal data: never stored by clients or proxies.
+    cache_policies = {'list': CachePolicy(cache_control={'private': True, 'no_store': True})}
+
+    @swagger_auto_schema(
+        operation_description="Download users as CSV or JSONL (`file_format`), gzip-encoded with `gzip=true`; "
+                              "filter with is_verified, is_active, user_type and device_type.",
+        query_serializer=ExportUsersSerializer,
+        responses={
+            status.HTTP_200_OK: USERS_EXPORTED,
+            status.HTTP_400_BAD_REQUEST: HTTP_400_BAD_REQUEST,
+            status.HTTP_403_FORBIDDEN: HTTP_403_FORBIDDEN
+        },
+        tags=['User Management']
+    )
+    def list(self, request, *args, **kwargs):
+        """
+        Stream the users matching the filters.
+        """
+        serializer = self.serializer_class(data=request.query_params)
+        if not serializer.is_valid():
+            return ResponseHandler.failure(
+                message=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        fmt = serializer.validated_data['file_format']
+        compress = serializer.validated_data['gzip']
+        queryset = self.filter_queryset(self.get_queryset())
+        exporter = UserExporter()
+        # Each server gets the iterator type it streams without buffering.
+        if isinstance(request._request, ASGIRequest):
+            blocks = exporter.astream(queryset, fmt, compress=compress)
+        else:
+            blocks = exporter.stream(queryset, fmt, compress=compress)
+        response = StreamingHttpResponse(blocks, content_type=EXPORT_CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="users.{fmt}"'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
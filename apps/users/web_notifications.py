@@ -1,10 +1,105 @@
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-import json
+from django.contrib.auth.models import Group
 
-def send_notification_to_web(notification_data):
+# Every connection is also in this group, for the rare message meant for everyone.
+BROADCAST_GROUP = 'notifications'
+
+
+def user_group(user_id):
+    return f"user.{user_id}"
+
+
+def role_group(user_type):
+    return f"user_type.{user_type}"
+
+
+def auth_group(group_id):
+    return f"group.{group_id}"
+
+
+async def agroups_for(user):
+    """
+    Returns the channel layer groups a connection of `user` is placed in:
+    the user, its user type, each of its auth groups and the broadcast group.
+    """
+    group_ids = [pk async for pk in Group.objects.filter(user=user).values_list('pk', flat=True)]
+    return [user_group(user.pk), role_group(user.user_type), *map(auth_group, group_ids), BROADCAST_GROUP]
+
+
+async def anotify_groups(groups, notification_data):
+    """
+    Sends a notification to the connections in any of `groups`.
+
+    Each group holds only its recipients' connections, so the cost follows the
+    recipients, not the number of connected clients. Layers with
+    `group_send_many` (core.channel_layers) send all groups at once, and a
+    connection in several of them gets the notification once.
+    """
     channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)('notifications', {
-        'type': 'send_notification',
-        'data': notification_data,
-    })
+    if channel_layer is None:
+        return
+    message = {'type': 'send_notification', 'data': notification_data}
+    group_send_many = getattr(channel_layer, 'group_send_many', None)
+    if group_send_many is not None:
+        await group_send_many(groups, message)
+    else:
+        for group in dict.fromkeys(groups):
+            await channel_layer.group_send(group, message)
+
+
+async def anotify_user(user_id, notification_data):
+    await anotify_groups([user_group(user_id)], notification_data)
+
+
+async def anotify_users(user_ids, notification_data):
+    await anotify_groups([user_group(user_id) for user_id in user_ids], notification_data)
+
+
+async def anotify_role(user_type, notification_data):
+    """
+    Notifies the connected users of a user type (`User.USER_TYPE_CHOICES`).
+    """
+    await anotify_groups([role_group(user_type)], notification_data)
+
+
+async def anotify_group(group_id, notification_data):
+    """
+    Notifies the connected members of an auth group.
+    """
+    await anotify_groups([auth_group(group_id)], notification_data)
+
+
+async def asend_notification_to_web(notification_data):
+    """
+    Broadcasts to every connection; prefer the targeted `anotify_*` functions.
+    """
+    await anotify_groups([BROADCAST_GROUP], notification_data)
+
+
+# Sync variants, for sync callers only (sync views, signals, commands): from
+# async code (e.g. an async viewset) `async_to_sync` raises, await the
+# `anotify_*` functions above instead.
+
+def notify_groups(groups, notification_data):
+    async_to_sync(anotify_groups)(groups, notification_data)
+
+
+def notify_user(user_id, notification_data):
+    async_to_sync(anotify_user)(user_id, notification_data)
+
+
+def notify_users(user_ids, notification_data):
+    async_to_sync(anotify_users)(user_ids, notification_data)
+
+
+def notify_role(user_type, notification_data):
+    async_to_sync(anotify_role)(user_type, notification_data)
+
+
+def notify_group(group_id, notification_data):
+    async_to_sync(anotify_group)(group_id, notification_data)
+
+
+def send_notification_to_web(notification_data):
+    async_to_sync(asend_notification_to_web)(notification_data)
@@ -1,14 +1,17 @@
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import configurations.routing  # Import your routing configuration
 
 # Set the settings module explicitly
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'configurations.settings')
+# Sets up Django: the imports below load models.
+django_asgi_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+import configurations.routing  # noqa: E402  Import your routing configuration
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_application,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             configurations.routing.websocket_urlpatterns
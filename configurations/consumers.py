@@ -1,18 +1,61 @@
 # consumers.py
 
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
+from rest_framework.exceptions import AuthenticationFailed
+
+from apps.users.web_notifications import agroups_for
+from core.baseviewset.authentication import cTokenAuthentication
+
+# Close code for a refused handshake (4000-4999 are left to applications).
+UNAUTHORIZED_CLOSE_CODE = 4401
+
+
+def token_from_scope(scope):
+    """
+    Returns the API token of a websocket request: the `bearer` query parameter
+    (browsers cannot set headers on websockets) or an `Authorization: Bearer` header.
+    """
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    for name, values in query.items():
+        if name.lower() == 'bearer' and values:
+            return values[0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword.lower() == cTokenAuthentication.keyword.lower() and key:
+                return key.strip()
+    return None
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Notifications of an authenticated user.
+
+    The connection joins the groups notifications are routed by (see
+    `apps.users.web_notifications`): its user, user type and auth groups. The
+    groups are read at connect time; a user moved to another type or group
+    gets the new routing on reconnect.
+    """
+
     async def connect(self):
-        # Add the user to the WebSocket group
-        await self.channel_layer.group_add('notifications', self.channel_name)
+        key = token_from_scope(self.scope)
+        try:
+            if not key:
+                raise AuthenticationFailed("No credentials provided.")
+            user, _ = await cTokenAuthentication().aauthenticate_credentials(key)
+        except AuthenticationFailed:
+            await self.close(code=UNAUTHORIZED_CLOSE_CODE)
+            return
+        self.scope['user'] = user
+        # Left again by `websocket_disconnect`.
+        self.groups = await agroups_for(user)
+        for group in self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
         await self.accept()
 
-    async def disconnect(self, close_code):
-        # Remove the user from the WebSocket group
-        await self.channel_layer.group_discard('notifications', self.channel_name)
-
     async def send_notification(self, event):
         # Send the notification data to the connected user
         notification_data = event['data']
@@ -9,9 +9,11 @@ https://docs.djangoproject.com/en/3.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
+from datetime import timedelta
 from pathlib import Path
 import environ
 import os
+import tempfile
 from pathlib import Path
 
 # from firebase_admin import initialize_app
@@ -43,9 +45,10 @@ AUTH_USER_MODEL = 'users.User'
 # Application definition
 
 INSTALLED_APPS = [
-    # 'channels',
+    'channels',
     'drf_yasg',
     'rest_framework',
+    'django_filters',
     "corsheaders",
     'silk',
     'django.contrib.admin',
@@ -55,10 +58,10 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'apps.users',
-    'rest_framework.authtoken',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.request_context.RequestContextMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'silk.middleware.SilkyMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -96,22 +99,110 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'configurations.wsgi.application'
 # Set the ASGI application for channels
-ASGI_APPLICATION = "configurations.routing.application"
+ASGI_APPLICATION = "configurations.asgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': env('DATABASE_NAME'),
-        'USER': env('DATABASE_USER'),
-        'PASSWORD': env('DATABASE_PASSWORD'),
-        'HOST': env('DATABASE_HOST'),
-        'PORT': env('DATABASE_PORT'),
+# DATABASE_ENGINE selects the backend: mysql, postgresql or sqlite (local load tests).
+# DATABASE_POOL=True borrows MySQL/PostgreSQL connections from an in-process pool
+# (core.db.pool) for the ASGI deployment; connections then go back to the pool
+# at the end of each request instead of being kept for CONN_MAX_AGE.
+DATABASE_ENGINES = {
+    'mysql': 'django.db.backends.mysql',
+    'postgresql': 'django.db.backends.postgresql',
+    'sqlite': 'django.db.backends.sqlite3',
+}
+POOLED_DATABASE_ENGINES = {
+    'mysql': 'core.db.backends.mysql',
+    'postgresql': 'core.db.backends.postgresql',
+}
+DATABASE_ENGINE = env.str('DATABASE_ENGINE', default='mysql')
+DATABASE_POOL = env.bool('DATABASE_POOL', default=False) and DATABASE_ENGINE in POOLED_DATABASE_ENGINES
+
+if DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': DATABASE_ENGINES['sqlite'],
+            'NAME': env.str('DATABASE_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': (POOLED_DATABASE_ENGINES if DATABASE_POOL else DATABASE_ENGINES)[DATABASE_ENGINE],
+            'NAME': env('DATABASE_NAME'),
+            'USER': env('DATABASE_USER'),
+            'PASSWORD': env('DATABASE_PASSWORD'),
+            'HOST': env('DATABASE_HOST'),
+            'PORT': env('DATABASE_PORT'),
+        }
+    }
+
+# Persistent connections (seconds, 0 closes after each request), checked before reuse.
+DATABASES['default']['CONN_MAX_AGE'] = 0 if DATABASE_POOL else env.int('DATABASE_CONN_MAX_AGE', default=60)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True)
+DATABASES['default']['POOL'] = {
+    'MIN_SIZE': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+    'MAX_SIZE': env.int('DATABASE_POOL_MAX_SIZE', default=20),
+    'MAX_IDLE': env.int('DATABASE_POOL_MAX_IDLE', default=300),  # seconds
+    'TIMEOUT': env.int('DATABASE_POOL_TIMEOUT', default=10),  # seconds
 }
 
+# Read replicas: DATABASE_REPLICA_HOSTS lists replica hosts (SQLite: database files),
+# added as the aliases replica1, replica2, ... with the primary's other settings.
+# Reads of the models below go to a replica unless the request or user just wrote
+# (core.db.router.ReplicaRouter).
+DATABASE_REPLICAS = []
+for index, replica in enumerate(env.list('DATABASE_REPLICA_HOSTS', default=[]), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME' if DATABASE_ENGINE == 'sqlite' else 'HOST': replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+DATABASE_REPLICA_MODELS = ['users.user', 'users.authtoken', 'users.usersocialprofile']
+DATABASE_REPLICA_STRATEGY = env.str('DATABASE_REPLICA_STRATEGY', default='round_robin')  # or least_lag
+DATABASE_REPLICA_MAX_LAG = env.int('DATABASE_REPLICA_MAX_LAG', default=5)  # seconds
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = env.int('DATABASE_REPLICA_LAG_CHECK_INTERVAL', default=5)  # seconds
+DATABASE_REPLICA_STICKY_SECONDS = env.int('DATABASE_REPLICA_STICKY_SECONDS', default=10)
+DATABASE_REPLICA_STICKY_CACHE_ALIAS = 'default'
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Point CACHE_URL at a shared backend (e.g. redis://) in production so the
+# caches below are shared between workers.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Token authentication cache: an in-process LRU in front of the shared cache.
+# Invalidations (logout, deactivation, password reset) reach the shared cache
+# and the current process only: other workers keep accepting a revoked token
+# for up to TOKEN_CACHE_LOCAL_TTL, so keep it short.
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_LOCAL_SIZE = env.int('TOKEN_CACHE_LOCAL_SIZE', default=10000)
+TOKEN_CACHE_LOCAL_TTL = env.int('TOKEN_CACHE_LOCAL_TTL', default=1)  # seconds
+TOKEN_CACHE_TTL = env.int('TOKEN_CACHE_TTL', default=300)  # seconds
+
+# Serialized profiles served by ManageProfile.list (apps.users.profile_cache).
+PROFILE_CACHE_ALIAS = 'default'
+PROFILE_CACHE_TTL = env.int('PROFILE_CACHE_TTL', default=300)  # seconds
+
+# Per-user permission sets used by AuthPerm (core.baseviewset.permission_cache).
+PERMISSION_CACHE_ALIAS = 'default'
+PERMISSION_CACHE_TTL = env.int('PERMISSION_CACHE_TTL', default=300)  # seconds
+
+# Rows fetched per database round trip by user exports (apps.users.exporter).
+USER_EXPORT_CHUNK_SIZE = env.int('USER_EXPORT_CHUNK_SIZE', default=2000)
+
+# Prefix search over user emails and names (apps.users.search).
+USER_SEARCH_DEFAULT_LIMIT = env.int('USER_SEARCH_DEFAULT_LIMIT', default=10)
+USER_SEARCH_MAX_LIMIT = env.int('USER_SEARCH_MAX_LIMIT', default=50)
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_PORT =  os.getenv('EMAIL_PORT')
@@ -120,6 +211,25 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL =  os.getenv('MAIL_FROM_ADDRESS')
 
+# Mail templates compiled once at startup (see core.mail_handler.renderer)
+MAIL_TEMPLATES = [
+    'email/welcome_mail.html',
+    'email/forgot_password.html',
+    'email/welcome_mail_with_password.html',
+    'email/welcome_imported.html',
+]
+
+# Pooled SMTP connections used by SandMailHandler
+MAIL_CONNECTION_POOL_SIZE = env.int('MAIL_CONNECTION_POOL_SIZE', default=4)
+MAIL_CONNECTION_MAX_AGE = env.int('MAIL_CONNECTION_MAX_AGE', default=300)  # seconds
+
+# Mail outbox worker (python manage.py run_mail_worker)
+MAIL_WORKER_CONCURRENCY = env.int('MAIL_WORKER_CONCURRENCY', default=4)
+MAIL_WORKER_BATCH_SIZE = env.int('MAIL_WORKER_BATCH_SIZE', default=50)
+MAIL_WORKER_MAX_ATTEMPTS = env.int('MAIL_WORKER_MAX_ATTEMPTS', default=5)
+# Sent and failed outbox rows are deleted by purge_expired_tokens after this long
+MAIL_OUTBOX_RETENTION = timedelta(days=env.int('MAIL_OUTBOX_RETENTION_DAYS', default=7))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -139,6 +249,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing and verification run in a process pool (core.hashing).
+# 0 workers hashes in a thread of the calling process instead.
+PASSWORD_HASHING_EXECUTOR = 'core.hashing.executor.ProcessPoolHashingExecutor'
+PASSWORD_HASHING_WORKERS = env.int('PASSWORD_HASHING_WORKERS', default=2)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -162,6 +277,19 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') # Directory where uploaded media is saved.
 MEDIA_URL = '/media/' # Public URL at the browser
+# Media files are named by content hash and deduplicated (core.storage); `gc_media` removes unreferenced ones.
+# collectstatic writes content-hashed static names plus gzip copies of compressible files.
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.GzipManifestStaticFilesStorage'},
+}
+MEDIA_GC_GRACE_HOURS = env.int('MEDIA_GC_GRACE_HOURS', default=24)
+# Files served by the app (core.storage.views). In production, put nginx in front: it serves STATIC_ROOT
+# itself (gzip_static on), and with MEDIA_OFFLOAD the app only checks media requests while nginx sends the bytes.
+SERVE_MEDIA = env.bool('SERVE_MEDIA', default=DEBUG)
+SERVE_STATIC = env.bool('SERVE_STATIC', default=False)
+MEDIA_OFFLOAD = env.str('MEDIA_OFFLOAD', default='')  # '', 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd)
+MEDIA_ACCEL_REDIRECT_PREFIX = env.str('MEDIA_ACCEL_REDIRECT_PREFIX', default='/protected-media/')  # internal location
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -171,11 +299,42 @@ TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")  # ROOT dir for templates
 
 REST_FRAMEWORK = { 'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema',
   'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Reverse proxies in front of the app that append to X-Forwarded-For; unset,
+    # per-IP throttles key on the socket address and ignore the header
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=None),
+    # Sliding-window limits (core.throttling), keyed "<view throttle_scope>_<ip|email|token>"
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+        'forgot_password_ip': '10/min',
+        'forgot_password_email': '3/min',
+        'confirm_password_ip': '10/min',
+        'confirm_password_email': '5/min',
+        'reset_password_token': '5/min',
+    },
  }
+# Cache holding the throttle counters; must be shared by every worker (e.g. Redis) in production.
+THROTTLE_CACHE_ALIAS = 'default'
 
 PASSWORD_RESET_TIMEOUT=604800 # 7 days
+AUTH_TOKEN_LIFETIME = timedelta(days=env.int('AUTH_TOKEN_LIFETIME_DAYS', default=7))
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10*1024*1024
+# Uploaded files above this size are streamed to a temporary file instead of memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=256 * 1024)
+
+# Profile photos (apps.users.photos)
+PROFILE_PHOTO_MAX_SIZE = env.int('PROFILE_PHOTO_MAX_SIZE', default=10 * 1024 * 1024)
+# Partial resumable uploads; must be shared by every web worker that can receive a chunk.
+PHOTO_UPLOAD_DIR = env.str('PHOTO_UPLOAD_DIR', default=os.path.join(tempfile.gettempdir(), 'photo-uploads'))
+PHOTO_UPLOAD_CHUNK_SIZE = env.int('PHOTO_UPLOAD_CHUNK_SIZE', default=1024 * 1024)  # largest chunk accepted
+PHOTO_UPLOAD_LIFETIME = timedelta(hours=env.int('PHOTO_UPLOAD_LIFETIME_HOURS', default=24))
+# Square variants rendered by the photo worker (python manage.py run_photo_worker), side in pixels.
+PROFILE_PHOTO_VARIANTS = {'thumb': 64, 'small': 128, 'medium': 256}
+PROFILE_PHOTO_VARIANT_FORMAT = 'WEBP'
+PROFILE_PHOTO_VARIANT_QUALITY = env.int('PROFILE_PHOTO_VARIANT_QUALITY', default=80)
+PHOTO_WORKER_BATCH_SIZE = env.int('PHOTO_WORKER_BATCH_SIZE', default=10)
+PHOTO_WORKER_MAX_ATTEMPTS = env.int('PHOTO_WORKER_MAX_ATTEMPTS', default=3)
 
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -187,11 +346,18 @@ SWAGGER_SETTINGS = {
     },
     'USE_SESSION_AUTH': False,
 }
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [('127.0.0.1', 6380)],
-#         },
-#     },
-# }
\ No newline at end of file
+# The ASGI worker processes of one host exchange group messages over Unix datagram sockets
+# (core.channel_layers), no broker needed. For several hosts, use channels_redis instead:
+# 'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {"hosts": [('127.0.0.1', 6380)]}
+# The socket directory must be private to the server's user; by default it is
+# in the user's runtime directory (core.channel_layers.unix_socket.default_path).
+CHANNEL_LAYER_SOCKET_DIR = env.str('CHANNEL_LAYER_SOCKET_DIR', default=None)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'core.channel_layers.UnixSocketChannelLayer',
+        'CONFIG': {
+            'path': CHANNEL_LAYER_SOCKET_DIR,
+            'capacity': env.int('CHANNEL_LAYER_CAPACITY', default=100),
+        },
+    },
+}
\ No newline at end of file
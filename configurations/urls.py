@@ -13,13 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from apps.users.urls import router as AppRouter
 from configurations.swagger import schema_view
+from core.storage.views import serve_media, serve_static
 
 urlpatterns = [
     path('swagger/', schema_view.with_ui('swagger',
@@ -27,5 +29,9 @@ urlpatterns = [
     path('api/', include(AppRouter.urls)),
     path('silk/', include('silk.urls', namespace='silk')),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+if settings.SERVE_MEDIA:
+    urlpatterns += [re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', serve_media,
+                            {'document_root': settings.MEDIA_ROOT})]
+if settings.SERVE_STATIC:
+    urlpatterns += [re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$', serve_static,
+                            {'document_root': settings.STATIC_ROOT})]
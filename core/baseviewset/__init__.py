@@ -1 +1 @@
-from .request import aRequest as rData
\ No newline at end of file
+from .request import aRequest, rData
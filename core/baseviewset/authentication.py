@@ -1,9 +1,17 @@
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.authtoken.models import Token
+import time
 
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
 from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
 from rest_framework.exceptions import AuthenticationFailed
 
+from apps.users.models import AuthToken
+from core.baseviewset.token_cache import token_cache
+from core.db.router import apin_if_recent_write, pin_if_recent_write, replicas_enabled
+from utils.messages import EXPIRED_TOKEN
+
 
 class cTokenAuthentication(TokenAuthentication):
     """
@@ -12,9 +20,15 @@ class cTokenAuthentication(TokenAuthentication):
     This class overrides the `authenticate_credentials` method to:
     - Validate if the token exists.
     - Check if the user is active.
-    - Handle token expiration and renewal.
+    - Reject expired tokens (expiry is checked in memory against `expires_at`).
+
+    Token lookups go through `token_cache`, so a warm token costs no queries and
+    a cold one costs a single `select_related` query. With read replicas, a token
+    missing on the replica is looked up again on the primary, and a user who
+    wrote recently has the rest of the request pinned to the primary.
     """
     keyword = 'Bearer'  # Specifies the authentication keyword used in the Authorization header.
+    model = AuthToken
 
     def authenticate_credentials(self, key):
         """
@@ -27,49 +41,108 @@ class cTokenAuthentication(TokenAuthentication):
             tuple: A tuple containing the authenticated user and the token object.
 
         Raises:
-            AuthenticationFailed: If the token is invalid, or the user is not active.
+            AuthenticationFailed: If the token is invalid or expired, or the user is not active.
+        """
+        model = self.get_model()
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            loaded_at = time.time()
+            queryset = model.objects.select_related('user')
+            try:
+                # Retrieve the token object and its user in a single query.
+                token = queryset.get(key=key)
+            except model.DoesNotExist:
+                if not replicas_enabled():
+                    # If the token doesn't exist, raise an authentication error.
+                    raise AuthenticationFailed("Invalid Token")
+                try:
+                    # A token issued moments ago may not have reached the replica yet.
+                    token = queryset.using(DEFAULT_DB_ALIAS).get(key=key)
+                except model.DoesNotExist:
+                    raise AuthenticationFailed("Invalid Token")
+            snapshot = token_cache.snapshot(token)
+            token_cache.set(key, snapshot, loaded_at)
+
+        user, token = self.check_snapshot(snapshot, model)
+        pin_if_recent_write(user.pk)
+        return user, token
+
+    async def aauthenticate(self, request):
         """
+        Async counterpart of `authenticate`, used by the async base viewsets.
+        """
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+
         try:
-            # Retrieve the token object using the provided key.
-            token = Token.objects.get(key=key)
-        except Token.DoesNotExist:
-            # If the token doesn't exist, raise an authentication error.
-            raise AuthenticationFailed("Invalid Token")
+            token = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+        return await self.aauthenticate_credentials(token)
+
+    async def aauthenticate_credentials(self, key):
+        """
+        Async counterpart of `authenticate_credentials` using the async cache and ORM APIs.
+        """
+        model = self.get_model()
+        snapshot = await token_cache.aget(key)
+        if snapshot is None:
+            loaded_at = time.time()
+            queryset = model.objects.select_related('user')
+            try:
+                token = await queryset.aget(key=key)
+            except model.DoesNotExist:
+                if not replicas_enabled():
+                    raise AuthenticationFailed("Invalid Token")
+                try:
+                    token = await queryset.using(DEFAULT_DB_ALIAS).aget(key=key)
+                except model.DoesNotExist:
+                    raise AuthenticationFailed("Invalid Token")
+            snapshot = token_cache.snapshot(token)
+            await token_cache.aset(key, snapshot, loaded_at)
+
+        user, token = self.check_snapshot(snapshot, model)
+        await apin_if_recent_write(user.pk)
+        return user, token
+
+    @staticmethod
+    def check_snapshot(snapshot, model):
+        """
+        Rebuild the user and token from a cached snapshot and validate them.
+        """
+        user, token = token_cache.restore(snapshot, model)
 
         # Check if the user associated with the token is active.
-        if not token.user.is_active:
+        if not user.is_active:
             raise AuthenticationFailed("User is not active")
 
-        # Check if the token has expired and handle renewal if necessary.
-        is_expired, token = token_expire_handler(token)
+        # Expired tokens are left in place for `purge_expired_tokens`.
+        if is_token_expired(token):
+            raise AuthenticationFailed(EXPIRED_TOKEN)
 
         # Return the authenticated user and token.
-        return token.user, token
+        return user, token
 
 
 def is_token_expired(token):
     """
-    Check if the token is expired based on the user's last login time.
+    Check if the token is expired based on its `expires_at` column.
     
     Args:
-        token (Token): The token object to check for expiration.
+        token (AuthToken): The token object to check for expiration.
 
     Returns:
         bool: True if the token is expired, False otherwise.
     """
-    # Retrieve the user's last login time.
-    user_last_login = Token.objects.get(key=token).user.last_login
-    if user_last_login:
-        # Compare the last login time to the current time.
-        today = timezone.now()
-        # If the user hasn't logged in for 7 or more days, consider the token expired.
-        if (today - user_last_login).days >= 7:
-            return True
-        else:
-            return False
-    else:
-        # If there's no last login time, consider the token expired.
-        return False
+    return token.is_expired
 
 
 def token_expire_handler(token):
@@ -77,7 +150,7 @@ def token_expire_handler(token):
     Handle the expiration of the token, renewing it if necessary.
 
     Args:
-        token (Token): The token object to check and potentially renew.
+        token (AuthToken): The token object to check and potentially renew.
 
     Returns:
         tuple: A tuple with a boolean indicating expiration and the (possibly renewed) token.
@@ -86,7 +159,56 @@ def token_expire_handler(token):
     is_expired = is_token_expired(token)
     if is_expired:
         # If expired, delete the old token and create a new one.
+        token_cache.invalidate(token.key)
         token.delete()
-        token = Token.objects.create(user=token.user)
+        token = AuthToken.objects.create(user=token.user)
+    else:
+        # Otherwise extend its lifetime from now.
+        token.expires_at = AuthToken.default_expiry()
+        token.save(update_fields=['expires_at'])
+        token_cache.invalidate(token.key)
     # Return the expiration status and the updated token.
     return is_expired, token
+
+
+async def aissue_token(user):
+    """
+    Return a valid token for the user, writing it with a single statement.
+
+    The user's current token must already be loaded (e.g. with
+    `select_related('auth_token')`) so no extra lookup is needed:
+    - a live token has its lifetime extended (UPDATE),
+    - an expired token is rotated to a new key in place (UPDATE),
+    - a missing token is created (INSERT).
+
+    Args:
+        user (User): The user logging in, with `auth_token` preloaded.
+
+    Returns:
+        AuthToken: The token to hand to the client.
+    """
+    token = getattr(user, 'auth_token', None)
+    while True:
+        if token is None:
+            try:
+                # `create` forces a plain INSERT (no UPDATE-then-INSERT probe on the key).
+                return await AuthToken.objects.acreate(user=user)
+            except IntegrityError:
+                # A concurrent login created it first; extend that one instead.
+                token = await AuthToken.objects.aget(user=user)
+
+        old_key = token.key
+        updates = {'expires_at': AuthToken.default_expiry()}
+        if is_token_expired(token):
+            # Expired tokens are rotated so a leaked key stays dead.
+            updates.update(key=AuthToken.generate_key(), created=timezone.now())
+        if await AuthToken.objects.filter(pk=old_key).aupdate(**updates):
+            break
+        # The loaded key is gone: a concurrent login rotated it or a logout
+        # deleted it. Start again from the user's current token, if any.
+        token = await AuthToken.objects.filter(user=user).afirst()
+
+    for field, value in updates.items():
+        setattr(token, field, value)
+    token_cache.invalidate(old_key)
+    return token
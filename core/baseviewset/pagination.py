@@ -0,0 +1,121 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Func, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+
+from core.response_handler.handler import ResponseHandler
+from utils.messages import DETAILS_FETCH_SUCCESSFULLY, INVALID_CURSOR
+
+
+class RowValue(Func):
+    """
+    An SQL row value, `(a, b)`, compared column by column: `(a, b) < (x, y)`
+    is `a < x OR (a = x AND b < y)` as a single index range condition.
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ', '
+    output_field = Field()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a (timestamp, primary key) pair, newest first.
+
+    Each page is a single `WHERE (ts, pk) < cursor ORDER BY ts DESC, pk DESC
+    LIMIT n` query, so it costs the same at page 1 and at page 10,000: there is
+    no COUNT(*) and no OFFSET. The cursor is an opaque token holding the
+    position of the last (or, going back, first) row of the page. The pair must
+    be backed by a composite index, leading with any equality filters.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    timestamp_field = 'created_at'
+    pk_field = 'id'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row, reverse):
+        position = [getattr(row, self.timestamp_field).isoformat(), str(getattr(row, self.pk_field)), reverse]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            timestamp, pk, reverse = json.loads(base64.urlsafe_b64decode(token.encode()))
+            pk = model._meta.get_field(self.pk_field).to_python(pk)
+            return datetime.fromisoformat(timestamp), pk, bool(reverse)
+        except (TypeError, ValueError, AttributeError, ValidationError):
+            raise NotFound(INVALID_CURSOR)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model)
+        ts, pk = self.timestamp_field, self.pk_field
+
+        reverse = False
+        if cursor is not None:
+            timestamp, key, reverse = cursor
+            fields = queryset.model._meta
+            position = RowValue(
+                Value(timestamp, output_field=fields.get_field(ts)), Value(key, output_field=fields.get_field(pk))
+            )
+            # Going back: the rows just after the cursor, oldest first.
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.alias(keyset_position=RowValue(ts, pk)).filter(**{f'keyset_position__{lookup}': position})
+        ordering = (ts, pk) if reverse else (f'-{ts}', f'-{pk}')
+
+        # One extra row tells whether there is a page after this one.
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(rows[-1], False)
+            if cursor is not None and (has_more or not reverse):
+                self.previous_cursor = self.encode_cursor(rows[0], True)
+        return rows
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return ResponseHandler.success(
+            data={
+                "next": self.get_link(self.next_cursor),
+                "previous": self.get_link(self.previous_cursor),
+                "results": data,
+            },
+            message=DETAILS_FETCH_SUCCESSFULLY,
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class PermissionCache:
+    """
+    Per-user permission sets, as computed by `ModelBackend`, in the Django cache.
+
+    Users rebuilt from a token snapshot carry no permission cache, so every
+    permission check would cost two queries. `prime` loads the cached set into
+    the user's `_perm_cache` instead. Entries are tagged with a generation
+    number: `invalidate_all` bumps it when group permissions change, so every
+    entry goes stale at once without knowing the keys.
+
+    As in `core.baseviewset.token_cache`, `invalidate_user` leaves a
+    timestamped tombstone, and a set loaded before it is not cached, so a
+    request racing with a group change cannot write the old permissions back.
+    """
+    generation_key = "auth:perms-generation"
+    # Longer than any permission load between a cache miss and the write.
+    tombstone_ttl = 30
+
+    def __init__(self, ttl, alias='default'):
+        self.ttl = ttl
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _key(user_id):
+        return f"auth:perms:{user_id}"
+
+    def prime(self, user):
+        """
+        Set the user's permissions from the cache, loading and caching them on a miss.
+        """
+        if not user.is_active or hasattr(user, '_perm_cache'):
+            return
+        key = self._key(user.pk)
+        values = self.cache.get_many([self.generation_key, key])
+        generation = values.get(self.generation_key, 0)
+        entry = values.get(key)
+        if isinstance(entry, tuple) and entry[0] == generation:
+            user._perm_cache = entry[1]
+            return
+        loaded_at = time.time()
+        entry = (generation, user.get_all_permissions())
+        if self.cache.add(key, entry, self.ttl):
+            return
+        if not self._invalidated(self.cache.get(key), loaded_at):
+            self.cache.set(key, entry, self.ttl)
+
+    @staticmethod
+    def _invalidated(entry, loaded_at):
+        return isinstance(entry, dict) and entry.get("invalidated_at", 0) >= loaded_at
+
+    def invalidate_user(self, user_id):
+        self.cache.set(self._key(user_id), {"invalidated_at": time.time()}, self.tombstone_ttl)
+
+    def invalidate_all(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.set(self.generation_key, 1, None)
+
+
+permission_cache = PermissionCache(ttl=settings.PERMISSION_CACHE_TTL, alias=settings.PERMISSION_CACHE_ALIAS)
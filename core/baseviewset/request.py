@@ -1,7 +1,38 @@
+from contextvars import ContextVar
+
 from django.conf import settings
 
+_current_request = ContextVar('current_request', default=None)
+
+
 class aRequest:
-    request: dict = {}
+    """
+    Request-local storage for the request being handled.
+
+    `request` is backed by a `ContextVar`, so every thread and every asyncio
+    task sees its own request. It is set for the whole request by
+    `RequestContextMiddleware` and by the base viewsets (with the DRF request).
+    """
+
+    @property
+    def request(self):
+        return _current_request.get()
+
+    @request.setter
+    def request(self, value):
+        _current_request.set(value)
+
+    def set_request(self, request):
+        """
+        Sets the current request and returns a token for `reset_request`.
+        """
+        return _current_request.set(request)
+
+    def reset_request(self, token):
+        """
+        Restores the request that was current before `set_request`.
+        """
+        _current_request.reset(token)
 
     def get_image_path_insert(self, url: str) -> str:
         """
@@ -20,3 +51,6 @@ class aRequest:
             else:
                 return settings.BASE_URL + url
         return ""
+
+
+rData = aRequest()
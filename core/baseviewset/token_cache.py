@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# User columns kept in the cached snapshot. Anything else is deferred and
+# loaded on first access, exactly like a `.only()` queryset.
+USER_SNAPSHOT_FIELDS = (
+    'id', 'email', 'is_active', 'is_staff', 'is_superuser', 'last_login', 'user_type',
+)
+# Left in the shared tier by an invalidation, with its time: (TOMBSTONE, timestamp).
+TOMBSTONE = 'invalidated'
+
+
+def _tombstone():
+    return (TOMBSTONE, time.time())
+
+
+def _is_tombstone(entry):
+    return isinstance(entry, tuple) and entry[0] == TOMBSTONE
+
+
+class TokenCache:
+    """
+    Two-tier cache for token -> user resolution.
+
+    The first tier is a bounded in-process LRU with a short TTL, so repeated
+    requests on the same worker never leave the process. Invalidations clear
+    it in the current process only; other workers drop their copy when it
+    expires, so `local_ttl` bounds how long they accept a revoked token. The second tier is the
+    Django cache framework, shared by every worker. Entries are small snapshots
+    of the token and its user rather than pickled model instances.
+
+    A snapshot loaded before a concurrent logout or deactivation must not be
+    cached after it. Invalidations leave a timestamped tombstone for the token
+    and the user, and `set` adds entries (`cache.add`) only if the lookup
+    started after the last invalidation, so a stale snapshot is dropped.
+    """
+    # Longer than any token lookup between a cache miss and `set`. Tombstone
+    # times are compared across workers, whose clocks are assumed in sync (NTP).
+    tombstone_ttl = 30
+
+    def __init__(self, local_size, local_ttl, shared_ttl, alias='default'):
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _token_key(key):
+        return f"auth:token:{key}"
+
+    @staticmethod
+    def _user_key(user_id):
+        return f"auth:token-user:{user_id}"
+
+    def get(self, key):
+        """
+        Return the cached snapshot for a token key, or None on a miss.
+        """
+        snapshot = self._get_local(key)
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = self.shared.get(self._token_key(key))
+        if snapshot is None or _is_tombstone(snapshot):
+            return None
+        self._set_local(key, snapshot)
+        return snapshot
+
+    async def aget(self, key):
+        """
+        Async `get`: the local tier is read inline, the shared tier is awaited.
+        """
+        snapshot = self._get_local(key)
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = await self.shared.aget(self._token_key(key))
+        if snapshot is None or _is_tombstone(snapshot):
+            return None
+        self._set_local(key, snapshot)
+        return snapshot
+
+    def _invalidated(self, entry, loaded_at):
+        return _is_tombstone(entry) and entry[1] >= loaded_at
+
+    def set(self, key, snapshot, loaded_at):
+        """
+        Store a snapshot in both tiers, unless the token or its user was
+        invalidated after `loaded_at` (the `time.time()` the lookup started).
+        """
+        user_key, token_key = self._user_key(snapshot['user']['id']), self._token_key(key)
+        for entry_key, value in ((user_key, key), (token_key, snapshot)):
+            if not self.shared.add(entry_key, value, self.shared_ttl):
+                if self._invalidated(self.shared.get(entry_key), loaded_at):
+                    return
+                self.shared.set(entry_key, value, self.shared_ttl)
+        # A user invalidated before the token entry was written did not know its key.
+        if self._invalidated(self.shared.get(user_key), loaded_at):
+            self.shared.delete(token_key)
+            return
+        self._set_local(key, snapshot)
+
+    async def aset(self, key, snapshot, loaded_at):
+        """
+        Async `set`.
+        """
+        user_key, token_key = self._user_key(snapshot['user']['id']), self._token_key(key)
+        for entry_key, value in ((user_key, key), (token_key, snapshot)):
+            if not await self.shared.aadd(entry_key, value, self.shared_ttl):
+                if self._invalidated(await self.shared.aget(entry_key), loaded_at):
+                    return
+                await self.shared.aset(entry_key, value, self.shared_ttl)
+        if self._invalidated(await self.shared.aget(user_key), loaded_at):
+            await self.shared.adelete(token_key)
+            return
+        self._set_local(key, snapshot)
+
+    def _get_local(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expires_at, snapshot = entry
+                if expires_at > now:
+                    self._local.move_to_end(key)
+                    return snapshot
+                del self._local[key]
+        return None
+
+    def _set_local(self, key, snapshot):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, snapshot)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Drop a single token from both tiers.
+        """
+        self.invalidate_many([key])
+
+    def invalidate_many(self, keys):
+        """
+        Drop several tokens from both tiers with one shared-cache write (e.g.
+        after a bulk delete that sends no `post_delete` signals).
+        """
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        tombstone = _tombstone()
+        self.shared.set_many({self._token_key(key): tombstone for key in keys}, self.tombstone_ttl)
+
+    def invalidate_user(self, user_id):
+        """
+        Drop every cached token that resolves to the given user.
+        """
+        with self._lock:
+            stale = [key for key, (_, snapshot) in self._local.items() if snapshot['user']['id'] == user_id]
+            for key in stale:
+                del self._local[key]
+        user_key = self._user_key(user_id)
+        key = self.shared.get(user_key)
+        tombstone = _tombstone()
+        tombstones = {user_key: tombstone}
+        if key is not None and not _is_tombstone(key):
+            tombstones[self._token_key(key)] = tombstone
+        self.shared.set_many(tombstones, self.tombstone_ttl)
+
+    def clear(self):
+        """
+        Empty the in-process tier (the shared tier expires on its own).
+        """
+        with self._lock:
+            self._local.clear()
+
+    @staticmethod
+    def snapshot(token):
+        """
+        Build a compact, picklable snapshot from a token with its user loaded.
+        """
+        user = token.user
+        return {
+            'key': token.key,
+            'created': token.created,
+            'expires_at': token.expires_at,
+            'user': {field: getattr(user, field) for field in USER_SNAPSHOT_FIELDS},
+        }
+
+    @staticmethod
+    def restore(snapshot, token_model):
+        """
+        Rebuild (user, token) instances from a snapshot without touching the database.
+        """
+        user_model = token_model._meta.get_field('user').related_model
+        user = _from_values(user_model, snapshot['user'])
+        token = _from_values(token_model, {
+            'key': snapshot['key'],
+            'user_id': snapshot['user']['id'],
+            'created': snapshot['created'],
+            'expires_at': snapshot['expires_at'],
+        })
+        token.user = user
+        return user, token
+
+
+def _from_values(model, values):
+    """
+    Instantiate a model from a partial {attname: value} dict, deferring the
+    remaining fields. `Model.from_db` expects values in concrete field order.
+    """
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(None, field_names, [values[name] for name in field_names])
+
+
+token_cache = TokenCache(
+    local_size=settings.TOKEN_CACHE_LOCAL_SIZE,
+    local_ttl=settings.TOKEN_CACHE_LOCAL_TTL,
+    shared_ttl=settings.TOKEN_CACHE_TTL,
+    alias=settings.TOKEN_CACHE_ALIAS,
+)
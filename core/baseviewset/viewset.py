@@ -1,8 +1,18 @@
-from rest_framework import viewsets
+import asyncio
+import math
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, status, viewsets
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 
+from apps.users.models import User
 from core.baseviewset.authentication import cTokenAuthentication
+from core.baseviewset.permission_cache import permission_cache
 from core.baseviewset import rData
+from core.response_handler.cache import SAFE_METHODS
+from core.response_handler.handler import ResponseHandler
+from utils.messages import TOO_MANY_REQUESTS
 
 class AuthPerm(DjangoModelPermissions):
     """
@@ -23,12 +33,83 @@ class AuthPerm(DjangoModelPermissions):
         'DELETE': ['%(app_label)s.delete_%(model_name)s'],  # Maps DELETE requests to 'delete' permissions.
     }
 
-class aBaseViewset(viewsets.ModelViewSet):
+    def has_permission(self, request, view):
+        # Token users are rebuilt per request; take their permissions from the cache.
+        if request.user and request.user.is_authenticated:
+            permission_cache.prime(request.user)
+        return super().has_permission(request, view)
+
+class IsAdminUserType(IsAuthenticated):
+    """
+    Allows access only to SuperAdmin and CompanyAdmin users.
+
+    `user_type` is part of the cached token snapshot, so the check needs no query.
+    """
+
+    def has_permission(self, request, view):
+        return super().has_permission(request, view) and request.user.user_type in User.ADMIN_USER_TYPES
+
+class ConditionalResponse(Exception):
+    """
+    Carries the 304/412 response of a conditional request out of `initial`.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+
+class CachePolicyMixin:
+    """
+    Per-action HTTP caching for viewsets.
+
+    Declare `cache_policies = {'list': CachePolicy(...)}`. For GET and HEAD on a
+    declared action, the policy's validators are computed once authentication
+    and permissions have passed; a request whose If-None-Match/If-Modified-Since
+    matches is answered 304 before the handler runs. Full responses of the
+    action get the ETag, Last-Modified, Cache-Control and Vary of the policy.
+    """
+    cache_policies = {}
+
+    def get_cache_policy(self):
+        return self.cache_policies.get(getattr(self, 'action', None))
+
+    def check_conditional(self, request, etag, last_modified):
+        self.cache_validators = (etag, last_modified)
+        policy = self.get_cache_policy()
+        response = ResponseHandler.conditional(request, etag, last_modified, policy.cache_control, policy.vary)
+        if response is not None:
+            raise ConditionalResponse(response)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        policy = self.get_cache_policy()
+        if policy is not None and request.method in SAFE_METHODS:
+            self.check_conditional(request, *policy.validators(self, request))
+
+    async def acheck_policy(self, request):
+        policy = self.get_cache_policy()
+        if policy is not None and request.method in SAFE_METHODS:
+            self.check_conditional(request, *await policy.avalidators(self, request))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        policy = self.get_cache_policy()
+        if policy is not None and request.method in SAFE_METHODS and response.status_code in (200, 304):
+            policy.apply(response, *getattr(self, 'cache_validators', (None, None)))
+        return response
+
+
+class aBaseViewset(CachePolicyMixin, viewsets.ModelViewSet):
     """
     Custom base viewset that enforces token authentication and permissions.
     
     Overrides key methods (list, retrieve, create, update, destroy) to:
-    - Assign the request object to the shared `rData.request`.
+    - Assign the request object to the request-local `rData.request`.
     - Preserve the base behavior of the parent class's methods.
     """
     # Use custom token-based authentication.
@@ -40,7 +121,7 @@ class aBaseViewset(viewsets.ModelViewSet):
         """
         Handles GET requests to list objects.
         """
-        rData.request = request  # Store the request object in a shared variable.
+        rData.request = request  # Store the request object for the current request context.
         return super().list(request, *args, **kwargs)  # Call the parent method.
 
     def retrieve(self, request, *args, **kwargs):
@@ -71,12 +152,12 @@ class aBaseViewset(viewsets.ModelViewSet):
         rData.request = request
         return super().destroy(request, *args, **kwargs)
 
-class nBaseViewset(viewsets.ModelViewSet):
+class nBaseViewset(CachePolicyMixin, viewsets.ModelViewSet):
     """
     Simplified base viewset that overrides create, update, and destroy methods.
     
-    These methods assign the request object to `rData.request` for potential
-    shared use before calling the parent class's methods.
+    These methods assign the request object to the request-local `rData.request`
+    before calling the parent class's methods.
     """
 
     def create(self, request, *args, **kwargs):
@@ -99,3 +180,152 @@ class nBaseViewset(viewsets.ModelViewSet):
         """
         rData.request = request
         return super().destroy(request, *args, **kwargs)
+
+
+class AsyncViewSetMixin(CachePolicyMixin):
+    """
+    Runs viewset handlers as coroutines on the event loop.
+
+    DRF's dispatch is synchronous, so under ASGI every view would otherwise be
+    wrapped in a `sync_to_async` thread hop. This mixin provides an async
+    `dispatch`: authentication uses `aauthenticate` when the authenticator
+    offers it, handlers are awaited, and only steps that still need the sync ORM
+    (e.g. model permission lookups) are pushed to a thread.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        # Keep cls/actions/initkwargs/csrf_exempt for the router and schema generators.
+        return update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        """
+        Async counterpart of `APIView.dispatch`.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        rData.request = request
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            # Get the appropriate handler method
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Async counterpart of `APIView.initial`.
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        if request.user.is_authenticated:
+            # Model permissions are looked up through the sync ORM.
+            await sync_to_async(self.check_permissions)(request)
+        else:
+            self.check_permissions(request)
+        await self.acheck_throttles(request)
+        await self.acheck_policy(request)
+
+    async def acheck_throttles(self, request):
+        """
+        Async counterpart of `APIView.check_throttles`, awaiting `aallow_request` where available.
+        """
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            aallow_request = getattr(throttle, 'aallow_request', None)
+            if aallow_request is not None:
+                allowed = await aallow_request(request, self)
+            else:
+                allowed = throttle.allow_request(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [duration for duration in throttle_durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+    def handle_exception(self, exc):
+        """
+        Throttled requests get the project's failure payload and a Retry-After header.
+        """
+        if isinstance(exc, exceptions.Throttled):
+            response = ResponseHandler.failure(
+                message=TOO_MANY_REQUESTS,
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            if exc.wait is not None:
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
+        return super().handle_exception(exc)
+
+    async def aperform_authentication(self, request):
+        """
+        Authenticate the request, awaiting authenticators that support it.
+        """
+        for authenticator in request.authenticators:
+            try:
+                aauthenticate = getattr(authenticator, 'aauthenticate', None)
+                if aauthenticate is not None:
+                    user_auth_tuple = await aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+
+class aAsyncBaseViewset(AsyncViewSetMixin, viewsets.ModelViewSet):
+    """
+    Async variant of `aBaseViewset`: token authentication and model permissions,
+    with `async def` handlers that use Django's async ORM (`aget`, `acreate`, `asave`).
+    """
+    # Use custom token-based authentication.
+    authentication_classes = [cTokenAuthentication]
+    # Apply custom permission class for authorization.
+    permission_classes = [AuthPerm]
+
+
+class nAsyncBaseViewset(AsyncViewSetMixin, viewsets.ModelViewSet):
+    """
+    Async variant of `nBaseViewset` for public endpoints (signup, login, password recovery).
+
+    No authenticators are run, so the request never touches the session or the database
+    before the handler.
+    """
+    authentication_classes = []
+
@@ -0,0 +1 @@
+from .unix_socket import UnixSocketChannelLayer
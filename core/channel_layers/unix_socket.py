@@ -0,0 +1,295 @@
+import asyncio
+import glob
+import logging
+import os
+import secrets
+import socket
+import stat
+import time
+from copy import deepcopy
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+SOCKET_SUFFIX = '.sock'
+# Datagram kinds
+TO_CHANNEL = 0
+TO_GROUP = 1
+
+
+def default_path():
+    """
+    Returns the socket directory used when none is configured: in the runtime
+    directory of the user (systemd's `RuntimeDirectory=`, then
+    `XDG_RUNTIME_DIR`), else in their home directory. Never in a directory
+    other users can write to, such as /tmp.
+    """
+    runtime = os.environ.get('RUNTIME_DIRECTORY', '').split(':')[0] or os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'django-channels')
+    return os.path.join(os.path.expanduser('~'), '.django-channels')
+
+
+class UnixSocketChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer for several ASGI worker processes on one host, without a broker.
+
+    Every process that has consumers binds a Unix datagram socket named after
+    it in `path` (created with mode 0700; a directory that is not the user's
+    own, or that others can access, is refused). Group membership stays in the
+    process that owns the channel, as in the in-memory layer, so `group_add`
+    costs no I/O; `group_send` delivers to local members and sends one
+    datagram per other live process, which delivers to its own members.
+    Process-specific channels (`new_channel`) carry the process name, so a
+    `send` to one is a single datagram to that process. General channels
+    (without `!`) are process-local. `group_send_many` sends to several groups
+    in one datagram per process.
+
+    Messages are packed with msgpack, one message per datagram; datagrams keep
+    their boundaries, so no further framing is needed. A full receiver makes
+    the sender back off for up to `send_timeout` seconds, then the message is
+    refused (`ChannelFull`) or, for a group, dropped for that process. The
+    socket of a process that exited is removed by the first sender it refuses.
+
+    Reading is done on the event loop of the first `receive`, `new_channel` or
+    `group_add`, i.e. the ASGI server's loop; sending works from any loop
+    (e.g. `async_to_sync(layer.group_send)` in a view).
+    """
+
+    extensions = ['groups', 'flush']
+    groups_per_datagram = 500
+
+    def __init__(self, path=None, max_message_size=64 * 1024, send_timeout=1.0,
+                 expiry=60, group_expiry=86400, capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(
+            expiry=expiry, group_expiry=group_expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs
+        )
+        self.path = path or default_path()
+        self.max_message_size = max_message_size
+        self.send_timeout = send_timeout
+        self.process_name = f"p{os.getpid()}-{secrets.token_hex(4)}"
+        self.socket_path = self.peer_path(self.process_name)
+        self._socket = None
+        self._sender = None
+        self._reader_loop = None
+
+    def peer_path(self, process_name):
+        return os.path.join(self.path, f"{process_name}{SOCKET_SUFFIX}")
+
+    def peers(self):
+        """
+        Returns the socket paths of the other processes.
+        """
+        return [peer for peer in glob.glob(os.path.join(self.path, f"*{SOCKET_SUFFIX}")) if peer != self.socket_path]
+
+    # Socket
+
+    def _check_path(self):
+        """
+        Refuses a socket directory another user could have created or could
+        write to: they could stand in for the peers and read every message.
+        """
+        try:
+            info = os.lstat(self.path)
+        except FileNotFoundError:
+            # No process listens yet; nothing to send to.
+            return
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & 0o077:
+            raise ImproperlyConfigured(
+                f"Channel layer socket directory {self.path} must be a directory owned by this user "
+                f"with mode 0700 (found uid {info.st_uid}, mode {stat.filemode(info.st_mode)})"
+            )
+
+    def _new_socket(self, option, size):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, size)
+        except OSError:
+            pass
+        return sock
+
+    def _bind(self):
+        if self._socket is None:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            self._check_path()
+            sock = self._new_socket(socket.SO_RCVBUF, self.max_message_size * 16)
+            sock.bind(self.socket_path)
+            self._socket = sock
+        return self._socket
+
+    def _listen(self):
+        """
+        Binds the process socket and reads it on the running loop.
+        """
+        sock = self._bind()
+        loop = asyncio.get_running_loop()
+        if self._reader_loop is loop:
+            return
+        if self._reader_loop is not None and not self._reader_loop.is_closed():
+            # Already read by a loop that is still alive (the server's).
+            return
+        loop.add_reader(sock.fileno(), self._read)
+        self._reader_loop = loop
+
+    def _read(self):
+        while True:
+            try:
+                data = self._socket.recv(self.max_message_size)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                kind, target, message = msgpack.unpackb(data, raw=False)
+            except (ValueError, msgpack.UnpackException):
+                logger.warning("Dropped a malformed channel layer datagram (%d bytes)", len(data))
+                continue
+            if kind == TO_GROUP:
+                self._deliver_to_groups(target, message)
+            else:
+                self._deliver(target, message)
+
+    def pack(self, kind, target, message):
+        data = msgpack.packb([kind, target, message], use_bin_type=True)
+        if len(data) > self.max_message_size:
+            raise ValueError(f"Message of {len(data)} bytes is larger than max_message_size ({self.max_message_size})")
+        return data
+
+    def _try_send(self, data, peer):
+        """
+        Sends a datagram to a peer process without waiting.
+
+        Returns:
+            bool | None: True once sent, False if the peer is gone, None if its queue is full.
+        """
+        if self._sender is None:
+            # Unbound: a process that only sends (e.g. a WSGI worker) is not a group_send peer.
+            self._check_path()
+            self._sender = self._new_socket(socket.SO_SNDBUF, self.max_message_size * 4)
+        try:
+            self._sender.sendto(data, peer)
+            return True
+        except (BlockingIOError, InterruptedError):
+            return None
+        except ConnectionRefusedError:
+            # Nobody reads it any more: the process exited without cleaning up.
+            try:
+                os.remove(peer)
+            except FileNotFoundError:
+                pass
+            return False
+        except FileNotFoundError:
+            return False
+
+    async def _send_datagram(self, data, peer):
+        """
+        Sends a datagram to a peer process, backing off while its queue is full.
+
+        Returns:
+            bool: False if the peer is gone or stayed full for `send_timeout`.
+        """
+        deadline = time.monotonic() + self.send_timeout
+        delay = 0.0005
+        while True:
+            sent = self._try_send(data, peer)
+            if sent is not None:
+                return sent
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    # Local delivery
+
+    def _deliver(self, channel, message):
+        queue = self.channels.setdefault(channel, asyncio.Queue(maxsize=self.get_capacity(channel)))
+        try:
+            queue.put_nowait((time.time() + self.expiry, message))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def _deliver_to_groups(self, groups, message, copy=False):
+        # A channel in several of the groups gets the message once.
+        channels = dict.fromkeys(channel for group in groups for channel in self.groups.get(group, {}))
+        for channel in channels:
+            if not self._deliver(channel, deepcopy(message) if copy else message):
+                logger.warning("Channel %s is full; dropped a message for groups %s", channel, groups)
+
+    # Channel layer API
+
+    def process_of(self, channel):
+        """
+        Returns the process name in a process-specific channel name, None for a general channel.
+        """
+        if '!' not in channel:
+            return None
+        return channel.split('!', 1)[0].rsplit('.', 1)[-1]
+
+    async def new_channel(self, prefix='specific.'):
+        self._listen()
+        return f"{prefix}.{self.process_name}!{secrets.token_urlsafe(9)}"
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        process = self.process_of(channel)
+        if process is None or process == self.process_name:
+            if not self._deliver(channel, deepcopy(message)):
+                raise ChannelFull(channel)
+            return
+        if not await self._send_datagram(self.pack(TO_CHANNEL, channel, message), self.peer_path(process)):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self._listen()
+        return await super().receive(channel)
+
+    async def group_add(self, group, channel):
+        self._listen()
+        await super().group_add(group, channel)
+
+    async def group_send(self, group, message):
+        await self.group_send_many([group], message)
+
+    async def group_send_many(self, groups, message):
+        """
+        Sends one message to several groups (e.g. the groups of several users)
+        for the cost of one `group_send`: a datagram per peer process carries
+        up to `groups_per_datagram` group names.
+        """
+        assert isinstance(message, dict), "message is not a dict"
+        groups = list(dict.fromkeys(groups))
+        for group in groups:
+            self.require_valid_group_name(group)
+        self._clean_expired()
+        for start in range(0, len(groups), self.groups_per_datagram):
+            batch = groups[start:start + self.groups_per_datagram]
+            data = self.pack(TO_GROUP, batch, message)
+            self._deliver_to_groups(batch, message, copy=True)
+            # Most peers take the datagram at once; only the full ones are waited for, concurrently.
+            blocked = [peer for peer in self.peers() if self._try_send(data, peer) is None]
+            if blocked:
+                sent = await asyncio.gather(*(self._send_datagram(data, peer) for peer in blocked))
+                for peer, ok in zip(blocked, sent):
+                    if not ok and os.path.exists(peer):
+                        logger.warning("Channel layer peer %s is full; dropped a message for %s", peer, batch)
+
+    async def close(self):
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+        if self._socket is None:
+            return
+        if self._reader_loop is not None and not self._reader_loop.is_closed():
+            self._reader_loop.remove_reader(self._socket.fileno())
+        self._reader_loop = None
+        self._socket.close()
+        self._socket = None
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
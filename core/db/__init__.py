@@ -0,0 +1,2 @@
+from .metrics import database_metrics, get_metrics
+from .pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout, close_pools, get_pools
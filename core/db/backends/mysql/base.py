@@ -0,0 +1,9 @@
+from django.db.backends.mysql import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    The MySQL backend, with connections borrowed from an in-process pool.
+    """
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+class ConnectionMetrics:
+    """
+    Connection counters for one database alias.
+
+    Tracks how often new database connections are established (the cost
+    persistent connections and pooling avoid) and, for pooled aliases, how
+    long requests wait to get a connection from the pool.
+    """
+
+    def __init__(self, window=60):
+        self.window = window
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.started = time.monotonic()
+        self.opened = 0
+        self.acquires = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _prune(self, now):
+        while self._recent and now - self._recent[0] > self.window:
+            self._recent.popleft()
+
+    def record_open(self):
+        now = time.monotonic()
+        with self._lock:
+            self.opened += 1
+            self._recent.append(now)
+            self._prune(now)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.acquires += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            window = min(self.window, now - self.started) or 1
+            return {
+                "connections_opened": self.opened,
+                "connections_per_second": round(len(self._recent) / window, 3),
+                "pool_acquires": self.acquires,
+                "pool_wait_ms_avg": round(self.wait_total / self.acquires * 1000, 3) if self.acquires else 0.0,
+                "pool_wait_ms_max": round(self.wait_max * 1000, 3),
+                "pool_timeouts": self.timeouts,
+            }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(alias):
+    """
+    Returns the ConnectionMetrics of a database alias, creating them on first use.
+    """
+    metrics = _metrics.get(alias)
+    if metrics is None:
+        with _metrics_lock:
+            metrics = _metrics.setdefault(alias, ConnectionMetrics())
+    return metrics
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def database_metrics():
+    """
+    Returns the connection metrics of every alias, with the pool state of pooled aliases.
+    """
+    from core.db.pool import get_pools
+
+    pools = get_pools()
+    return {
+        alias: {**get_metrics(alias).snapshot(), **(pools[alias].stats() if alias in pools else {})}
+        for alias in sorted(set(settings.DATABASES) | set(_metrics))
+    }
@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+
+from django.db import OperationalError
+
+from core.db.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    """
+    Raised when no connection became available within the pool timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of raw DB-API connections.
+
+    At most `max_size` connections are open at once; callers beyond that wait
+    up to `timeout` seconds for one to be released. Connections idle for more
+    than `max_idle` seconds are closed, down to `min_size`; `fill` opens
+    connections up to `min_size` ahead of demand. When a `check`
+    callable is given, idle connections are checked before being handed out
+    and replaced if the check fails.
+    """
+
+    def __init__(self, connect=None, min_size=0, max_size=10, max_idle=300, timeout=10, check=None, metrics=None):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check = check
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        # (connection, released_at), oldest first; reused from the end.
+        self._idle = []
+        self._size = 0
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception as error:
+            logger.debug("Error while closing database connection: %s", error)
+
+    def _open(self, connect):
+        connection = connect()
+        if self.metrics is not None:
+            self.metrics.record_open()
+        return connection
+
+    def _evict_idle(self, now):
+        """
+        Pops connections idle for too long. Must be called with the lock held.
+        """
+        evicted = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            evicted.append(self._idle.pop(0)[0])
+            self._size -= 1
+        return evicted
+
+    def _is_healthy(self, connection):
+        try:
+            self.check(connection)
+        except Exception:
+            return False
+        return True
+
+    def acquire(self, connect=None):
+        """
+        Returns an open connection, reusing an idle one when possible.
+
+        Args:
+            connect (callable): Opens a new connection when the pool has room;
+                defaults to the `connect` the pool was created with.
+
+        Raises:
+            PoolTimeout: If the pool is full and nothing was released in time.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            connection = None
+            with self._cond:
+                while True:
+                    evicted = self._evict_idle(time.monotonic())
+                    if self._idle:
+                        connection = self._idle.pop()[0]
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        if self.metrics is not None:
+                            self.metrics.record_timeout()
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s.")
+                    self._cond.wait(remaining)
+            for stale in evicted:
+                self._close(stale)
+
+            if connection is None:
+                try:
+                    connection = self._open(connect or self._connect)
+                except Exception:
+                    self._forget()
+                    raise
+            elif self.check is not None and not self._is_healthy(connection):
+                self.discard(connection)
+                continue
+
+            if self.metrics is not None:
+                self.metrics.record_wait(time.monotonic() - started)
+            return connection
+
+    def fill(self, connect=None):
+        """
+        Opens idle connections until `min_size` are open, so the next requests
+        find them ready. Errors are logged, not raised: the pool still opens
+        connections on demand.
+
+        Args:
+            connect (callable): As for `acquire`.
+        """
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._open(connect or self._connect)
+            except Exception as error:
+                self._forget()
+                logger.warning("Could not pre-open a pooled database connection: %s", error)
+                return
+            self.release(connection)
+
+    def release(self, connection):
+        """
+        Gives a connection back to the pool.
+        """
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            evicted = self._evict_idle(time.monotonic())
+            self._cond.notify()
+        for stale in evicted:
+            self._close(stale)
+
+    def discard(self, connection):
+        """
+        Closes a broken connection and frees its slot.
+        """
+        self._close(connection)
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pool_size": self._size,
+                "pool_idle": len(self._idle),
+                "pool_in_use": self._size - len(self._idle),
+                "pool_min_size": self.min_size,
+                "pool_max_size": self.max_size,
+            }
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pools():
+    return dict(_pools)
+
+
+def close_pools():
+    """
+    Closes the idle connections of every pool and drops the pools.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+def check_connection(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Makes a Django database backend borrow its connections from a ConnectionPool.
+
+    `connection.close()` (called by Django at the end of every request, since
+    pooled aliases run with CONN_MAX_AGE=0) hands the connection back to the
+    pool instead of closing it. The pool is configured by the alias' POOL
+    setting: MIN_SIZE, MAX_SIZE, MAX_IDLE (seconds) and TIMEOUT (seconds);
+    CONN_HEALTH_CHECKS enables the check of idle connections before reuse.
+    """
+
+    def get_pool(self):
+        pool = _pools.get(self.alias)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None:
+                    options = self.settings_dict.get('POOL') or {}
+                    pool = _pools[self.alias] = ConnectionPool(
+                        min_size=options.get('MIN_SIZE', 0),
+                        max_size=options.get('MAX_SIZE', 10),
+                        max_idle=options.get('MAX_IDLE', 300),
+                        timeout=options.get('TIMEOUT', 10),
+                        check=check_connection if self.settings_dict.get('CONN_HEALTH_CHECKS') else None,
+                        metrics=get_metrics(self.alias),
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        # New connections are opened by this wrapper, so backend state set while
+        # connecting (e.g. the PostgreSQL isolation level) is set on it too.
+        connect = super().get_new_connection
+        pool = self.get_pool()
+        connection = pool.acquire(lambda: connect(conn_params))
+        # Warms the pool up to MIN_SIZE on first use (and after connections were dropped).
+        pool.fill(lambda: connect(conn_params))
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = _pools.get(self.alias)
+        # A connection closed mid-transaction stays referenced by this wrapper, and a
+        # failed one may be unusable: neither goes back to the pool.
+        if pool is None or self.in_atomic_block or (self.errors_occurred and not self.is_usable()):
+            with self.wrap_database_errors:
+                self.connection.close()
+            if pool is not None:
+                pool._forget()
+            return
+        try:
+            if not self.autocommit:
+                self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+            return
+        pool.release(self.connection)
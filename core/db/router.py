@@ -0,0 +1,175 @@
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.baseviewset import rData
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY = 'db-sticky:{}'
+
+# Replication lag, in seconds, per vendor. Anything else (e.g. SQLite) reports no lag.
+LAG_QUERIES = {
+    'postgresql': "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)",
+    'mysql': "SHOW REPLICA STATUS",
+}
+
+
+def replicas_enabled():
+    return bool(settings.DATABASE_REPLICAS)
+
+
+def pin_primary():
+    """
+    Sends the remaining reads of the current request to the primary.
+    """
+    request = rData.request
+    if request is not None:
+        # Set on the Django request, which a DRF request also exposes.
+        getattr(request, '_request', request)._reads_from_primary = True
+
+
+def is_pinned():
+    request = rData.request
+    return request is not None and getattr(request, '_reads_from_primary', False)
+
+
+def _sticky_cache():
+    return caches[settings.DATABASE_REPLICA_STICKY_CACHE_ALIAS]
+
+
+def record_write(user_id=None):
+    """
+    Pins the current request to the primary and, for `user_id`, the user's next
+    requests for DATABASE_REPLICA_STICKY_SECONDS, so they read their own writes.
+    """
+    if not replicas_enabled():
+        return
+    pin_primary()
+    if user_id is not None:
+        _sticky_cache().set(STICKY_KEY.format(user_id), True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+
+
+def pin_if_recent_write(user_id):
+    """
+    Pins the current request to the primary if the user wrote recently.
+    """
+    if replicas_enabled() and _sticky_cache().get(STICKY_KEY.format(user_id)):
+        pin_primary()
+
+
+async def apin_if_recent_write(user_id):
+    if replicas_enabled() and await _sticky_cache().aget(STICKY_KEY.format(user_id)):
+        pin_primary()
+
+
+class ReplicaLag:
+    """
+    Cached replication lag of each replica, refreshed every
+    DATABASE_REPLICA_LAG_CHECK_INTERVAL seconds.
+
+    A replica that cannot be queried reports an infinite lag, so it is skipped
+    until a later check succeeds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    def measure(self, alias):
+        connection = connections[alias]
+        query = LAG_QUERIES.get(connection.vendor)
+        if query is None:
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                row = cursor.fetchone()
+                if connection.vendor == 'mysql':
+                    if row is None:
+                        return float('inf')
+                    columns = [column[0] for column in cursor.description]
+                    column = 'Seconds_Behind_Source' if 'Seconds_Behind_Source' in columns else 'Seconds_Behind_Master'
+                    value = row[columns.index(column)]
+                else:
+                    value = row[0]
+        except Exception as error:
+            logger.warning("Could not measure replication lag of %s: %s", alias, error)
+            return float('inf')
+        return float('inf') if value is None else float(value)
+
+    def get(self, alias):
+        now = time.monotonic()
+        lag, checked = self._lags.get(alias, (None, 0))
+        if lag is None or now - checked > settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+            lag = self.measure(alias)
+            with self._lock:
+                self._lags[alias] = (lag, now)
+        return lag
+
+    def forget(self):
+        with self._lock:
+            self._lags.clear()
+
+
+class ReplicaRouter:
+    """
+    Sends reads of DATABASE_REPLICA_MODELS to the replicas in DATABASE_REPLICAS.
+
+    Replicas are picked round-robin or, with DATABASE_REPLICA_STRATEGY
+    'least_lag', by the lowest measured lag; replicas lagging more than
+    DATABASE_REPLICA_MAX_LAG seconds are skipped. Reads stay on the primary when:
+    - the request (or, for a while, the user) has written, see `record_write`,
+    - they run inside a transaction on the primary,
+    - no replica is usable.
+
+    Writes and migrations always go to the primary.
+    """
+
+    def __init__(self):
+        self._turn = itertools.count()
+        self.lag = ReplicaLag()
+
+    def choose_replica(self, replicas):
+        max_lag = settings.DATABASE_REPLICA_MAX_LAG
+        if settings.DATABASE_REPLICA_STRATEGY == 'least_lag':
+            lag, alias = min((self.lag.get(alias), alias) for alias in replicas)
+            return alias if lag <= max_lag else DEFAULT_DB_ALIAS
+        start = next(self._turn)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.lag.get(alias) <= max_lag:
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.label_lower not in settings.DATABASE_REPLICA_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or is_pinned():
+            return DEFAULT_DB_ALIAS
+        return self.choose_replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        if settings.DATABASE_REPLICAS and model._meta.label_lower in settings.DATABASE_REPLICA_MODELS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,2 @@
+from .executor import get_hashing_executor, set_hashing_executor
+from .passwords import acheck_user_password, ahash_password, averify_password, hash_password, verify_password
@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.utils.module_loading import import_string
+
+
+def _init_worker():
+    """
+    Process pool initializer: hashers read PASSWORD_HASHERS, so the worker needs configured settings.
+    """
+    if not apps.ready:
+        django.setup()
+
+
+def _check_password(password, encoded):
+    # Only reports whether the hash is outdated: rehashing needs the ORM, which
+    # stays in the web process (see `core.hashing.acheck_user_password`).
+    return verify_password(password, encoded)
+
+
+class InlineHashingExecutor:
+    """
+    Hashes in the calling process.
+
+    The sync API runs on the caller's thread; the async API runs in a thread
+    so the event loop is not blocked, but hashing still competes for the GIL.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers
+
+    def hash_password(self, password):
+        return make_password(password)
+
+    def check_password(self, password, encoded):
+        """
+        Returns (is_correct, must_update); `must_update` is True when the hash
+        uses an outdated hasher or work factor.
+        """
+        return _check_password(password, encoded)
+
+    def verify_password(self, password, encoded):
+        return self.check_password(password, encoded)[0]
+
+    def hash_many(self, passwords):
+        return [make_password(password) for password in passwords]
+
+    async def ahash_password(self, password):
+        return await sync_to_async(make_password, thread_sensitive=False)(password)
+
+    async def acheck_password(self, password, encoded):
+        return await sync_to_async(_check_password, thread_sensitive=False)(password, encoded)
+
+    async def averify_password(self, password, encoded):
+        return (await self.acheck_password(password, encoded))[0]
+
+    def shutdown(self):
+        pass
+
+
+class ProcessPoolHashingExecutor(InlineHashingExecutor):
+    """
+    Hashes in a pool of worker processes.
+
+    PBKDF2 holds the GIL for its whole run, so a burst of logins on a worker
+    stalls every other request it serves. Handing the work to separate
+    processes leaves the web process free; callers only wait on a future.
+    The pool is started lazily on first use. With `workers=0` it behaves like
+    `InlineHashingExecutor`.
+    """
+
+    def __init__(self, workers=2):
+        super().__init__(workers)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # spawn: forking a threaded web process can deadlock the child.
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                    )
+        return self._pool
+
+    def hash_password(self, password):
+        if not self.workers:
+            return super().hash_password(password)
+        return self.pool.submit(make_password, password).result()
+
+    def check_password(self, password, encoded):
+        if not self.workers:
+            return super().check_password(password, encoded)
+        return self.pool.submit(_check_password, password, encoded).result()
+
+    def hash_many(self, passwords):
+        """
+        Hashes a batch of passwords across every worker; results keep the input order.
+        """
+        passwords = list(passwords)
+        if not self.workers or len(passwords) < 2:
+            return super().hash_many(passwords)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self.pool.map(make_password, passwords, chunksize=chunksize))
+
+    async def ahash_password(self, password):
+        if not self.workers:
+            return await super().ahash_password(password)
+        return await asyncio.wrap_future(self.pool.submit(make_password, password))
+
+    async def acheck_password(self, password, encoded):
+        if not self.workers:
+            return await super().acheck_password(password, encoded)
+        return await asyncio.wrap_future(self.pool.submit(_check_password, password, encoded))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_hashing_executor():
+    """
+    Returns the process-wide executor built from PASSWORD_HASHING_EXECUTOR and PASSWORD_HASHING_WORKERS.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                executor_class = import_string(settings.PASSWORD_HASHING_EXECUTOR)
+                _executor = executor_class(workers=settings.PASSWORD_HASHING_WORKERS)
+    return _executor
+
+
+def set_hashing_executor(executor):
+    """
+    Replaces the process-wide executor (shutting the previous one down) and returns it.
+    """
+    global _executor
+    with _executor_lock:
+        previous, _executor = _executor, executor
+    if previous is not None and previous is not executor:
+        previous.shutdown()
+    return executor
@@ -0,0 +1,67 @@
+from core.hashing.executor import get_hashing_executor
+
+
+def hash_password(password):
+    """
+    Hashes a password on the configured hashing executor.
+
+    Args:
+        password (str): The raw password.
+
+    Returns:
+        str: The encoded password, ready for `User.password`.
+    """
+    return get_hashing_executor().hash_password(password)
+
+
+def verify_password(password, encoded):
+    """
+    Verifies a raw password against an encoded one on the configured hashing executor.
+
+    Args:
+        password (str): The raw password.
+        encoded (str): The stored password hash.
+
+    Returns:
+        bool: True if the password matches.
+    """
+    return get_hashing_executor().verify_password(password, encoded)
+
+
+async def ahash_password(password):
+    """
+    Async `hash_password`; the event loop only awaits the result.
+    """
+    return await get_hashing_executor().ahash_password(password)
+
+
+async def averify_password(password, encoded):
+    """
+    Async `verify_password`.
+
+    Django's own `acheck_password` runs the hasher inline, which blocks the
+    loop for the full PBKDF2 duration.
+    """
+    return await get_hashing_executor().averify_password(password, encoded)
+
+
+async def acheck_user_password(user, password):
+    """
+    Async `User.check_password` on the hashing executor.
+
+    Like Django's setter, a correct password stored with an outdated hasher or
+    work factor is re-hashed and saved, so hasher upgrades still apply to
+    users who log in.
+
+    Args:
+        user (User): The user, with its `password` column loaded.
+        password (str): The raw password.
+
+    Returns:
+        bool: True if the password matches.
+    """
+    is_correct, must_update = await get_hashing_executor().acheck_password(password, user.password)
+    if is_correct and must_update:
+        user.password = await ahash_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,101 @@
+import logging
+import queue
+import time
+from contextlib import contextmanager
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class MailConnectionPool:
+    """
+    A small pool of long-lived mail backend connections.
+
+    Connections are opened once and reused, so consecutive sends skip the
+    TCP/TLS handshake and SMTP login. An idle connection is health-checked
+    (SMTP NOOP) before it is handed out and replaced if it is stale or broken.
+    """
+
+    def __init__(self, size=4, max_age=300, backend=None):
+        self.size = size
+        self.max_age = max_age
+        self.backend = backend
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _open(self):
+        connection = get_connection(self.backend)
+        connection.open()
+        connection.opened_at = time.monotonic()
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception as error:
+            logger.debug("Error while closing mail connection: %s", error)
+
+    def is_healthy(self, connection):
+        """
+        Check that a pooled connection is young enough and still answers.
+        """
+        if time.monotonic() - getattr(connection, 'opened_at', 0) > self.max_age:
+            return False
+        smtp = getattr(connection, 'connection', None)
+        if smtp is None:
+            # Non-SMTP backends (locmem, console, file) have nothing to check.
+            return not hasattr(connection, 'connection')
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """
+        Return a healthy connection, reusing an idle one when possible.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self.is_healthy(connection):
+                return connection
+            self._close(connection)
+
+    def release(self, connection, broken=False):
+        """
+        Give a connection back to the pool, or close it if it is broken or the pool is full.
+        """
+        if broken:
+            self._close(connection)
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            self._close(connection)
+
+    def discard(self, connection):
+        self.release(connection, broken=True)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a `with` block.
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception:
+            self.discard(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def close_all(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
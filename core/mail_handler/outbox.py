@@ -0,0 +1,169 @@
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from apps.users.models import MailOutbox
+from core.mail_handler.sand_mail import SandMailHandler
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_mail(to, context, template_name):
+    """
+    Queues an email for delivery by the mail worker.
+
+    The row is written in the caller's transaction, so mails for rolled back
+    work are never sent.
+
+    Args:
+        to (str): The recipient email address.
+        context (dict): JSON-serializable context for the template.
+        template_name (str): The name of the template to render.
+
+    Returns:
+        MailOutbox: The queued row.
+    """
+    return MailOutbox.objects.create(to=to, context=context, template_name=template_name)
+
+
+def enqueue_many(mails, batch_size=1000):
+    """
+    Queues many emails with bulk inserts.
+
+    Args:
+        mails (iterable): (to, context, template_name) tuples.
+        batch_size (int): Rows per INSERT statement.
+    """
+    return MailOutbox.objects.bulk_create(
+        [MailOutbox(to=to, context=context, template_name=template_name) for to, context, template_name in mails],
+        batch_size=batch_size,
+    )
+
+
+def queue_depth():
+    """
+    Returns the number of outbox rows per status name.
+    """
+    labels = dict(MailOutbox.STATUS_CHOICES)
+    counts = {label.lower(): 0 for label in labels.values()}
+    for row in MailOutbox.objects.values('status').annotate(total=Count('id')):
+        counts[labels[row['status']].lower()] = row['total']
+    return counts
+
+
+class MailOutboxWorker:
+    """
+    Delivers queued emails in batches.
+
+    Rows are claimed inside a short transaction (SELECT ... FOR UPDATE SKIP
+    LOCKED where the database supports it), so several workers can drain the
+    same outbox. Claimed rows carry a lease: a worker that dies mid-batch only
+    delays its rows until the lease runs out. Each batch goes out through
+    `SandMailHandler.send_many` over one pooled connection; failures are
+    retried with exponential backoff. The context of a row that was sent or
+    given up on is emptied, so one-time codes, links and passwords are not
+    kept; `purge_expired_tokens` deletes the rows after MAIL_OUTBOX_RETENTION.
+    """
+
+    def __init__(self, batch_size=50, max_attempts=5, backoff=30, max_backoff=3600, lease=300, handler=None):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.handler = handler or SandMailHandler()
+
+    def claim_batch(self):
+        """
+        Claims up to `batch_size` deliverable rows and marks them as sending.
+        """
+        now = timezone.now()
+        deliverable = Q(status=MailOutbox.STATUS_PENDING, available_at__lte=now) | Q(
+            status=MailOutbox.STATUS_SENDING, claimed_at__lte=now - timedelta(seconds=self.lease)
+        )
+        claim = {'status': MailOutbox.STATUS_SENDING, 'claimed_at': now, 'attempts': F('attempts') + 1}
+        with transaction.atomic():
+            queryset = MailOutbox.objects.filter(deliverable).order_by('available_at')
+            if connection.features.has_select_for_update_skip_locked:
+                rows = list(queryset.select_for_update(skip_locked=True)[:self.batch_size])
+                if rows:
+                    MailOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(**claim)
+                for row in rows:
+                    row.attempts += 1
+                return rows
+
+            # Without row locks, another worker may claim the same rows between
+            # the SELECT and the UPDATE: only the rows still deliverable are
+            # updated, and only those stamped with this claim are returned.
+            pks = list(queryset.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                return []
+            MailOutbox.objects.filter(deliverable, pk__in=pks).update(**claim)
+            return list(
+                MailOutbox.objects.filter(pk__in=pks, status=MailOutbox.STATUS_SENDING, claimed_at=now)
+                .order_by('available_at')
+            )
+
+    def deliver(self, rows):
+        """
+        Sends the claimed rows over one pooled connection and records the outcome.
+
+        Returns:
+            tuple: The number of sent and failed rows.
+        """
+        sent, failed, messages, queued = [], [], [], []
+        for row in rows:
+            try:
+                messages.append(self.handler.build_message(row.to, row.context, row.template_name))
+                queued.append(row)
+            except Exception as error:
+                failed.append((row, error))
+
+        for row, error in zip(queued, self.handler.send_many(messages)):
+            if error is None:
+                sent.append(row.pk)
+            else:
+                failed.append((row, error))
+        for row, error in failed:
+            logger.warning("Mail %s to %s failed: %s", row.pk, row.to, error)
+
+        now = timezone.now()
+        if sent:
+            MailOutbox.objects.filter(pk__in=sent).update(
+                status=MailOutbox.STATUS_SENT, sent_at=now, last_error=None, context={}
+            )
+        for row, error in failed:
+            self.reschedule(row, error, now)
+        return len(sent), len(failed)
+
+    def reschedule(self, row, error, now):
+        """
+        Puts a failed row back in the queue with exponential backoff, or gives up on it.
+        """
+        context = row.context
+        if row.attempts >= self.max_attempts:
+            status = MailOutbox.STATUS_FAILED
+            available_at = now
+            context = {}
+        else:
+            status = MailOutbox.STATUS_PENDING
+            delay = min(self.backoff * 2 ** (row.attempts - 1), self.max_backoff)
+            available_at = now + timedelta(seconds=delay)
+        MailOutbox.objects.filter(pk=row.pk).update(
+            status=status, available_at=available_at, claimed_at=None, last_error=str(error), context=context
+        )
+
+    def run_once(self):
+        """
+        Claims and delivers a single batch.
+
+        Returns:
+            tuple: The number of sent and failed rows (0, 0 when the queue is empty).
+        """
+        rows = self.claim_batch()
+        if not rows:
+            return 0, 0
+        return self.deliver(rows)
@@ -0,0 +1,103 @@
+import threading
+
+from django.conf import settings
+from django.template import Context, engines
+from django.template.base import TextNode, VariableNode
+
+
+class CompiledMailTemplate:
+    """
+    A mail template flattened into static text and variable slots.
+
+    Mail bodies are mostly static markup (including their inline CSS) with a
+    handful of `{{ variable }}` slots. When a template consists only of text
+    and variable nodes, the static parts are kept as pre-joined strings and
+    rendering a recipient's mail only resolves the slots. Templates that use
+    tags fall back to the regular (already compiled) template render.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.autoescape = template.template.engine.autoescape
+        self.parts = self._flatten(template.template.nodelist)
+
+    @staticmethod
+    def _flatten(nodelist):
+        parts = []
+        for node in nodelist:
+            if isinstance(node, TextNode):
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += node.s
+                else:
+                    parts.append(node.s)
+            elif isinstance(node, VariableNode):
+                parts.append(node)
+            else:
+                return None
+        return parts
+
+    @property
+    def is_flat(self):
+        return self.parts is not None
+
+    def render(self, context):
+        if self.parts is None:
+            return self.template.render(context)
+        context = Context(context, autoescape=self.autoescape)
+        with context.bind_template(self.template.template):
+            return ''.join(part if isinstance(part, str) else part.render(context) for part in self.parts)
+
+
+class MailTemplateRenderer:
+    """
+    Compiles mail templates once per process and renders them from memory.
+
+    Templates are resolved through the loader chain only on first use (or at
+    startup via `precompile`), regardless of DEBUG or the cached loader.
+    """
+
+    def __init__(self, engine_name='django'):
+        self.engine_name = engine_name
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_name):
+        compiled = self._compiled.get(template_name)
+        if compiled is None:
+            with self._lock:
+                compiled = self._compiled.get(template_name)
+                if compiled is None:
+                    template = engines[self.engine_name].get_template(template_name)
+                    compiled = self._compiled[template_name] = CompiledMailTemplate(template)
+        return compiled
+
+    def precompile(self, template_names):
+        for template_name in template_names:
+            self.get(template_name)
+
+    def render(self, template_name, context):
+        """
+        Renders a mail template with the given context.
+
+        Args:
+            template_name (str): The name of the template to render.
+            context (dict): The context data to render the template.
+
+        Returns:
+            str: The rendered body.
+        """
+        return self.get(template_name).render(context)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+
+
+mail_renderer = MailTemplateRenderer()
+
+
+def precompile_mail_templates():
+    """
+    Compiles every template listed in settings.MAIL_TEMPLATES.
+    """
+    mail_renderer.precompile(settings.MAIL_TEMPLATES)
@@ -1,32 +1,114 @@
+import smtplib
+
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 from django.conf import settings
 
+from core.mail_handler.connection_pool import MailConnectionPool
+from core.mail_handler.renderer import mail_renderer
+
+# Errors after which a pooled connection is rebuilt and the message retried once.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+_default_pool = None
+
+
+def get_default_pool():
+    """
+    Returns the process-wide mail connection pool, creating it on first use.
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = MailConnectionPool(
+            size=settings.MAIL_CONNECTION_POOL_SIZE,
+            max_age=settings.MAIL_CONNECTION_MAX_AGE,
+        )
+    return _default_pool
+
+
 class SandMailHandler:
     """
     A class to handle sending emails with templates and context.
+
+    Messages are sent over pooled, long-lived connections (see
+    `MailConnectionPool`) instead of opening a new connection per message.
     """
 
-    def __init__(self, default_from_email=None):
+    def __init__(self, default_from_email=None, pool=None):
         """
         Initializes the EmailSender with a default sender email.
 
         Args:
             default_from_email (str): The default email address to use as the sender.
+            pool (MailConnectionPool, optional): The connection pool to send through.
         """
         self.default_from_email = default_from_email or settings.DEFAULT_FROM_EMAIL
+        self.pool = pool or get_default_pool()
 
-    def send_email(self, to, context, template_name):
+    def build_message(self, to, context, template_name):
         """
-        Sends an email using the provided template, subject, and context.
+        Builds an email message from the provided template, subject, and context.
 
         Args:
             to (str): The recipient email address.
             context (dict): The context data to render the template.
             template_name (str): The name of the template to render.
+
+        Returns:
+            EmailMultiAlternatives: The message, ready to be sent.
         """
-        html_content = render_to_string(template_name, context)
+        html_content = mail_renderer.render(template_name, context)
         subject = context.get('subject', 'No Subject')
         msg = EmailMultiAlternatives(subject, "", self.default_from_email, [to])
         msg.attach_alternative(html_content, 'text/html')
-        msg.send()
+        return msg
+
+    def send_email(self, to, context, template_name):
+        """
+        Sends an email using the provided template, subject, and context.
+
+        Args:
+            to (str): The recipient email address.
+            context (dict): The context data to render the template.
+            template_name (str): The name of the template to render.
+        """
+        error = self.send_many([self.build_message(to, context, template_name)])[0]
+        if error is not None:
+            raise error
+
+    def send_many(self, messages):
+        """
+        Sends many messages over a single pooled connection.
+
+        If the connection drops mid-batch it is rebuilt and the current message
+        is retried once. Other failures are reported per message and do not stop
+        the batch.
+
+        Args:
+            messages (list): EmailMessage instances to send.
+
+        Returns:
+            list: One entry per message, None if it was sent or the exception that prevented it.
+        """
+        errors = [None] * len(messages)
+        connection = None
+        try:
+            for index, message in enumerate(messages):
+                for retry in (False, True):
+                    try:
+                        if connection is None:
+                            connection = self.pool.acquire()
+                        connection.send_messages([message])
+                        errors[index] = None
+                        break
+                    except CONNECTION_ERRORS as error:
+                        errors[index] = error
+                        if connection is not None:
+                            self.pool.discard(connection)
+                            connection = None
+                    except Exception as error:
+                        errors[index] = error
+                        break
+        finally:
+            if connection is not None:
+                self.pool.release(connection)
+        return errors
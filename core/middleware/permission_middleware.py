@@ -1,39 +1,50 @@
-from django.contrib.auth.models import Group, Permission
-from django.contrib.contenttypes.models import ContentType
-from django.apps import apps
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from core.middleware.permission_sync import ensure_synced, state
+
+logger = logging.getLogger(__name__)
 
 class PermissionMiddleware:
+    """
+    Keeps every group granted all permissions.
+
+    The actual sync runs once per process (on the first request or right after
+    `migrate`) and again only when a group, permission or content type changes.
+    Otherwise the request path is a single in-process version comparison, on
+    both the sync and the async stack.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Code to be executed for each request before
         # the view (and later middleware) are called.
         try:
-            for group in Group.objects.all():
-                self.ensure_group_permissions(group)
-
-            response = self.get_response(request)
-        except Exception as e:
-            print(f"An error occurred while checking permissions: {e}")
-            return self.get_response(request)  # Return response to the client as is
+            ensure_synced()
+        except Exception:
+            logger.exception("An error occurred while checking permissions")
 
         # Code to be executed for each request/response after
         # the view is called.
 
-        return response
-
-    def ensure_group_permissions(self, group):
-        # Get all available permissions
-        all_permissions = Permission.objects.all()
-
-        # Get current permissions for the group
-        current_permissions = group.permissions.all()
+        return self.get_response(request)
 
-        # Find missing permissions
-        missing_permissions = set(all_permissions) - set(current_permissions)
+    async def __acall__(self, request):
+        # Only hop to a thread when there is actually something to sync.
+        if state.is_stale():
+            try:
+                await sync_to_async(ensure_synced)()
+            except Exception:
+                logger.exception("An error occurred while checking permissions")
 
-        # Add missing permissions to the group
-        if missing_permissions:
-            group.permissions.add(*missing_permissions)
-            print(f"Added {len(missing_permissions)} permissions to group '{group.name}'")
\ No newline at end of file
+        return await self.get_response(request)
@@ -0,0 +1,96 @@
+import threading
+
+from django.contrib.auth.models import Group, Permission
+
+from core.baseviewset.permission_cache import permission_cache
+
+
+class PermissionSyncState:
+    """
+    In-process bookkeeping for the group permission sync.
+
+    `version` is bumped by the invalidation hooks (post_migrate, group and
+    content type changes). The middleware only compares it with
+    `synced_version`, so the request path never touches the database unless
+    something has actually changed since the last sync.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.synced_version = -1
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return self.synced_version != self.version
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+
+
+state = PermissionSyncState()
+
+
+def sync_group_permissions(groups=None, using=None):
+    """
+    Grant every available permission to the given groups (all groups by default).
+
+    Works on the `Group.permissions` through table directly, so the cost is a
+    fixed number of queries regardless of how many groups exist.
+
+    Args:
+        groups (iterable, optional): Groups or group ids to sync.
+        using (str, optional): The database alias (the routed one by default).
+
+    Returns:
+        int: The number of group/permission links that were added.
+    """
+    through = Group.permissions.through
+    permission_ids = list(Permission.objects.using(using).values_list('id', flat=True))
+    if groups is None:
+        group_ids = list(Group.objects.using(using).values_list('id', flat=True))
+    else:
+        group_ids = [getattr(group, 'pk', group) for group in groups]
+
+    if not group_ids or not permission_ids:
+        return 0
+
+    existing = set(
+        through.objects.using(using).filter(group_id__in=group_ids).values_list('group_id', 'permission_id')
+    )
+    missing = [
+        through(group_id=group_id, permission_id=permission_id)
+        for group_id in group_ids
+        for permission_id in permission_ids
+        if (group_id, permission_id) not in existing
+    ]
+    if missing:
+        through.objects.using(using).bulk_create(missing, ignore_conflicts=True)
+        # bulk_create sends no m2m_changed, so drop the cached permission sets here.
+        permission_cache.invalidate_all()
+    return len(missing)
+
+
+def ensure_synced(using=None):
+    """
+    Run the sync if the in-process version moved since the last run.
+
+    Returns:
+        bool: True if a sync was performed.
+    """
+    if not state.is_stale():
+        return False
+    with state.lock:
+        if not state.is_stale():
+            return False
+        version = state.version
+        sync_group_permissions(using=using)
+        state.synced_version = version
+    return True
+
+
+def invalidate_permissions(**kwargs):
+    """
+    Signal receiver that marks the group permissions as stale.
+    """
+    state.invalidate()
@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from core.baseviewset import rData
+
+
+class RequestContextMiddleware:
+    """
+    Makes the current request available through `rData.request`.
+
+    Works for both sync (WSGI) and async (ASGI) stacks. The request is stored
+    in a context variable, so concurrent requests never see each other's data.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = rData.set_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            rData.reset_request(token)
+
+    async def __acall__(self, request):
+        token = rData.set_request(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            rData.reset_request(token)
@@ -0,0 +1,88 @@
+import inspect
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _timestamp(last_modified):
+    return timegm(last_modified.utctimetuple()) if last_modified is not None else None
+
+
+def apply_cache_headers(response, etag=None, last_modified=None, cache_control=None, vary=None):
+    """
+    Sets the validators and caching policy on a response, keeping headers already set.
+
+    Args:
+        etag (str): Entity tag; quoted if needed.
+        last_modified (datetime): Last modification time of the resource.
+        cache_control (dict | str): Cache-Control directives, e.g. {'private': True, 'max_age': 60}.
+        vary (iterable): Request headers the response depends on.
+    """
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+    if last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    if isinstance(cache_control, str):
+        if not response.has_header('Cache-Control'):
+            response['Cache-Control'] = cache_control
+    elif cache_control:
+        patch_cache_control(response, **cache_control)
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
+def evaluate_conditions(request, etag=None, last_modified=None):
+    """
+    Evaluates the conditional headers of a GET or HEAD request.
+
+    Returns:
+        int | None: 304 (Not Modified) or 412 (Precondition Failed) when the
+        request can be answered without a body, None otherwise.
+    """
+    if request.method not in SAFE_METHODS or (not etag and last_modified is None):
+        return None
+    response = get_conditional_response(
+        request, etag=quote_etag(etag) if etag else None, last_modified=_timestamp(last_modified)
+    )
+    return response.status_code if response is not None else None
+
+
+async def _resolve(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class CachePolicy:
+    """
+    HTTP caching for one viewset action (see `CachePolicyMixin`).
+
+    `etag` and `last_modified` are callables taking (view, request); they may be
+    coroutine functions on async viewsets. They are evaluated after
+    authentication and permissions, before the handler, so a matching
+    conditional request is answered 304 without running the handler.
+    `cache_control` and `vary` are added to the action's GET/HEAD responses.
+    """
+
+    def __init__(self, etag=None, last_modified=None, cache_control=None, vary=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+        self.vary = vary
+
+    def validators(self, view, request):
+        return (
+            self.etag(view, request) if self.etag else None,
+            self.last_modified(view, request) if self.last_modified else None,
+        )
+
+    async def avalidators(self, view, request):
+        etag, last_modified = self.validators(view, request)
+        return await _resolve(etag), await _resolve(last_modified)
+
+    def apply(self, response, etag=None, last_modified=None):
+        return apply_cache_headers(response, etag, last_modified, self.cache_control, self.vary)
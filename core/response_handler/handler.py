@@ -1,10 +1,28 @@
 from rest_framework.response import Response
 from rest_framework import status
 
+from core.response_handler.cache import apply_cache_headers, evaluate_conditions
+from utils.messages import HTTP_412_PRECONDITION_FAILED
+
 class ResponseHandler:
+    """
+    Builds the project's response payloads.
+
+    `success`, `failure` and `not_modified` accept optional HTTP caching
+    metadata: `etag`, `last_modified`, `cache_control` and `vary` (see
+    `core.response_handler.cache.apply_cache_headers`). When `success` is given
+    the `request` and its validators, a matching conditional GET or HEAD is
+    answered 304 (or 412) without building the payload.
+    """
+
     @staticmethod
-    def success(data=None, message="Operation successful", status_code=status.HTTP_200_OK):
+    def success(data=None, message="Operation successful", status_code=status.HTTP_200_OK,
+                etag=None, last_modified=None, cache_control=None, vary=None, request=None):
         """Returns a successful response."""
+        if request is not None:
+            conditional = ResponseHandler.conditional(request, etag, last_modified, cache_control, vary)
+            if conditional is not None:
+                return conditional
         response = {
             "status": True,
             "message": message,
@@ -12,10 +30,11 @@ class ResponseHandler:
         }
         if data:
             response["data"] = data
-        return Response(response, status=status_code)
+        return apply_cache_headers(Response(response, status=status_code), etag, last_modified, cache_control, vary)
 
     @staticmethod
-    def failure(message="An error occurred", status_code=status.HTTP_400_BAD_REQUEST, data=None):
+    def failure(message="An error occurred", status_code=status.HTTP_400_BAD_REQUEST, data=None,
+                cache_control=None, vary=None):
         """Returns a failure response."""
         response = {
             "status": False,
@@ -24,7 +43,27 @@ class ResponseHandler:
         }
         if data:
             response["data"] = data
-        return Response(response, status=status_code)
+        return apply_cache_headers(Response(response, status=status_code), cache_control=cache_control, vary=vary)
+
+    @staticmethod
+    def not_modified(etag=None, last_modified=None, cache_control=None, vary=None):
+        """Returns an empty 304 response for a conditional request that matched."""
+        return apply_cache_headers(
+            Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified, cache_control, vary
+        )
+
+    @staticmethod
+    def conditional(request, etag=None, last_modified=None, cache_control=None, vary=None):
+        """
+        Returns the 304 or 412 response for a conditional GET or HEAD, or None if the
+        request must be answered in full.
+        """
+        status_code = evaluate_conditions(request, etag, last_modified)
+        if status_code == status.HTTP_304_NOT_MODIFIED:
+            return ResponseHandler.not_modified(etag, last_modified, cache_control, vary)
+        if status_code == status.HTTP_412_PRECONDITION_FAILED:
+            return ResponseHandler.failure(message=HTTP_412_PRECONDITION_FAILED, status_code=status_code)
+        return None
 
     @staticmethod
     def validation_error(errors, status_code=status.HTTP_400_BAD_REQUEST):
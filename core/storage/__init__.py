@@ -0,0 +1,2 @@
+from .content_addressed import IMMUTABLE_CACHE_CONTROL, ContentAddressedStorage, is_content_addressed
+from .static import GzipManifestStaticFilesStorage
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+# Content-addressed files never change: clients and CDNs may keep them for a year.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.[\w]+)?$')
+
+
+def is_content_addressed(name):
+    """
+    Tells whether a storage name (or URL path) was produced by `ContentAddressedStorage`.
+    """
+    return bool(HASHED_NAME.search(name or ''))
+
+
+@deconstructible(path='core.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files by the SHA-256 of their content.
+
+    `users/photos/me.jpg` is stored as `users/photos/ab/cd/abcd...ef.jpg`: the
+    directory of the requested name is kept and files are sharded two levels
+    deep, so no directory grows past a few thousand entries. Saving bytes that
+    are already stored writes nothing and returns the existing name, so
+    identical uploads share one file and one inode.
+
+    Content is hashed while it is copied to a temporary file next to the
+    storage root, then renamed into place (uploads already in a temporary file
+    are hashed and moved), so each byte is read once and a file is never seen
+    half written. Saved files are recorded in the reference table of
+    `apps.users.media_files`; unreferenced ones are removed by `gc_media`.
+    """
+    incoming_dir = '.incoming'
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content only; an existing file is reused, not renamed.
+        name = str(name).replace('\\', '/')
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    @staticmethod
+    def hashed_name(directory, digest, extension):
+        return posixpath.join(directory, digest[:2], digest[2:4], f"{digest}{extension}")
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = hashlib.sha256()
+        size = 0
+
+        if hasattr(content, 'temporary_file_path'):
+            for chunk in content.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+            source, owned = content.temporary_file_path(), False
+        else:
+            incoming = self.path(self.incoming_dir)
+            os.makedirs(incoming, exist_ok=True)
+            fd, source = tempfile.mkstemp(dir=incoming)
+            owned = True
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+
+        name = self.hashed_name(directory, digest.hexdigest(), extension)
+        # Recorded before the file is looked for: from here on `gc_media` keeps
+        # it, and a collection already under way has deleted it by now.
+        self.record(name, size)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            if owned:
+                os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                if owned:
+                    os.replace(source, full_path)
+                else:
+                    file_move_safe(source, full_path)
+            except FileExistsError:
+                # Saved concurrently: same name, same bytes.
+                pass
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def record(self, name, size):
+        from apps.users.media_files import record_file
+
+        record_file(name, size)
@@ -0,0 +1,53 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.deconstruct import deconstructible
+
+GZIP_SUFFIX = '.gz'
+
+
+@deconstructible(path='core.storage.GzipManifestStaticFilesStorage')
+class GzipManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage (content-hashed names, e.g. `css/style.3f2a1b9c8d7e.css`)
+    that also writes a gzip copy next to each compressible file at collectstatic.
+
+    Compression happens once per deploy at the highest level instead of on
+    every response, and the copies are picked up as-is by `serve_static` or a
+    front server (nginx `gzip_static on`). A hashed name never changes content,
+    so an existing copy is kept and later runs only compress new files.
+    """
+    gzip_extensions = ('.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ttf', '.otf', '.eot')
+    gzip_min_size = 256
+    # A copy that saves less than this is not worth the extra file.
+    gzip_min_ratio = 0.9
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if self.compress(name):
+                yield name, f"{name}{GZIP_SUFFIX}", True
+
+    def compress(self, name):
+        """
+        Writes `name.gz` if the file is compressible and compresses well.
+
+        Returns:
+            bool: Whether a copy was written.
+        """
+        compressed_name = f"{name}{GZIP_SUFFIX}"
+        if not name.lower().endswith(self.gzip_extensions) or self.exists(compressed_name):
+            return False
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.gzip_min_size:
+            return False
+        # mtime=0 keeps the output identical across deploys.
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) > len(content) * self.gzip_min_ratio:
+            return False
+        self._save(compressed_name, ContentFile(compressed))
+        return True
@@ -0,0 +1,213 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_http_date_safe, quote_etag
+
+from core.response_handler.cache import apply_cache_headers, evaluate_conditions
+from core.storage.content_addressed import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+from core.storage.static import GZIP_SUFFIX
+
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+# Names written by ManifestStaticFilesStorage, e.g. css/style.3f2a1b9c8d7e.css
+MANIFEST_HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+READ_BLOCK_SIZE = 64 * 1024
+OFFLOAD_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+
+
+def resolve(document_root, path):
+    """
+    Returns the normalized path, absolute path and stat of a regular file under `document_root`.
+
+    Raises:
+        Http404: For anything else, including hidden names such as the
+        `.incoming` directory of the media storage.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        full_path = safe_join(document_root, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+    return path, full_path, stat_result
+
+
+def file_etag(path, stat_result):
+    """
+    The content hash of a content-addressed file, the modification time and size of any other.
+    """
+    if is_content_addressed(path):
+        return os.path.splitext(posixpath.basename(path))[0]
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def content_type_for(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def byte_range(header, size):
+    """
+    Parses a single-range `Range` header.
+
+    Returns:
+        tuple | None: The first and last byte positions, or None to send the
+        whole file (no header, several ranges or a malformed one, which a
+        server may ignore).
+
+    Raises:
+        ValueError: If the range starts past the end of the file.
+    """
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError(header)
+    return first, min(int(last), size - 1) if last else size - 1
+
+
+def if_range_matches(request, etag, mtime):
+    """
+    Tells whether a range may be sent: no If-Range, or one naming the current version.
+    """
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == quote_etag(etag)
+    return parse_http_date_safe(value) == int(mtime)
+
+
+def read_range(full_path, first, last):
+    remaining = last - first + 1
+    with open(full_path, 'rb') as source:
+        source.seek(first)
+        while remaining > 0:
+            block = source.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def file_response(request, full_path, stat_result, etag, content_type, cache_control, encoding=None):
+    """
+    Answers a GET or HEAD for a file: 304/412 on matching conditions, 206 for a
+    satisfiable byte range, 416 for one past the end, the whole file otherwise.
+
+    Whole files go out as a `FileResponse`, which WSGI servers send with
+    `sendfile` (the `wsgi.file_wrapper`); ranges are streamed in blocks.
+    """
+    last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+    status = evaluate_conditions(request, etag, last_modified)
+    if status is not None:
+        return apply_cache_headers(HttpResponse(status=status), etag, last_modified, cache_control)
+
+    size = stat_result.st_size
+    requested = None
+    if request.method == 'GET' and if_range_matches(request, etag, stat_result.st_mtime):
+        try:
+            requested = byte_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    if requested is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        first, last = requested
+        response = StreamingHttpResponse(read_range(full_path, first, last), status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {first}-{last}/{size}"
+        response['Content-Length'] = last - first + 1
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return apply_cache_headers(response, etag, last_modified, cache_control)
+
+
+def offload_response(request, path, full_path, stat_result, etag, content_type, cache_control, header):
+    """
+    Checks the conditions and hands the file to the front server, which sends
+    the bytes (and any range) itself: nginx `X-Accel-Redirect` to an internal
+    location aliased to MEDIA_ROOT, or Apache/lighttpd `X-Sendfile`.
+    """
+    last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+    status = evaluate_conditions(request, etag, last_modified)
+    response = HttpResponse(status=status or 200, content_type=content_type)
+    if status is None:
+        if header == 'X-Sendfile':
+            response[header] = full_path
+        else:
+            response[header] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(path)}"
+    return apply_cache_headers(response, etag, last_modified, cache_control)
+
+
+def serve_media(request, path, document_root=None):
+    """
+    Serves a media file with validators, byte ranges and caching headers.
+
+    Content-addressed files have their hash as a strong ETag and are immutable;
+    anything else (e.g. the default photo) is revalidated. With MEDIA_OFFLOAD
+    set, the worker only stats the file and answers conditional requests.
+    """
+    path, full_path, stat_result = resolve(document_root or settings.MEDIA_ROOT, path)
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed(path) else REVALIDATE_CACHE_CONTROL
+    etag = file_etag(path, stat_result)
+    content_type = content_type_for(path)
+    header = OFFLOAD_HEADERS.get(settings.MEDIA_OFFLOAD.lower())
+    if header:
+        return offload_response(request, path, full_path, stat_result, etag, content_type, cache_control, header)
+    return file_response(request, full_path, stat_result, etag, content_type, cache_control)
+
+
+def serve_static(request, path, document_root=None):
+    """
+    Serves a collected static file, preferring the gzip copy written by
+    `GzipManifestStaticFilesStorage` when the client accepts it.
+
+    For deployments without a front server for STATIC_URL (SERVE_STATIC).
+    """
+    document_root = document_root or settings.STATIC_ROOT
+    path, full_path, stat_result = resolve(document_root, path)
+    cache_control = IMMUTABLE_CACHE_CONTROL if MANIFEST_HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+    content_type = content_type_for(path)
+    try:
+        _, compressed_path, compressed_stat = resolve(document_root, f"{path}{GZIP_SUFFIX}")
+    except Http404:
+        compressed_path = None
+
+    encoding = None
+    if compressed_path and ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')):
+        full_path, stat_result, encoding = compressed_path, compressed_stat, 'gzip'
+    response = file_response(
+        request, full_path, stat_result, file_etag(path, stat_result), content_type, cache_control, encoding
+    )
+    if compressed_path:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,6 @@
+from .sliding_window import (
+    EmailSlidingWindowThrottle,
+    IPSlidingWindowThrottle,
+    SlidingWindowThrottle,
+    TokenSlidingWindowThrottle,
+)
@@ -0,0 +1,163 @@
+import hashlib
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding-window request counter stored in the Django cache.
+
+    Each identity gets one counter per fixed window, bumped with an atomic
+    `incr`. The rate is estimated from the current window plus the previous
+    window weighted by how much of it still overlaps the sliding window, so
+    bursts at a window boundary are not let through twice. A check costs two
+    cache round trips and never touches the database.
+
+    The rate comes from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under
+    "<view.throttle_scope>_<ident_name>", e.g. "login_ip": "20/min". Views
+    without a configured rate are not throttled.
+    """
+    ident_name = None
+    cache_alias = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias or settings.THROTTLE_CACHE_ALIAS]
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return None
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.ident_name}")
+
+    def parse_rate(self, rate):
+        """
+        Turns "<requests>/<period>" (s, sec, m, min, h, hour, d, day) into (requests, seconds).
+        """
+        try:
+            num, period = rate.split('/')
+            return int(num), self.durations[period[0]]
+        except (ValueError, KeyError, IndexError):
+            raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}")
+
+    def get_ident_key(self, request, view):
+        """
+        Returns the value requests are counted by, or None to skip throttling this request.
+        """
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def get_cache_keys(self, view, ident, duration, now):
+        window = int(now // duration)
+        digest = hashlib.sha1(ident.encode()).hexdigest()
+        prefix = f"throttle:{view.throttle_scope}:{self.ident_name}:{digest}"
+        return f"{prefix}:{window}", f"{prefix}:{window - 1}"
+
+    def prepare(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return None
+        ident = self.get_ident_key(request, view)
+        if not ident:
+            return None
+        num_requests, duration = self.parse_rate(rate)
+        now = time.time()
+        current_key, previous_key = self.get_cache_keys(view, ident, duration, now)
+        return num_requests, duration, now, current_key, previous_key
+
+    def decide(self, num_requests, duration, now, current, previous):
+        elapsed = (now % duration) / duration
+        if previous * (1 - elapsed) + current <= num_requests:
+            return True
+        self.wait_seconds = duration * (1 - elapsed)
+        return False
+
+    def allow_request(self, request, view):
+        prepared = self.prepare(request, view)
+        if prepared is None:
+            return True
+        num_requests, duration, now, current_key, previous_key = prepared
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # First hit in this window; `add` loses the race gracefully.
+            if self.cache.add(current_key, 1, duration * 2):
+                current = 1
+            else:
+                current = self.cache.incr(current_key)
+        previous = self.cache.get(previous_key, 0)
+        return self.decide(num_requests, duration, now, current, previous)
+
+    async def aallow_request(self, request, view):
+        """
+        Async `allow_request` for the async base viewsets.
+        """
+        prepared = self.prepare(request, view)
+        if prepared is None:
+            return True
+        num_requests, duration, now, current_key, previous_key = prepared
+        try:
+            current = await self.cache.aincr(current_key)
+        except ValueError:
+            if await self.cache.aadd(current_key, 1, duration * 2):
+                current = 1
+            else:
+                current = await self.cache.aincr(current_key)
+        previous = await self.cache.aget(previous_key, 0)
+        return self.decide(num_requests, duration, now, current, previous)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Counts requests per client IP address.
+
+    X-Forwarded-For is only read when REST_FRAMEWORK['NUM_PROXIES'] says how
+    many trusted proxies add to it; otherwise a client could pick a new key
+    for every request, so the socket address is used.
+    """
+    ident_name = 'ip'
+
+    def get_ident_key(self, request, view):
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return self.get_ident(request)
+
+
+class EmailSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Counts requests per target account, from the `email` in the request body.
+    """
+    ident_name = 'email'
+
+    def get_ident_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower()
+
+
+class TokenSlidingWindowThrottle(SlidingWindowThrottle):
+    """
+    Counts requests per bearer token.
+    """
+    ident_name = 'token'
+
+    def get_ident_key(self, request, view):
+        auth = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(auth) != 2:
+            return None
+        return auth[1]
@@ -5,6 +5,7 @@ HTTP_400_BAD_REQUEST = "Bad Request!"
 HTTP_401_UNAUTHORIZED = "Unauthorized Access!"
 HTTP_403_FORBIDDEN = "Forbidden!"
 HTTP_404_NOT_FOUND = "Not Found!"
+HTTP_412_PRECONDITION_FAILED = "Precondition Failed!"
 HTTP_500_INTERNAL_SERVER_ERROR = "Internal Server Error!"
 
 # ============================
@@ -46,6 +47,7 @@ DATA_FORMAT_ERROR = "Data format error!"
 # ================================
 INSUFFICIENT_PERMISSIONS = "You do not have sufficient permissions to perform this action!"
 ACTION_NOT_ALLOWED = "This action is not allowed!"
+TOO_MANY_REQUESTS = "Too many requests, please try again later!"
 
 # ================================
 # Generic Error Messages
@@ -88,3 +90,17 @@ ALREADY_ACCOUNT_VERIFIED = "Your email is already verified."
 # ================================
 DETAILS_FETCH_SUCCESSFULLY = "Information has been fetched successfully."
 DETAILS_UPDATED_SUCCESSFULLY = "Information has been updated successfully."
+USERS_IMPORTED = "Users have been imported successfully."
+INVALID_CURSOR = "Invalid page cursor."
+USERS_EXPORTED = "CSV or JSONL export of the users, streamed as it is read."
+DATABASE_METRICS_FETCHED = "Database connection metrics have been fetched successfully."
+PHOTO_UPLOAD_STARTED = "Photo upload started; send the bytes from the returned offset."
+PHOTO_UPLOAD_STATUS = "Photo upload offset has been fetched successfully."
+PHOTO_CHUNK_RECEIVED = "Photo chunk received."
+PROFILE_PHOTO_UPDATED = "Profile photo updated; its thumbnails are being generated."
+PHOTO_UPLOAD_NOT_FOUND = "Photo upload not found or expired."
+UPLOAD_OFFSET_REQUIRED = "Send the chunk position in the Upload-Offset header."
+UPLOAD_OFFSET_MISMATCH = "Upload-Offset does not match the bytes received; resume from the returned offset."
+PHOTO_CHUNK_TOO_LARGE = "Photo chunk is larger than the allowed chunk size."
+PHOTO_TOO_LARGE = "Profile photo is larger than the allowed size."
+INVALID_PHOTO = "Upload a valid JPEG, PNG, WEBP or GIF image."